@@ -7,30 +7,525 @@ timestamp formats, and automatic file management.
 
 Classes:
     AutoSaveNewFilesCommand: Main plugin class that handles file operations
+    AutoSaveNewFilesSearchCommand: Quick panel search over saved notes
+    AutoSaveNewFilesRecentCommand: Reopens recently saved notes from a quick panel
+    AutoSaveNewFilesStatsCommand: Shows the collected instrumentation
+    AutoSaveNewFilesOpenArchivedCommand: Opens notes from the monthly archives
+    AutoSaveNewFilesHistoryCommand: Opens or restores earlier versions of a note
 
 Author: Mark
 License: MIT
 """
 
-import datetime
+import hashlib
 import os
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
 
 import sublime
 import sublime_plugin
 
-# Define a global debug flag
-DEBUG = False  # Set to True to enable debug logging
+from .scratch_autosave import Debouncer, atomic_write
+from .scratch_catalog import DEFAULT_PAGE_SIZE, TITLE_SCAN_CHARS, Catalogs, CatalogEntry
+from .scratch_config import SETTINGS_FILE, Config
+from .scratch_deleter import BatchDeleter, Failure
+from .scratch_dirs import ReadinessCache
+from .scratch_events import EventCoalescer
+from .scratch_history import HistoryStores, Version
+from .scratch_journal import Journals
+from .scratch_leases import LeaseStores
+from .scratch_names import NameIndexes
+from .scratch_records import RecordStore
+from .scratch_routes import Route, Router
+from .scratch_search import MAX_INDEXED_BYTES, SearchIndexes
+from .scratch_stats import Stats
+from .scratch_sync import Remote, Syncer
+from .scratch_watch import CREATED, DELETED, Change, Watchers
 
+if TYPE_CHECKING:
+    from .scratch_archive import ArchivedNote
 
-def debug_log(message: str) -> None:
+# Key used to register the settings change callback
+SETTINGS_CHANGE_KEY = "auto_save_new_files"
+
+# Extra characters (whitespace) a header-only buffer may hold beyond the timestamp
+HEADER_SLACK = 16
+
+# Decisions memoized per view id
+VIEW_MANAGED = "managed"
+VIEW_IGNORED = "ignored"
+VIEW_PENDING = "pending"
+
+# When the module was imported, for the import-to-ready measurement
+_imported_at = time.perf_counter()
+
+# Seconds from import to the end of plugin_loaded and of the warm-up
+_startup = {}  # type: Dict[str, float]
+
+# Incremented by plugin_unloaded, under the lock, so a warm-up still
+# running stops before its next step
+_lifecycle_lock = threading.Lock()
+_generation = 0
+
+_settings = None  # type: Optional[sublime.Settings]
+_config = None  # type: Optional[Config]
+
+# Chooses the name and header of new files for the current settings and
+# rules, rebuilt with the snapshot
+_router = None  # type: Optional[Router]
+
+# Mirrors the debug setting so debug_log is a single global check
+_debug = False
+
+# Counters and latencies of the event handlers, switched by the stats setting
+_stats = Stats()
+
+# Remembers which save directories have already been checked
+_readiness = ReadinessCache()
+
+# Names already taken in each save directory
+_names = NameIndexes()
+
+# Persistent record of the files created in each save directory
+_journals = Journals()
+
+# Recently saved notes of each save directory, for the recent notes panel
+_catalogs = Catalogs()
+
+# Locks telling other instances which managed files this one has open
+_leases = LeaseStores()
+
+# Managed files open in views, keyed by view id
+_records = RecordStore()
+
+# Full-text indexes of the notes in each save directory
+_search = SearchIndexes()
+
+# Saved versions of the notes in each save directory
+_history = HistoryStores()
+
+# Copies files from the staging directory to the save directory, if staging
+_syncer = None  # type: Optional[Syncer]
+_syncer_lock = threading.Lock()
+
+
+def debug_log(message: str, *args: object) -> None:
     """
-    Log debug messages if DEBUG is enabled.
+    Log debug messages if the debug setting is enabled.
 
     Args:
-        message: The message to log
+        message: The message to log, a %-style format when ``args`` are given
+        *args: Values formatted into ``message`` only when logging is enabled
+    """
+    if _debug:
+        print("[AutoSaveNewFiles] " + (message % args if args else message))
+
+
+def reload_config() -> None:
     """
-    if DEBUG:
-        print("[AutoSaveNewFiles] " + message)
+    Rebuild the settings snapshot and swap it in.
+
+    Registered with ``Settings.add_on_change`` so the snapshot is only rebuilt
+    when the user edits the settings file. Readers always see either the old
+    or the new snapshot, never a partially updated one.
+    """
+    global _config, _debug, _router
+    start = time.perf_counter()
+    settings = _settings if _settings is not None else sublime.load_settings(SETTINGS_FILE)
+    config = Config.from_settings(settings.get)
+    for warning in config.warnings:
+        print("[AutoSaveNewFiles] Invalid setting, using default: " + warning)
+    _debug = config.debug
+    _stats.enabled = config.stats
+    _router = Router.from_config(config)
+    _config = config
+    _stats.observe("phase.settings_load", time.perf_counter() - start)
+
+
+def get_config() -> Config:
+    """Return the current settings snapshot, loading it on first use."""
+    if _config is None:
+        reload_config()
+    return _config
+
+
+def _report_delete_failures(failures: List[Failure]) -> None:
+    """Show one error message for all files of a batch that were not deleted."""
+    lines = []
+    for file_path, e in failures:
+        if isinstance(e, PermissionError):
+            lines.append(f"Permission denied: Cannot delete file {file_path}")
+        else:
+            lines.append(f"Failed to delete file {file_path}: {str(e)}")
+    _stats.count("files.delete_failures", len(failures))
+    for file_path, _ in failures:
+        _release_lease(file_path)
+    for line in lines:
+        debug_log(line)
+    message = "AutoSaveNewFiles: " + "\n".join(lines)
+    sublime.set_timeout(lambda: sublime.error_message(message), 0)
+
+
+def _record_created(save_directory: str, file_path: str, timestamp: str) -> None:
+    """Add a newly created file to its save directory's journal and catalog."""
+    try:
+        _journals.get(save_directory).record_created(file_path, timestamp)
+    except OSError as e:
+        debug_log("Failed to record %s in journal: %s", file_path, e)
+    _update_catalog(save_directory, file_path, "")
+
+
+def _acquire_lease(file_path: str) -> None:
+    """Tell other instances that this one has the managed file ``file_path`` open."""
+    if not _leases.get(get_config().local_directory).acquire(file_path):
+        debug_log("No lease on %s", file_path)
+
+
+def _release_lease(file_path: str) -> None:
+    """Drop a lease taken when ``file_path`` was opened or claimed for deletion."""
+    _leases.get(get_config().local_directory).release(file_path)
+
+
+def _route(view: sublime.View) -> Route:
+    """Return the route of a new file in ``view``; its window and syntax are only read for rules."""
+    router = _router
+    if not router:
+        return router.default
+    window = view.window()
+    if window is None:
+        return router.route(None, (), view.settings().get("syntax"))
+    return router.route(window.id(), window.folders(), view.settings().get("syntax"))
+
+
+def _journal_timestamp(file_path: str) -> Optional[str]:
+    """Return the timestamp a journal records for ``file_path``, or None if not managed."""
+    journal = _journals.find(file_path)
+    return journal.timestamp(file_path) if journal is not None else None
+
+
+def _record_journal_event(file_path: str, method: str) -> None:
+    """Call ``method`` on the journal holding ``file_path``, if it is open."""
+    journal = _journals.find(file_path)
+    if journal is not None:
+        try:
+            getattr(journal, method)(file_path)
+        except OSError as e:
+            debug_log("Failed to update journal for %s: %s", file_path, e)
+
+
+def _claim_for_delete(file_path: str) -> bool:
+    """
+    Take the exclusive lease on a header-only file; called from the deleter thread.
+
+    Returns:
+        bool: True if the file may be deleted; False if another instance has
+        it open or its content on disk, for example synced from another
+        machine, is more than the header
+    """
+    leases = _leases.get(get_config().local_directory)
+    if not leases.claim(file_path):
+        _stats.count("leases.contended")
+        _record_journal_event(file_path, "record_closed")
+        debug_log("File open in another instance, keeping: %s", file_path)
+        return False
+    timestamp = _journal_timestamp(file_path) or ""
+    try:
+        size = os.path.getsize(file_path)
+    except OSError:
+        return True
+    if size > len(timestamp.encode("utf-8")) + HEADER_SLACK:
+        leases.release(file_path)
+        _record_journal_event(file_path, "record_closed")
+        debug_log("File changed on disk, keeping: %s", file_path)
+        return False
+    return True
+
+
+def _on_file_deleted(file_path: str) -> None:
+    """Forget a deleted file; called from the deleter thread."""
+    _stats.count("files.deleted")
+    _names.release(file_path)
+    _release_lease(file_path)
+    config = get_config()
+    _update_catalog(config.local_directory, file_path, deleted=True)
+    _record_journal_event(file_path, "record_deleted")
+    if config.search_index:
+        _update_search_index(config.local_directory, file_path, deleted=True)
+    syncer = _get_syncer(config)
+    if syncer is not None:
+        syncer.delete(file_path)
+
+
+def _update_catalog(
+    save_directory: str, file_path: str, text: Optional[str] = None, deleted: bool = False
+) -> None:
+    """
+    Record a saved or deleted managed file in the catalog of recent notes.
+
+    Args:
+        save_directory: Directory holding the catalog
+        file_path: The saved or deleted file
+        text: The start of the saved content; read from the file when omitted
+        deleted: Record the file as deleted
+    """
+    try:
+        with _stats.timer("phase.catalog"):
+            catalog = _catalogs.get(save_directory)
+            if deleted:
+                catalog.remove(file_path)
+            else:
+                catalog.update(file_path, text, _journal_timestamp(file_path) or "")
+    except OSError as e:
+        debug_log("Failed to update catalog for %s: %s", file_path, e)
+
+
+def _update_search_index(
+    save_directory: str, file_path: str, data: Optional[bytes] = None, deleted: bool = False
+) -> None:
+    """
+    Index the saved content of a managed file, or drop a deleted one.
+
+    Args:
+        save_directory: Directory holding the index
+        file_path: The saved or deleted file
+        data: The content just written; read from the file when omitted
+        deleted: Drop the file from the index
+    """
+    try:
+        index = _search.get(save_directory)
+        if index is None:
+            return
+        if deleted:
+            index.remove(file_path)
+        elif data is not None:
+            text = data[:MAX_INDEXED_BYTES].decode("utf-8", "replace")
+            index.update(file_path, text, time.time_ns())
+        else:
+            index.update_file(file_path)
+    except OSError as e:
+        debug_log("Failed to update search index for %s: %s", file_path, e)
+
+
+def _record_version(save_directory: str, file_path: str, data: Optional[bytes] = None) -> None:
+    """Add the saved content of a managed file to its history."""
+    try:
+        with _stats.timer("phase.history"):
+            if data is None:
+                with open(file_path, "rb") as f:
+                    data = f.read()
+            if _history.get(save_directory).snapshot(file_path, data):
+                _stats.count("history.versions")
+    except OSError as e:
+        debug_log("Failed to record history of %s: %s", file_path, e)
+
+
+def _report_sync_failures(failures: List[Failure]) -> None:
+    """Show that files keep failing to reach the save directory; retries continue."""
+    for file_path, e in failures:
+        debug_log("Failed to sync %s: %s", file_path, e)
+    _stats.count("sync.failures", len(failures))
+    e = failures[-1][1]
+    message = (
+        f"AutoSaveNewFiles: {len(failures)} files not synced to the save directory yet,"
+        f" retrying: {e}"
+    )
+    sublime.set_timeout(lambda: sublime.status_message(message), 0)
+
+
+def _get_syncer(config: Config) -> Optional[Syncer]:
+    """Return the syncer for the current settings, or None without staging."""
+    global _syncer
+    if not config.staging_directory:
+        return None
+
+    def current(syncer: Optional[Syncer]) -> bool:
+        return (
+            syncer is not None
+            and syncer.spool == config.staging_directory
+            and syncer.remote.directory == config.save_directory
+        )
+
+    syncer = _syncer
+    if not current(syncer):
+        # Called from the async and deleter threads
+        with _syncer_lock:
+            syncer = _syncer
+            if not current(syncer):
+                if syncer is not None:
+                    syncer.stop()
+                remote = Remote(config.save_directory, config.autosave_fsync)
+                syncer = _syncer = Syncer(
+                    config.staging_directory,
+                    remote,
+                    on_failures=_report_sync_failures,
+                    stats=_stats,
+                )
+    return syncer
+
+
+def _sync(file_path: str) -> None:
+    """Queue a copy of a managed file to the save directory when staging."""
+    syncer = _get_syncer(get_config())
+    if syncer is not None:
+        syncer.submit(file_path)
+
+
+def _memory_report() -> Dict[str, int]:
+    """
+    Summarize the size of the per-session tracking structures.
+
+    Returns:
+        Dict[str, int]: Open managed views, the approximate bytes their
+        records hold, the entries of the journals and name indexes, the
+        suffixes the name indexes remember, and the files leased to this
+        instance
+    """
+    usage = _records.memory_usage()
+    return {
+        "open_files": usage["records"],
+        "record_directories": usage["directories"],
+        "record_bytes": usage["bytes"],
+        "journal_entries": _journals.entries(),
+        "indexed_names": _names.names(),
+        "suffix_hints": _names.suffix_hints(),
+        "leased_files": _leases.held(),
+    }
+
+
+def _startup_report() -> Dict[str, float]:
+    """Return the milliseconds from import to each startup milestone reached so far."""
+    return {f"{name}_ms": seconds * 1000 for name, seconds in _startup.items()}
+
+
+# Deletes empty files on a background thread
+_deleter = BatchDeleter(
+    on_failures=_report_delete_failures,
+    on_deleted=_on_file_deleted,
+    before_delete=_claim_for_delete,
+    stats=_stats,
+)
+
+
+def _schedule_async(callback: Callable[[], None], delay: float) -> None:
+    """Run ``callback`` on Sublime Text's async thread after ``delay`` seconds."""
+    sublime.set_timeout_async(callback, int(delay * 1000))
+
+
+# Follows changes other programs make in the save directories
+_watchers = Watchers(_schedule_async)
+
+
+def _discard_reservation(file_path: str) -> None:
+    """Remove a reserved file that could not be saved, ignoring errors."""
+    try:
+        if os.path.getsize(file_path) == 0:
+            os.remove(file_path)
+            _names.release(file_path)
+    except OSError:
+        pass
+
+
+def plugin_loaded() -> None:
+    """Watch the settings for changes and warm up the caches on the async thread."""
+    global _settings
+    _settings = sublime.load_settings(SETTINGS_FILE)
+    _settings.add_on_change(SETTINGS_CHANGE_KEY, reload_config)
+    _startup.clear()
+    _startup["import_to_loaded"] = time.perf_counter() - _imported_at
+    generation = _generation
+    sublime.set_timeout_async(lambda: _warm_up(generation), 0)
+
+
+def _warm_up(generation: int) -> None:
+    """
+    Prepare what the first new tab needs, so it does not wait for it.
+
+    Loads the settings snapshot, checks the directory new files go to and
+    scans the names taken in it if it exists, replays the journal so files from earlier
+    sessions are still managed, opens the search index and history when
+    they are turned on, and resumes copying staged files. Handlers that run
+    before a step finished do the same work on demand.
+
+    Args:
+        generation: Value of ``_generation`` when the warm-up was scheduled;
+            the remaining steps are skipped once the plugin is unloaded
+    """
+    start = time.perf_counter()
+    with _lifecycle_lock:
+        if generation != _generation:
+            return
+        config = get_config()
+        subdirectory = _router.default.namer.directory()
+        target_directory = config.local_directory
+        if subdirectory:
+            target_directory = os.path.join(target_directory, subdirectory)
+
+    def check_directory() -> None:
+        # The directory is only created by the first new file
+        if os.path.isdir(target_directory):
+            _readiness.ensure(target_directory)
+            _names.get(target_directory)
+            _leases.get(config.local_directory).open()
+
+    def resume_sync() -> None:
+        # Copy the staged files that changed after their last copy
+        syncer = _get_syncer(config)
+        if syncer is not None:
+            journal = _journals.get(config.local_directory)
+            syncer.resume(file_path for file_path, _ in journal.items())
+
+    steps = [
+        check_directory,
+        lambda: _journals.get(config.local_directory),
+        resume_sync,
+    ]  # type: List[Callable[[], object]]
+    if config.search_index:
+        steps.append(lambda: _search.get(config.local_directory))
+    if config.history:
+        steps.append(lambda: _history.get(config.local_directory))
+    for step in steps:
+        with _lifecycle_lock:
+            if generation != _generation:
+                return
+            try:
+                step()
+            except OSError as e:
+                debug_log("Warm-up step failed: %s", e)
+
+    now = time.perf_counter()
+    _startup["warm_up"] = now - start
+    _startup["import_to_ready"] = now - _imported_at
+    _stats.observe("phase.warm_up", now - start)
+    debug_log("Ready %.1f ms after import", _startup["import_to_ready"] * 1000)
+
+
+def plugin_unloaded() -> None:
+    """
+    Stop the warm-up and background workers, finish pending deletions, close
+    the per-directory stores, and stop watching the settings.
+    """
+    global _settings, _config, _syncer, _generation
+    with _lifecycle_lock:
+        _generation += 1
+    _deleter.stop()
+    with _syncer_lock:
+        if _syncer is not None:
+            _syncer.stop()
+            _syncer = None
+    _journals.close()
+    _search.close()
+    _history.close()
+    _catalogs.close()
+    _leases.close()
+    _watchers.close()
+    _records.clear()
+    _names.invalidate()
+    _readiness.invalidate()
+    if _settings is not None:
+        _settings.clear_on_change(SETTINGS_CHANGE_KEY)
+    _settings = None
+    _config = None
 
 
 class AutoSaveNewFilesCommand(sublime_plugin.EventListener):
@@ -40,130 +535,407 @@ class AutoSaveNewFilesCommand(sublime_plugin.EventListener):
     This class listens for various Sublime Text events to automatically save new
     empty files with timestamp-based names and manage their lifecycle.
 
+    The managed files open in views are tracked in ``_records``; files that
+    are not open are only remembered by the journal of their directory.
+
     Attributes:
-        saved_files: Set of files managed by this plugin
-        file_timestamps: Dictionary mapping file paths to their timestamps
+        view_states: Memo of the decision made for each view id, so repeated
+            activations of the same view cost a dictionary lookup
+        restored_directories: Save directories whose journal has been loaded
+            and, with the watch setting, is being watched
+        events: Views waiting to be checked, processed in batches
+        autosaves: Managed views with edits waiting to be autosaved
     """
 
     def __init__(self):
         """Initialize the plugin with empty tracking collections."""
-        self.saved_files = set()  # type: Set[str]
-        self.file_timestamps = {}  # type: Dict[str, str]
+        self.view_states = {}  # type: Dict[int, str]
+        self.restored_directories = set()  # type: Set[str]
+        self.events = EventCoalescer(self.save_new_files, _schedule_async)
+        self.autosaves = Debouncer(self.autosave_view, _schedule_async, time.monotonic)
 
     def on_new_async(self, view: sublime.View) -> None:
         """Handle new file creation events."""
-        self.save_new_file_with_timestamp(view)
+        with _stats.timer("handler.on_new_async"):
+            self.queue_view(view)
 
     def on_activated_async(self, view: sublime.View) -> None:
         """Handle file activation events."""
-        self.save_new_file_with_timestamp(view)
+        with _stats.timer("handler.on_activated_async"):
+            self.queue_view(view)
 
     def on_load_async(self, view: sublime.View) -> None:
         """Handle file load events."""
-        self.save_new_file_with_timestamp(view)
+        with _stats.timer("handler.on_load_async"):
+            self.queue_view(view)
 
     def on_pre_close(self, view: sublime.View) -> None:
         """Handle file closing events."""
-        self.check_and_delete_empty_file(view)
+        with _stats.timer("handler.on_pre_close"):
+            self.check_and_delete_empty_file(view)
+
+    def on_modified_async(self, view: sublime.View) -> None:
+        """Schedule an autosave of an edited managed file."""
+        config = get_config()
+        if not config.autosave:
+            return
+        with _stats.timer("handler.on_modified_async"):
+            if view.id() in _records:
+                _stats.count("autosave.modifications")
+                self.autosaves.touch(
+                    view.id(), view, config.autosave_delay, config.autosave_max_delay
+                )
+
+    def on_close(self, view: sublime.View) -> None:
+        """Forget the decision made for a closed view and its record."""
+        self.events.discard(view.id())
+        self.autosaves.cancel(view.id())
+        self.view_states.pop(view.id(), None)
+        record = _records.remove(view.id())
+        if record is not None:
+            _release_lease(record.path)
+
+    def on_post_save_async(self, view: sublime.View) -> None:
+        """Re-evaluate a saved view and update the search index and history of managed files."""
+        with _stats.timer("handler.on_post_save_async"):
+            self.view_states.pop(view.id(), None)
+            config = get_config()
+            file_path = view.file_name()
+            record = _records.get(view.id())
+            if record is None:
+                return
+            if file_path != record.path:
+                # Saved under another name, which is not managed
+                _records.remove(view.id())
+                _release_lease(record.path)
+                return
+            record.content_hash = None
+            text = view.substr(sublime.Region(0, min(view.size(), TITLE_SCAN_CHARS)))
+            _update_catalog(config.local_directory, file_path, text)
+            if config.search_index:
+                _update_search_index(config.local_directory, file_path)
+            if config.history:
+                _record_version(config.local_directory, file_path)
+            _sync(file_path)
 
-    def save_new_file_with_timestamp(self, view: sublime.View) -> None:
+    def autosave_view(self, view: sublime.View) -> None:
+        """
+        Write the buffer of a managed view to disk atomically.
+
+        Called once edits have settled. The write is skipped when the
+        content matches what was last autosaved. Afterwards the view is
+        reverted from the file it now matches, so it is no longer shown as
+        modified, unless it was edited again in the meantime.
+
+        Args:
+            view: The edited view
+        """
+        record = _records.get(view.id())
+        if not view.is_valid() or record is None:
+            return
+        file_path = record.path
+        config = get_config()
+        change_count = view.change_count()
+        with _stats.timer("phase.autosave"):
+            data = view.substr(sublime.Region(0, view.size())).encode("utf-8")
+            digest = hashlib.blake2b(data, digest_size=16).digest()
+            if record.content_hash == digest:
+                _stats.count("autosave.unchanged")
+            else:
+                try:
+                    atomic_write(file_path, data, config.autosave_fsync)
+                except OSError as e:
+                    debug_log("Failed to autosave %s: %s", file_path, e)
+                    message = f"AutoSaveNewFiles: autosave failed: {e}"
+                    sublime.set_timeout(lambda: sublime.status_message(message), 0)
+                    return
+                record.content_hash = digest
+                _stats.count("autosave.writes")
+                _stats.count("autosave.bytes_written", len(data))
+                debug_log("Autosaved %s", file_path)
+                text = data[:TITLE_SCAN_CHARS].decode("utf-8", "ignore")
+                _update_catalog(config.local_directory, file_path, text)
+                if config.search_index:
+                    _update_search_index(config.local_directory, file_path, data)
+                if config.history:
+                    _record_version(config.local_directory, file_path, data)
+                _sync(file_path)
+        sublime.set_timeout(lambda: self.mark_saved(view, change_count), 0)
+
+    def mark_saved(self, view: sublime.View, change_count: int) -> None:
+        """Clear the modified state of an autosaved view that was not edited since."""
+        if view.is_valid() and view.is_dirty() and view.change_count() == change_count:
+            view.run_command("revert")
+
+    def queue_view(self, view: sublime.View) -> None:
+        """
+        Queue a view to be checked, unless it has already been decided.
+
+        Events for a view that is already queued are dropped, so a burst of
+        events costs one check per view.
+
+        Args:
+            view: The Sublime Text view an event was fired for
+        """
+        view_id = view.id()
+        if self.view_states.get(view_id, VIEW_PENDING) != VIEW_PENDING:
+            _stats.count("views.memo_hits")
+            return
+        if not self.events.submit(view_id, view):
+            _stats.count("events.coalesced")
+
+    def save_new_files(self, views: List[sublime.View]) -> None:
+        """
+        Check a batch of queued views against one settings snapshot.
+
+        Args:
+            views: Views queued since the last batch; closed ones are skipped
+        """
+        with _stats.timer("phase.batch"):
+            _stats.count("events.batches")
+            config = get_config()
+            for view in views:
+                if view.is_valid():
+                    self.save_new_file_with_timestamp(view, config)
+
+    def save_new_file_with_timestamp(
+        self, view: sublime.View, config: Optional[Config] = None
+    ) -> None:
         """
         Save a new empty file with a timestamp-based name.
 
         Args:
             view: The Sublime Text view to save
+            config: Settings snapshot shared by the current batch, read if None
 
         This method handles the main logic for saving new files:
-        - Checks if the file should be saved
-        - Loads plugin settings
-        - Generates timestamp and filename
-        - Creates the save directory if needed
-        - Saves the file and optionally inserts a timestamp
-        """
-        if view.file_name() in self.saved_files or view.file_name() is not None:
-            return
-
-        if (
-            not view.is_scratch()
-            and view.file_name() is None
-            and len(view.substr(sublime.Region(0, view.size()))) == 0
-        ):
-            # Load settings with defaults
-            settings = sublime.load_settings("AutoSaveNewFiles.sublime-settings")
-            save_directory = os.path.expanduser(settings.get("save_directory", "~/scratch"))
-            filename_format = settings.get("filename_format", "{timestamp}.{extension}")
-            insert_timestamp = settings.get("insert_timestamp", True)
-            timestamp_format = settings.get("timestamp_format", "%Y_%m_%d_%H%M%S")
-            use_microseconds = settings.get("use_microseconds", False)
-            default_extension = settings.get("default_extension", "md")
-
-            debug_log(f"Save directory: {save_directory}")
-
-            # Ensure we have proper permissions for the save directory
-            try:
-                # Create the directory if it doesn't exist
-                if not os.path.exists(save_directory):
-                    os.makedirs(save_directory)
-                    debug_log("Directory created.")
-
-                # Test write permissions
-                test_file = os.path.join(save_directory, ".test_permissions")
-                with open(test_file, "w") as f:
-                    f.write("")
-                os.remove(test_file)
-            except PermissionError:
-                error_msg = f"Permission denied: Cannot access directory {save_directory}"
-                debug_log(error_msg)
-                sublime.error_message(f"AutoSaveNewFiles: {error_msg}")
-                return
-            except OSError as e:
-                error_msg = f"Failed to access directory {save_directory}: {str(e)}"
-                debug_log(error_msg)
-                sublime.error_message(f"AutoSaveNewFiles: {error_msg}")
-                return
+        - Checks if the file should be saved, using the per-view memo
+        - Reads the cached settings snapshot
+        - Looks up the route of the rules matching the view's window or syntax
+        - Generates timestamp and filename, reserving it on disk
+        - Creates the target directory if needed (checked once per directory,
+          then cached)
+        - Saves the file and optionally inserts a header line
+        """
+        view_id = view.id()
+        if self.view_states.get(view_id, VIEW_PENDING) != VIEW_PENDING:
+            _stats.count("views.memo_hits")
+            return
 
-            # Generate timestamp
-            now = datetime.datetime.now()
-            if use_microseconds:
-                timestamp = now.strftime(f"{timestamp_format}_%f")[:-3]
-            else:
-                timestamp = now.strftime(timestamp_format)
+        state = self.classify_view(view)
+        if state is not None:
+            self.view_states[view_id] = state
+            return
 
-            # Generate filename
-            filename = filename_format.format(timestamp=timestamp, extension=default_extension)
-            debug_log(f"Generated filename: {filename}")
+        # Claim the view before any work so re-entrant events skip it
+        self.view_states[view_id] = VIEW_MANAGED
 
-            # Construct the full file path
-            file_path = os.path.join(save_directory, filename)
-            debug_log(f"Full file path: {file_path}")
+        # Read the cached settings snapshot
+        if config is None:
+            config = get_config()
+        save_directory = config.local_directory
 
-            # Handle filename conflicts
-            counter = 1
-            while os.path.exists(file_path):
-                base, ext = os.path.splitext(filename)
-                new_filename = f"{base}_{counter}{ext}"
-                file_path = os.path.join(save_directory, new_filename)
-                counter += 1
+        debug_log("Save directory: %s", save_directory)
 
-            # Save the new file
-            try:
+        # Generate timestamp and filename in memory; the filename may place
+        # the file in a routed or date-sharded subdirectory
+        route = _route(view)
+        timestamp, filename = route.namer.next()
+        debug_log("Generated filename: %s", filename)
+        target_directory, filename = os.path.split(os.path.join(save_directory, filename))
+
+        # Ensure we have proper permissions for the target directory
+        try:
+            with _stats.timer("phase.directory_check"):
+                _readiness.ensure(target_directory)
+        except PermissionError:
+            error_msg = f"Permission denied: Cannot access directory {target_directory}"
+            debug_log(error_msg)
+            sublime.error_message(f"AutoSaveNewFiles: {error_msg}")
+            _stats.count("errors")
+            self.view_states.pop(view_id, None)
+            return
+        except OSError as e:
+            error_msg = f"Failed to access directory {target_directory}: {str(e)}"
+            debug_log(error_msg)
+            sublime.error_message(f"AutoSaveNewFiles: {error_msg}")
+            _stats.count("errors")
+            self.view_states.pop(view_id, None)
+            return
+
+        # Initial content of the file, written together with its creation;
+        # a buffer holding only its first line counts as empty
+        first_line = route.render_header(timestamp)
+        header = first_line + "\n" if first_line else ""
+        marker = first_line.strip() or timestamp
+        content = header.encode("utf-8") if config.write_directly else b""
+
+        # Reserve a unique file name, adding a _N suffix on conflicts
+        file_path = os.path.join(target_directory, filename)
+        try:
+            with _stats.timer("phase.collision_resolution"):
+                file_path = _names.claim(target_directory, filename, content)
+        except OSError as e:
+            _names.invalidate(target_directory)
+            _readiness.invalidate(target_directory)
+            error_msg = f"Failed to create file {file_path}: {str(e)}"
+            debug_log(error_msg)
+            sublime.error_message(f"AutoSaveNewFiles: {error_msg}")
+            _stats.count("errors")
+            self.view_states.pop(view_id, None)
+            return
+        if file_path != os.path.join(target_directory, filename):
+            _stats.count("files.name_collisions")
+        debug_log("Full file path: %s", file_path)
+
+        # Save the new file
+        try:
+            with _stats.timer("phase.save"):
                 view.retarget(file_path)
-                view.run_command("save")
-                debug_log(f"File saved: {file_path}")
+                if config.write_directly:
+                    # The file is already on disk; load it so the view is not dirty
+                    if header:
+                        view.run_command("revert")
+                    debug_log("File created: %s", file_path)
+                else:
+                    view.run_command("save")
+                    debug_log("File saved: %s", file_path)
 
-                # Insert the timestamp as the first line if enabled
-                if insert_timestamp:
-                    view.run_command("insert", {"characters": timestamp + "\n"})
-                    debug_log(f"Timestamp added to file: {file_path}")
+            # Insert the header as the first line if enabled
+            if header and not config.write_directly:
+                with _stats.timer("phase.insert"):
+                    view.run_command("insert", {"characters": header})
+                    debug_log("Header added to file: %s", file_path)
                     view.run_command("save")
 
-                self.saved_files.add(file_path)
-                self.file_timestamps[file_path] = timestamp
-            except Exception as e:
-                debug_log(f"Failed to save file: {e}")
-                sublime.error_message(
-                    f"AutoSaveNewFiles: Failed to save file {file_path}\nError: {str(e)}"
-                )
+            _records.add(view_id, file_path, marker)
+            _acquire_lease(file_path)
+            _record_created(save_directory, file_path, marker)
+            _sync(file_path)
+            _stats.count("files.created")
+        except Exception as e:
+            _readiness.invalidate(target_directory)
+            _discard_reservation(file_path)
+            self.view_states.pop(view_id, None)
+            _stats.count("errors")
+            debug_log("Failed to save file: %s", e)
+            sublime.error_message(
+                f"AutoSaveNewFiles: Failed to save file {file_path}\nError: {str(e)}"
+            )
+
+    def classify_view(self, view: sublime.View) -> Optional[str]:
+        """
+        Decide whether a view should be saved as a new scratch file.
+
+        Args:
+            view: The Sublime Text view to check
+
+        Returns:
+            Optional[str]: ``VIEW_MANAGED`` or ``VIEW_IGNORED`` for final
+            decisions, ``VIEW_PENDING`` for untitled views with content that
+            may still become empty, or None if the view should be saved now
+        """
+        file_name = view.file_name()
+        if file_name is not None:
+            self.restore_managed_files(get_config().local_directory)
+            timestamp = _journal_timestamp(file_name)
+            if timestamp is None:
+                return VIEW_IGNORED
+            _records.add(view.id(), file_name, timestamp)
+            _acquire_lease(file_name)
+            _record_journal_event(file_name, "record_opened")
+            return VIEW_MANAGED
+        if view.is_scratch():
+            return VIEW_IGNORED
+        # Test emptiness by size so the buffer is never copied
+        if view.size() != 0:
+            return VIEW_PENDING
+        return None
+
+    def restore_managed_files(self, save_directory: str) -> None:
+        """
+        Load a save directory's journal, and start watching the directory,
+        once per directory.
+
+        Args:
+            save_directory: The save directory whose journal to load
+        """
+        if save_directory in self.restored_directories:
+            return
+        self.restored_directories.add(save_directory)
+        try:
+            journal = _journals.get(save_directory)
+        except OSError as e:
+            debug_log("Failed to replay journal: %s", e)
+            return
+        debug_log("Restored %d managed files from %s", len(journal), journal.path)
+        if get_config().watch:
+            watcher = _watchers.watch(save_directory, self.apply_changes)
+            if watcher is not None:
+                debug_log("Watching %s using %s", save_directory, watcher.method)
+
+    def apply_changes(self, changes: List[Change], resync: bool) -> None:
+        """
+        Bring the tracked files up to date with changes made by other programs.
+
+        Called on the async thread with batches from the directory watcher.
+
+        Args:
+            changes: Files created, deleted or moved since the last batch
+            resync: True if changes were dropped and the tracked files must
+                be checked against the disk instead
+        """
+        with _stats.timer("phase.watch"):
+            _stats.count("watch.changes", len(changes))
+            if resync:
+                _stats.count("watch.resyncs")
+                _names.invalidate()
+                _readiness.invalidate()
+                for _, record in _records.items():
+                    file_path = record.path
+                    if not os.path.exists(file_path):
+                        self.forget_file(file_path)
+            for change in changes:
+                if change.kind == CREATED:
+                    _names.add(change.path)
+                elif change.kind == DELETED:
+                    _names.release(change.path)
+                    self.forget_file(change.path)
+                else:
+                    _names.release(change.path)
+                    _names.add(change.new_path)
+                    self.move_file(change.path, change.new_path)
+
+    def forget_file(self, file_path: str) -> None:
+        """Stop managing a file that was deleted by another program."""
+        for _ in _records.discard_path(file_path):
+            _release_lease(file_path)
+        if _journal_timestamp(file_path) is None:
+            return
+        config = get_config()
+        _update_catalog(config.local_directory, file_path, deleted=True)
+        _record_journal_event(file_path, "record_deleted")
+        if config.search_index:
+            _update_search_index(config.local_directory, file_path, deleted=True)
+        debug_log("Managed file deleted externally: %s", file_path)
+
+    def move_file(self, old_path: str, new_path: str) -> None:
+        """Follow a managed file that was renamed by another program."""
+        for _ in _records.move(old_path, new_path):
+            _release_lease(old_path)
+            _acquire_lease(new_path)
+        if _journal_timestamp(old_path) is None:
+            return
+        journal = _journals.find(old_path)
+        if journal is not None:
+            try:
+                journal.record_moved(old_path, new_path)
+            except OSError as e:
+                debug_log("Failed to update journal for %s: %s", new_path, e)
+        local_directory = get_config().local_directory
+        _update_catalog(local_directory, old_path, deleted=True)
+        _update_catalog(local_directory, new_path)
+        debug_log("Managed file moved externally: %s -> %s", old_path, new_path)
 
     def check_and_delete_empty_file(self, view: sublime.View) -> None:
         """
@@ -175,29 +947,379 @@ class AutoSaveNewFilesCommand(sublime_plugin.EventListener):
         This method is called when a file is being closed. It checks if:
         - The file was created by this plugin
         - The file is empty or contains only a timestamp
-        If both conditions are met, the file is deleted.
+        If both conditions are met, the file is queued for deletion on a
+        background thread, which keeps it if another instance has it open or
+        it grew on disk (see ``_claim_for_delete``). Only journals already
+        loaded are consulted, since this runs on the UI thread.
         """
         file_path = view.file_name()
-        if file_path in self.saved_files:
-            content = view.substr(sublime.Region(0, view.size())).strip()
-            timestamp = self.file_timestamps.get(file_path, "")
+        if file_path is None:
+            return
+        save_directory = get_config().local_directory
+        if save_directory not in self.restored_directories:
+            # Replaying the journal and starting the watcher would block the UI thread
+            sublime.set_timeout_async(lambda: self.restore_managed_files(save_directory), 0)
+        record = _records.get(view.id())
+        # A view closed before it was classified is only known to the journal
+        timestamp = record.timestamp if record is not None else _journal_timestamp(file_path)
+        if timestamp is not None:
+            # Only a buffer about the size of the header can be header-only,
+            # so larger buffers are kept without being copied
+            size = view.size()
+            if size > len(timestamp) + HEADER_SLACK:
+                _record_journal_event(file_path, "record_closed")
+                debug_log("File not empty, keeping: %s", file_path)
+                return
+            content = view.substr(sublime.Region(0, size)).strip() if size else ""
 
             if content == timestamp or not content:
-                try:
-                    os.remove(file_path)
-                    debug_log(f"Deleted empty file: {file_path}")
-                    self.saved_files.remove(file_path)
-                    del self.file_timestamps[file_path]
-                except PermissionError:
-                    error_msg = f"Permission denied: Cannot delete file {file_path}"
-                    debug_log(error_msg)
-                    sublime.error_message(f"AutoSaveNewFiles: {error_msg}")
-                except OSError as e:
-                    error_msg = f"Failed to delete file {file_path}: {str(e)}"
-                    debug_log(error_msg)
-                    sublime.error_message(f"AutoSaveNewFiles: {error_msg}")
+                if _records.remove(view.id()) is not None:
+                    # The deleter claims the file again if it may be deleted
+                    _release_lease(file_path)
+                _deleter.submit(file_path)
+                debug_log("Queued empty file for deletion: %s", file_path)
+            else:
+                _record_journal_event(file_path, "record_closed")
+                debug_log("File not empty, keeping: %s", file_path)
+
+
+class AutoSaveNewFilesSearchCommand(sublime_plugin.WindowCommand):
+    """
+    Search the full-text index of saved notes from a quick panel.
+
+    Prompts for words to look for, runs the query on the async thread, and
+    opens the selected note.
+    """
+
+    def run(self) -> None:
+        """Prompt for the words to search for."""
+        self.window.show_input_panel("Search scratch notes:", "", self.on_done, None, None)
+
+    def is_enabled(self) -> bool:
+        """Only offer the command when the search index is turned on."""
+        return get_config().search_index
+
+    def on_done(self, text: str) -> None:
+        """Run the query off the UI thread."""
+        sublime.set_timeout_async(lambda: self.search(text), 0)
+
+    def search(self, text: str) -> None:
+        """Query the index and show the results in a quick panel."""
+        try:
+            index = _search.get(get_config().local_directory)
+            results = index.search(text) if index is not None else []
+        except OSError as e:
+            sublime.set_timeout(lambda: sublime.status_message(f"Search failed: {e}"), 0)
+            return
+        if not results:
+            sublime.set_timeout(lambda: sublime.status_message("No matching notes"), 0)
+            return
+
+        items = [[os.path.basename(result.path), result.snippet] for result in results]
+
+        def on_select(selected: int) -> None:
+            if selected >= 0:
+                self.window.open_file(results[selected].path)
+
+        sublime.set_timeout(lambda: self.window.show_quick_panel(items, on_select), 0)
+
+
+class AutoSaveNewFilesRecentCommand(sublime_plugin.WindowCommand):
+    """
+    Reopen a recently saved note from a quick panel.
+
+    Notes are listed newest first with their first meaningful line, read one
+    page at a time from the catalog; the last item loads the next page.
+    """
+
+    def run(self, page_size: int = DEFAULT_PAGE_SIZE) -> None:
+        """
+        Read the first page of the catalog off the UI thread.
+
+        Args:
+            page_size: Number of notes listed before the item loading more
+        """
+        self.page_size = page_size
+        self.entries = []  # type: List[CatalogEntry]
+        self.pages = _catalogs.get(get_config().local_directory).pages(page_size)
+        self.more = True
+        sublime.set_timeout_async(self.load_page, 0)
+
+    def load_page(self) -> None:
+        """Read the next page of the catalog and show the panel."""
+        selected = len(self.entries)
+        try:
+            with _stats.timer("phase.catalog"):
+                page = next(self.pages, [])
+        except OSError as e:
+            debug_log("Failed to read catalog: %s", e)
+            message = f"AutoSaveNewFiles: failed to read recent notes: {e}"
+            sublime.set_timeout(lambda: sublime.status_message(message), 0)
+            return
+        self.entries.extend(page)
+        self.more = len(page) == self.page_size
+        if not self.entries:
+            sublime.set_timeout(lambda: sublime.status_message("No recent notes"), 0)
+            return
+
+        items = [
+            [
+                entry.title or os.path.basename(entry.path),
+                time.strftime("%Y-%m-%d %H:%M", time.localtime(entry.mtime_ns / 1e9))
+                + "  "
+                + os.path.basename(entry.path),
+            ]
+            for entry in self.entries
+        ]
+        if self.more:
+            items.append(["More...", f"Show the next {self.page_size} notes"])
+        sublime.set_timeout(
+            lambda: self.window.show_quick_panel(
+                items, self.on_select, selected_index=min(selected, len(items) - 1)
+            ),
+            0,
+        )
+
+    def on_select(self, selected: int) -> None:
+        """Open the selected note, or load the next page."""
+        if selected < 0:
+            return
+        if selected == len(self.entries):
+            sublime.set_timeout_async(self.load_page, 0)
+            return
+        file_path = self.entries[selected].path
+        if not os.path.exists(file_path):
+            _update_catalog(get_config().local_directory, file_path, deleted=True)
+            name = os.path.basename(file_path)
+            sublime.status_message(f"AutoSaveNewFiles: {name} no longer exists")
+            return
+        self.window.open_file(file_path)
+
+
+class AutoSaveNewFilesOpenArchivedCommand(sublime_plugin.WindowCommand):
+    """
+    Open a note from the monthly archives made by ``scripts/autosave_archive.py``.
+
+    Lists the archive index newest first and opens the selected note in a
+    read-only scratch view.
+    """
+
+    def run(self) -> None:
+        """Read the index off the UI thread."""
+        sublime.set_timeout_async(self.list_notes, 0)
+
+    def list_notes(self) -> None:
+        """Show the archived notes in a quick panel."""
+        # Imported on first use, since zipfile is slow to import
+        from .scratch_archive import ARCHIVE_DIR, read_index
+
+        archive_dir = os.path.join(get_config().save_directory, ARCHIVE_DIR)
+        notes = read_index(archive_dir)[::-1]
+        if not notes:
+            sublime.set_timeout(lambda: sublime.status_message("No archived notes"), 0)
+            return
+
+        items = [[note.name.rpartition("/")[2], note.archive] for note in notes]
+
+        def on_select(selected: int) -> None:
+            if selected >= 0:
+                sublime.set_timeout_async(lambda: self.open_note(archive_dir, notes[selected]), 0)
+
+        sublime.set_timeout(lambda: self.window.show_quick_panel(items, on_select), 0)
+
+    def open_note(self, archive_dir: str, note: "ArchivedNote") -> None:
+        """Read ``note`` from its archive and show it read-only."""
+        from .scratch_archive import read_archived
+
+        try:
+            text = read_archived(archive_dir, note)
+        except (OSError, KeyError) as e:
+            error_msg = f"Failed to read {note.name} from {note.archive}: {str(e)}"
+            debug_log(error_msg)
+            sublime.set_timeout(lambda: sublime.error_message(f"AutoSaveNewFiles: {error_msg}"), 0)
+            return
+
+        def show() -> None:
+            view = self.window.new_file()
+            view.set_scratch(True)
+            view.set_name(f"{note.name.rpartition('/')[2]} ({note.archive})")
+            view.run_command("append", {"characters": text})
+            view.set_read_only(True)
+
+        sublime.set_timeout(show, 0)
+
+
+class AutoSaveNewFilesHistoryCommand(sublime_plugin.WindowCommand):
+    """
+    Browse the saved versions of the note in the active view.
+
+    Lists the versions newest first. The selected version is opened in a
+    read-only scratch view, or with ``restore`` written back to the note.
+    """
+
+    def run(self, restore: bool = False) -> None:
+        """
+        Show the versions of the active note.
+
+        Args:
+            restore: Replace the note with the selected version instead of
+                opening it
+        """
+        view = self.window.active_view()
+        file_path = view.file_name() if view is not None else None
+        if file_path is None:
+            sublime.status_message("AutoSaveNewFiles: the active view is not a saved note")
+            return
+        sublime.set_timeout_async(lambda: self.list_versions(view, file_path, restore), 0)
+
+    def is_enabled(self) -> bool:
+        """Only offer the command when the history is turned on."""
+        return get_config().history
+
+    def list_versions(self, view: sublime.View, file_path: str, restore: bool) -> None:
+        """Show the versions of ``file_path`` in a quick panel."""
+        save_directory = get_config().local_directory
+        try:
+            store = _history.get(save_directory)
+        except OSError as e:
+            sublime.set_timeout(lambda: sublime.status_message(f"History failed: {e}"), 0)
+            return
+        versions = store.versions(file_path)[::-1]
+        if not versions:
+            sublime.set_timeout(lambda: sublime.status_message("No saved versions"), 0)
+            return
+
+        items = [
+            [
+                time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(version.time_ns / 1e9)),
+                f"{version.size} bytes",
+            ]
+            for version in versions
+        ]
+
+        def on_select(selected: int) -> None:
+            if selected < 0:
+                return
+            version = versions[selected]
+            if restore:
+                sublime.set_timeout_async(
+                    lambda: self.restore_version(view, save_directory, file_path, version), 0
+                )
             else:
-                debug_log(f"File not empty, keeping: {file_path}")
+                sublime.set_timeout_async(
+                    lambda: self.open_version(save_directory, file_path, version), 0
+                )
+
+        sublime.set_timeout(lambda: self.window.show_quick_panel(items, on_select), 0)
+
+    def read_version(
+        self, save_directory: str, file_path: str, version: Version
+    ) -> Optional[bytes]:
+        """Return the content of ``version``, or None after reporting an error."""
+        try:
+            return _history.get(save_directory).read(version)
+        except (OSError, KeyError, ValueError) as e:
+            error_msg = f"Failed to read a saved version of {file_path}: {str(e)}"
+            debug_log(error_msg)
+            sublime.set_timeout(lambda: sublime.error_message(f"AutoSaveNewFiles: {error_msg}"), 0)
+            return None
+
+    def open_version(self, save_directory: str, file_path: str, version: Version) -> None:
+        """Show ``version`` in a read-only scratch view."""
+        data = self.read_version(save_directory, file_path, version)
+        if data is None:
+            return
+        text = data.decode("utf-8", "replace")
+        saved = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(version.time_ns / 1e9))
+
+        def show() -> None:
+            view = self.window.new_file()
+            view.set_scratch(True)
+            view.set_name(f"{os.path.basename(file_path)} ({saved})")
+            view.run_command("append", {"characters": text})
+            view.set_read_only(True)
+
+        sublime.set_timeout(show, 0)
+
+    def restore_version(
+        self, view: sublime.View, save_directory: str, file_path: str, version: Version
+    ) -> None:
+        """Write ``version`` back to the note and reload it in ``view``."""
+        if view.is_dirty():
+            sublime.set_timeout(
+                lambda: sublime.status_message(
+                    "AutoSaveNewFiles: save the note before restoring a version"
+                ),
+                0,
+            )
+            return
+        data = self.read_version(save_directory, file_path, version)
+        if data is None:
+            return
+        try:
+            atomic_write(file_path, data, get_config().autosave_fsync)
+        except OSError as e:
+            error_msg = f"Failed to restore {file_path}: {str(e)}"
+            debug_log(error_msg)
+            sublime.set_timeout(lambda: sublime.error_message(f"AutoSaveNewFiles: {error_msg}"), 0)
+            return
+        # The restored content becomes the newest version, so the restore
+        # itself can be undone from the history
+        _record_version(save_directory, file_path, data)
+        text = data[:TITLE_SCAN_CHARS].decode("utf-8", "ignore")
+        _update_catalog(save_directory, file_path, text)
+        if get_config().search_index:
+            _update_search_index(save_directory, file_path, data)
+        _sync(file_path)
+
+        def reload() -> None:
+            if view.is_valid():
+                view.run_command("revert")
+
+        sublime.set_timeout(reload, 0)
+
+
+class AutoSaveNewFilesStatsCommand(sublime_plugin.WindowCommand):
+    """
+    Show the counters and latencies collected while the stats setting is on.
+
+    Prints a table to the console, or opens the raw data as JSON in a new
+    scratch view.
+    """
+
+    def run(self, output: str = "console", reset: bool = False) -> None:
+        """
+        Dump the collected statistics.
+
+        Args:
+            output: ``"console"`` for a table in the console, ``"json"`` for
+                a scratch view holding the statistics as JSON
+            reset: Forget the statistics after showing them
+        """
+        if output == "json":
+            view = self.window.new_file()
+            view.set_scratch(True)
+            view.set_name("AutoSaveNewFiles Stats")
+            view.assign_syntax("Packages/JSON/JSON.sublime-syntax")
+            import json
+
+            data = _stats.snapshot()
+            data["memory"] = _memory_report()
+            data["startup"] = _startup_report()
+            view.run_command("append", {"characters": json.dumps(data, indent=2) + "\n"})
+        else:
+            print(_stats.format_table())
+            print(f"{'memory':<32} {'value':>7}")
+            for name, value in _memory_report().items():
+                print(f"{name:<32} {value:>7}")
+            print(f"{'startup':<32} {'ms':>9}")
+            for name, value in _startup_report().items():
+                print(f"{name:<32} {value:>9.3f}")
+            self.window.run_command("show_panel", {"panel": "console"})
+        if reset:
+            _stats.reset()
+        if not _stats.enabled:
+            sublime.status_message("AutoSaveNewFiles: set \"stats\": true to collect statistics")
 
 
 # Save this file as auto_save_new_files.py in the Packages/User directory.
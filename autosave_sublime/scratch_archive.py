@@ -0,0 +1,193 @@
+"""
+Monthly zip archives of old scratch files for AutoSaveNewFiles.
+
+``scripts/autosave_archive.py`` moves files that have not been modified for
+a while into one zip archive per month under ``.archive`` in the save
+directory. Each file is streamed into the archive, the archive is checked
+before any original is deleted, and a tab-separated index lists every
+archived note so the plugin can list and open them without reading every
+archive::
+
+    2024-03.zip<TAB>2024/03/2024_03_19_123456.md<TAB>812<TAB>1710851696000000000
+
+An existing month is extended by appending to a copy of its archive and
+renaming the copy over it once verified, so an interrupted run never
+damages notes that were archived earlier.
+"""
+
+import datetime
+import os
+import shutil
+import zipfile
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+
+# Directory inside the save directory that holds the archives
+ARCHIVE_DIR = ".archive"
+
+# Name of the index of archived notes inside ``ARCHIVE_DIR``
+INDEX_NAME = "index.tsv"
+
+# zipfile compression methods by name
+COMPRESSION = {"deflate": zipfile.ZIP_DEFLATED, "lzma": zipfile.ZIP_LZMA}  # type: Dict[str, int]
+
+# Size of the chunks files are streamed into archives with
+CHUNK_SIZE = 1 << 16
+
+
+class ArchivedNote(NamedTuple):
+    """One note stored in a monthly archive."""
+
+    archive: str
+    name: str
+    size: int
+    mtime_ns: int
+
+
+def archive_name(year: int, month: int) -> str:
+    """Return the file name of the archive for a month."""
+    return f"{year:04d}-{month:02d}.zip"
+
+
+def read_index(archive_dir: str) -> List[ArchivedNote]:
+    """
+    Read the index of archived notes.
+
+    Returns:
+        List[ArchivedNote]: Every indexed note, oldest archive first; empty
+        if nothing has been archived yet
+    """
+    notes = []
+    try:
+        with open(os.path.join(archive_dir, INDEX_NAME), encoding="utf-8") as f:
+            for line in f:
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) == 4 and fields[2].isdigit() and fields[3].isdigit():
+                    notes.append(ArchivedNote(fields[0], fields[1], int(fields[2]), int(fields[3])))
+    except FileNotFoundError:
+        pass
+    return notes
+
+
+def append_index(archive_dir: str, notes: Iterable[ArchivedNote]) -> None:
+    """Add ``notes`` to the index."""
+    lines = "".join(
+        f"{note.archive}\t{note.name}\t{note.size}\t{note.mtime_ns}\n" for note in notes
+    )
+    if lines:
+        with open(os.path.join(archive_dir, INDEX_NAME), "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+def rebuild_index(archive_dir: str) -> int:
+    """
+    Rewrite the index from the archives themselves.
+
+    Returns:
+        int: Number of indexed notes
+    """
+    notes = []
+    for name in sorted(os.listdir(archive_dir)):
+        if not name.endswith(".zip"):
+            continue
+        with zipfile.ZipFile(os.path.join(archive_dir, name)) as archive:
+            for info in archive.infolist():
+                notes.append(ArchivedNote(name, info.filename, info.file_size, _zip_mtime_ns(info)))
+    temp_path = os.path.join(archive_dir, INDEX_NAME + ".tmp")
+    with open(temp_path, "w", encoding="utf-8") as f:
+        for note in notes:
+            f.write(f"{note.archive}\t{note.name}\t{note.size}\t{note.mtime_ns}\n")
+    os.replace(temp_path, os.path.join(archive_dir, INDEX_NAME))
+    return len(notes)
+
+
+def read_archived(archive_dir: str, note: ArchivedNote) -> str:
+    """
+    Return the text of an archived note.
+
+    Raises:
+        OSError: If the archive cannot be read
+        KeyError: If the note is missing from its archive
+    """
+    try:
+        with zipfile.ZipFile(os.path.join(archive_dir, note.archive)) as archive:
+            data = archive.read(note.name)
+    except zipfile.BadZipFile as e:
+        raise OSError(f"Cannot read {note.archive}: {e}") from e
+    return data.decode("utf-8", "replace")
+
+
+def archived_sizes(path: str) -> Dict[str, int]:
+    """Return the size of every member of the archive at ``path``, if it exists."""
+    try:
+        with zipfile.ZipFile(path) as archive:
+            return {info.filename: info.file_size for info in archive.infolist()}
+    except FileNotFoundError:
+        return {}
+
+
+def add_to_archive(
+    path: str, files: List[Tuple[str, str]], compression: str = "deflate"
+) -> List[ArchivedNote]:
+    """
+    Stream files into a monthly archive and verify it.
+
+    The files are appended to a copy of the existing archive, the copy is
+    read back in full and checked against the sources, and only then renamed
+    over the archive.
+
+    Args:
+        path: Archive to create or extend
+        files: ``(source path, name in the archive)`` pairs
+        compression: A key of ``COMPRESSION``
+
+    Returns:
+        List[ArchivedNote]: The notes added to the archive
+
+    Raises:
+        OSError: If a file cannot be read or the archive fails verification
+    """
+    temp_path = path + ".tmp"
+    if os.path.exists(path):
+        shutil.copyfile(path, temp_path)
+    method = COMPRESSION[compression]
+    added = []  # type: List[ArchivedNote]
+    try:
+        with zipfile.ZipFile(temp_path, "a", compression=method) as archive:
+            for source, name in files:
+                st = os.stat(source)
+                info = zipfile.ZipInfo.from_file(source, name)
+                info.compress_type = method
+                size = 0
+                with open(source, "rb") as src, archive.open(info, "w") as dst:
+                    for chunk in iter(lambda: src.read(CHUNK_SIZE), b""):
+                        dst.write(chunk)
+                        size += len(chunk)
+                added.append(ArchivedNote(os.path.basename(path), name, size, st.st_mtime_ns))
+        _verify(temp_path, added)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    return added
+
+
+def _verify(path: str, notes: List[ArchivedNote]) -> None:
+    """Check every member's CRC and the size of the newly added notes."""
+    try:
+        with zipfile.ZipFile(path) as archive:
+            bad = archive.testzip()
+            if bad is not None:
+                raise OSError(f"{path}: checksum mismatch for {bad}")
+            sizes = {info.filename: info.file_size for info in archive.infolist()}
+    except zipfile.BadZipFile as e:
+        raise OSError(f"{path}: {e}") from e
+    for note in notes:
+        if sizes.get(note.name) != note.size:
+            raise OSError(f"{path}: {note.name} was not archived completely")
+
+
+def _zip_mtime_ns(info: zipfile.ZipInfo) -> int:
+    return int(datetime.datetime(*info.date_time).timestamp()) * 1_000_000_000
@@ -0,0 +1,163 @@
+"""
+Debounced, crash-safe autosave of managed scratch files for AutoSaveNewFiles.
+
+``Debouncer`` turns a stream of modifications into occasional writes: a
+view is written once it has been idle for ``delay`` seconds, and at least
+every ``max_delay`` seconds while the user keeps typing, so sustained
+typing costs at most one write per ``max_delay``. ``atomic_write`` replaces
+a file through a temporary file and ``os.replace`` so a crash leaves either
+the old or the new content, never a mix.
+"""
+
+import os
+import tempfile
+import threading
+from typing import Callable, Dict
+
+# Supported values of the autosave_fsync setting:
+# never: leave flushing to the operating system
+# file: fsync the new file before it replaces the old one
+# full: also fsync the directory so the rename itself is durable
+FSYNC_POLICIES = ("never", "file", "full")
+
+# Keys due within this many seconds fire now instead of being rescheduled,
+# since timers have millisecond resolution
+_DUE_SLACK = 0.001
+
+
+def atomic_write(path: str, data: bytes, fsync: str = "file") -> None:
+    """
+    Replace the content of ``path`` with ``data`` atomically.
+
+    Args:
+        path: File to write
+        data: New content
+        fsync: One of ``FSYNC_POLICIES``
+
+    Raises:
+        OSError: If the file cannot be written; the old content is kept
+    """
+    directory, name = os.path.split(path)
+    fd, temp_path = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            if fsync != "never":
+                f.flush()
+                os.fsync(f.fileno())
+        try:
+            os.chmod(temp_path, os.stat(path).st_mode & 0o7777)
+        except FileNotFoundError:
+            pass
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    if fsync == "full" and hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+class _Pending:
+    """Modification state of one key waiting to be written."""
+
+    __slots__ = ("value", "first", "last", "delay", "max_delay")
+
+    def __init__(self, value: object, now: float, delay: float, max_delay: float):
+        self.value = value
+        self.first = now
+        self.last = now
+        self.delay = delay
+        self.max_delay = max_delay
+
+
+class Debouncer:
+    """
+    Idle debounce with a maximum latency, per key.
+
+    Only one check per key is scheduled at a time, however many
+    modifications arrive.
+    """
+
+    def __init__(
+        self,
+        fire: Callable[[object], None],
+        schedule: Callable[[Callable[[], None], float], None],
+        clock: Callable[[], float],
+    ):
+        """
+        Args:
+            fire: Called with the latest value of a key when it is due
+            schedule: Runs a callback after a delay in seconds
+            clock: Returns the current time in seconds
+        """
+        self._fire = fire
+        self._schedule = schedule
+        self._clock = clock
+        self._pending = {}  # type: Dict[int, _Pending]
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: int) -> bool:
+        return key in self._pending
+
+    def touch(self, key: int, value: object, delay: float, max_delay: float) -> None:
+        """
+        Record a modification of ``key``.
+
+        Args:
+            key: Identifies what was modified, such as a view id
+            value: Passed to ``fire`` when the key is due
+            delay: Seconds without modifications before firing
+            max_delay: Seconds after the first modification by which to
+                fire even if modifications continue
+        """
+        now = self._clock()
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None:
+                pending.value = value
+                pending.last = now
+                return
+            self._pending[key] = _Pending(value, now, delay, max_delay)
+        self._schedule(lambda: self._check(key), delay)
+
+    def cancel(self, key: int) -> None:
+        """Forget pending modifications of ``key``."""
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def _check(self, key: int) -> None:
+        now = self._clock()
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is None:
+                return
+            wait = self._remaining(pending, now)
+            if wait <= _DUE_SLACK:
+                del self._pending[key]
+        if wait > _DUE_SLACK:
+            self._schedule(lambda: self._check(key), wait)
+        else:
+            self._fire(pending.value)
+
+    @staticmethod
+    def _remaining(pending: _Pending, now: float) -> float:
+        idle = pending.last + pending.delay - now
+        deadline = pending.first + pending.max_delay - now
+        return min(idle, deadline)
+
+
+def write_bound(duration: float, max_delay: float) -> int:
+    """
+    Return the most writes sustained typing for ``duration`` seconds can cause.
+
+    Each write happens at most ``max_delay`` seconds after the first
+    modification it covers, plus one final write once typing stops.
+    """
+    return int(duration // max_delay) + 1
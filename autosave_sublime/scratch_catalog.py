@@ -0,0 +1,267 @@
+"""
+Catalog of recently saved scratch notes for AutoSaveNewFiles.
+
+Reopening an older note used to mean browsing a save directory that may hold
+a hundred thousand files. ``Catalog`` keeps an append-only log in the save
+directory with one line per change, written when a note is created, saved or
+deleted::
+
+    2024_03_19_123456.md<TAB>1710851696000000000<TAB>Shopping list
+    2024_03_19_123456.md<TAB><TAB>
+
+The second line records a deletion. Since every change is appended, the
+newest lines describe the most recently saved notes, so ``Catalog.pages``
+reads the log backwards from its end, one block at a time, and only reads as
+far as the pages that are asked for. Neither the save directory nor the
+notes themselves are read to show them.
+
+Once the log has grown to twice its size after the last compaction it is
+rewritten with one line per live note, oldest first, under its ``LogLock``
+and from the log as it is on disk, so the lines other instances appended
+are kept.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set
+
+from .scratch_leases import REPLACED_CHECK_INTERVAL, LogLock, replaced
+
+# Name of the catalog file inside the save directory
+CATALOG_NAME = ".autosave_catalog"
+
+# Size of the log before it is first compacted
+COMPACT_MIN_BYTES = 1 << 20
+
+# Characters at the start of a note searched for its title
+TITLE_SCAN_CHARS = 4096
+
+# Longest title kept in the catalog
+MAX_TITLE_LENGTH = 120
+
+# Number of notes shown per page of the quick panel
+DEFAULT_PAGE_SIZE = 50
+
+# Bytes read at a time when reading the log backwards
+_BLOCK_SIZE = 1 << 16
+
+
+class CatalogEntry(NamedTuple):
+    """One note in the catalog."""
+
+    path: str
+    title: str
+    mtime_ns: int
+
+
+def note_title(text: str, header: str = "") -> str:
+    """
+    Return the first meaningful line of a note.
+
+    Blank lines, the timestamp ``header`` inserted when the note was created,
+    and lines made only of punctuation such as ``---`` are skipped. Markdown
+    heading and list markers are removed.
+
+    Args:
+        text: The start of the note
+        header: The timestamp line the plugin inserted, if any
+
+    Returns:
+        str: The title, or an empty string if the note has no meaningful line
+    """
+    header = header.strip()
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line == header:
+            continue
+        line = line.lstrip("#>*-+ \t").strip()
+        if not any(c.isalnum() for c in line):
+            continue
+        return " ".join(line.split())[:MAX_TITLE_LENGTH]
+    return ""
+
+
+class Catalog:
+    """
+    Append-only log of the notes saved in one directory, newest last.
+
+    Attributes:
+        directory: Directory whose notes are cataloged
+        path: Location of the catalog file
+    """
+
+    def __init__(self, directory: str, name: str = CATALOG_NAME):
+        self.directory = directory
+        self.path = os.path.join(directory, name)
+        self._file = None
+        self._unchecked = 0
+        self._compact_at = COMPACT_MIN_BYTES
+        self._lock = threading.Lock()
+        self._log_lock = LogLock(self.path)
+
+    def update(self, path: str, text: Optional[str] = None, header: str = "") -> None:
+        """
+        Record that the note ``path`` was saved.
+
+        Args:
+            path: The saved note
+            text: The start of its content; read from the file when omitted
+            header: The timestamp line the plugin inserted, if any
+        """
+        if text is None:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                text = f.read(TITLE_SCAN_CHARS)
+        title = note_title(text[:TITLE_SCAN_CHARS], header)
+        self._append(f"{self._relative(path)}\t{time.time_ns()}\t{title}\n")
+
+    def remove(self, path: str) -> None:
+        """Record that the note ``path`` was deleted."""
+        self._append(f"{self._relative(path)}\t\t\n")
+
+    def recent(self, limit: int = DEFAULT_PAGE_SIZE) -> List[CatalogEntry]:
+        """Return the ``limit`` most recently saved notes, newest first."""
+        return next(self.pages(limit), [])
+
+    def pages(self, page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[List[CatalogEntry]]:
+        """
+        Yield the live notes, newest first, ``page_size`` at a time.
+
+        The log is read from its end as pages are requested, so taking the
+        first page only reads the newest part of it. Changes appended after
+        the first page was read are not included.
+        """
+        seen = set()  # type: Set[str]
+        page = []  # type: List[CatalogEntry]
+        for line in self._lines_backwards():
+            name, _, rest = line.partition("\t")
+            mtime_ns, _, title = rest.partition("\t")
+            if not name or name in seen:
+                continue
+            seen.add(name)
+            if not mtime_ns.isdigit():
+                continue
+            page.append(CatalogEntry(self._absolute(name), title, int(mtime_ns)))
+            if len(page) == page_size:
+                yield page
+                page = []
+        if page:
+            yield page
+
+    def close(self) -> None:
+        """Close the catalog file."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._log_lock.close()
+
+    def _append(self, line: str) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._unchecked += 1
+                if self._unchecked >= REPLACED_CHECK_INTERVAL:
+                    self._unchecked = 0
+                    if replaced(self._file, self.path):
+                        # Another instance compacted the catalog
+                        self._file.close()
+                        self._file = None
+            if self._file is None:
+                self._file = self._open_for_append()
+            try:
+                self._file.write(line.encode("utf-8"))
+            except OSError:
+                # Reopened by the next append, in case the catalog was replaced
+                self._file.close()
+                self._file = None
+                raise
+            if self._file.tell() >= self._compact_at:
+                with self._log_lock.exclusive():
+                    self._compact()
+
+    def _open_for_append(self):
+        f = open(self.path, "ab+", buffering=0)
+        size = f.seek(0, os.SEEK_END)
+        if size:
+            # Drop the partial line left by a crash
+            start = max(0, size - _BLOCK_SIZE)
+            f.seek(start)
+            tail = f.read()
+            if not tail.endswith(b"\n"):
+                newline = tail.rfind(b"\n")
+                f.truncate(start + newline + 1 if newline >= 0 else 0)
+                f.seek(0, os.SEEK_END)
+        return f
+
+    def _compact(self) -> None:
+        self._file.close()
+        self._file = None
+        entries = {}  # type: Dict[str, str]
+        with open(self.path, "rb") as f:
+            raw = f.read()
+        end = raw.rfind(b"\n") + 1
+        for line in raw[:end].decode("utf-8", "replace").split("\n")[:-1]:
+            name, _, rest = line.partition("\t")
+            entries.pop(name, None)
+            if rest.partition("\t")[0].isdigit():
+                entries[name] = line
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8", newline="\n") as f:
+            for line in entries.values():
+                f.write(line + "\n")
+            size = f.tell()
+        os.replace(temp_path, self.path)
+        self._compact_at = max(COMPACT_MIN_BYTES, 2 * size)
+
+    def _lines_backwards(self) -> Iterator[str]:
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            position = f.seek(0, os.SEEK_END)
+            # Anything after the last newline is a partial line
+            buffer = b""
+            complete = False
+            while position > 0:
+                step = min(_BLOCK_SIZE, position)
+                position -= step
+                f.seek(position)
+                buffer = f.read(step) + buffer
+                lines = buffer.split(b"\n")
+                buffer = lines[0]
+                for line in reversed(lines[1:]):
+                    if complete:
+                        yield line.decode("utf-8", "replace")
+                    complete = True
+            if buffer and complete:
+                yield buffer.decode("utf-8", "replace")
+
+    def _relative(self, path: str) -> str:
+        return os.path.relpath(path, self.directory).replace(os.sep, "/")
+
+    def _absolute(self, name: str) -> str:
+        return os.path.join(self.directory, *name.split("/"))
+
+
+class Catalogs:
+    """Lazily created ``Catalog`` per save directory."""
+
+    def __init__(self):
+        self._catalogs = {}  # type: Dict[str, Catalog]
+        self._lock = threading.Lock()
+
+    def get(self, directory: str) -> Catalog:
+        """Return the catalog for ``directory``."""
+        catalog = self._catalogs.get(directory)
+        if catalog is None:
+            with self._lock:
+                catalog = self._catalogs.setdefault(directory, Catalog(directory))
+        return catalog
+
+    def close(self) -> None:
+        """Close every open catalog."""
+        with self._lock:
+            for catalog in self._catalogs.values():
+                catalog.close()
+            self._catalogs.clear()
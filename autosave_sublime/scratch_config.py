@@ -0,0 +1,341 @@
+"""
+Settings snapshot for AutoSaveNewFiles.
+
+This module has no dependency on the Sublime Text API so it can be shared
+between the plugin and the command line scripts. The plugin builds a
+``Config`` once from ``AutoSaveNewFiles.sublime-settings`` and swaps it out
+whenever the settings change, so event handlers never touch the settings
+object directly.
+"""
+
+import datetime
+import os
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from .scratch_autosave import FSYNC_POLICIES
+
+SETTINGS_FILE = "AutoSaveNewFiles.sublime-settings"
+
+DEFAULTS = {
+    "save_directory": "~/scratch",
+    "staging_directory": "",
+    "filename_format": "{timestamp}.{extension}",
+    "insert_timestamp": True,
+    "timestamp_format": "%Y_%m_%d_%H%M%S",
+    "use_microseconds": False,
+    "timestamp_precision": None,
+    "default_extension": "md",
+    "write_directly": True,
+    "search_index": False,
+    "history": False,
+    "watch": True,
+    "autosave": False,
+    "autosave_delay": 1.0,
+    "autosave_max_delay": 10.0,
+    "autosave_fsync": "file",
+    "rules": [],
+    "stats": False,
+    "debug": False,
+}  # type: Dict[str, Any]
+
+_SAMPLE_TIME = datetime.datetime(2000, 1, 2, 3, 4, 5, 6000)
+
+# Digits of the fractional second appended to timestamps, per precision
+PRECISION_DIGITS = {"seconds": 0, "milliseconds": 3, "microseconds": 6}  # type: Dict[str, int]
+
+# What a rule can match on, in the order they take precedence
+RULE_MATCHES = ("window", "project", "syntax")
+
+# What a rule can choose for the new files it matches
+RULE_TARGETS = ("directory", "extension", "header")
+
+
+class Rule(NamedTuple):
+    """
+    One validated entry of the ``rules`` setting.
+
+    Attributes:
+        match: ``"window"``, ``"project"`` or ``"syntax"``
+        key: Window id, absolute project folder, or syntax file or name
+        directory: Subdirectory of the save directory, may use ``{year}``,
+            ``{month}`` and ``{day}``; empty for the save directory itself
+        extension: File extension without a leading dot, or empty for
+            ``default_extension``
+        header: First line written to new files, with ``{timestamp}``;
+            empty for none, or None to follow ``insert_timestamp``
+    """
+
+    match: str
+    key: Union[int, str]
+    directory: str = ""
+    extension: str = ""
+    header: Optional[str] = None
+
+
+def check_relative_directory(directory: str) -> None:
+    """
+    Check a directory format relative to the save directory.
+
+    Raises:
+        ValueError: If it has empty or ``..`` components or unknown fields
+    """
+    try:
+        expanded = directory.format(year="y", month="m", day="d")
+    except (KeyError, IndexError) as e:
+        raise ValueError(f"unknown field {e}") from None
+    if any(part in ("", ".", "..") for part in expanded.split("/")):
+        raise ValueError("must be a relative path without empty or '..' components")
+
+
+def parse_rule(entry: Any) -> Rule:
+    """
+    Validate one entry of the ``rules`` setting.
+
+    Args:
+        entry: An object with exactly one of ``window``, ``project`` or
+            ``syntax`` and any of ``directory``, ``extension`` and ``header``
+
+    Returns:
+        Rule: The validated rule
+
+    Raises:
+        ValueError: If the entry is not a valid rule
+    """
+    if not isinstance(entry, dict):
+        raise ValueError(f"must be an object, got {entry!r}")
+    unknown = sorted(set(entry) - set(RULE_MATCHES) - set(RULE_TARGETS))
+    if unknown:
+        raise ValueError(f"unknown keys {', '.join(unknown)}")
+    matches = [match for match in RULE_MATCHES if match in entry]
+    if len(matches) != 1:
+        raise ValueError(f"must have exactly one of {', '.join(RULE_MATCHES)}")
+    match = matches[0]
+    key = entry[match]
+    if match == "window":
+        if not isinstance(key, int) or isinstance(key, bool):
+            raise ValueError(f"window must be a window id, got {key!r}")
+    elif not isinstance(key, str) or not key.strip():
+        raise ValueError(f"{match} must be a non-empty string, got {key!r}")
+    elif match == "project":
+        key = os.path.abspath(os.path.expanduser(key.strip()))
+    else:
+        key = key.strip()
+
+    directory = entry.get("directory", "")
+    if not isinstance(directory, str):
+        raise ValueError(f"directory must be a string, got {directory!r}")
+    directory = directory.strip().strip("/")
+    if directory:
+        check_relative_directory(directory)
+
+    extension = entry.get("extension", "")
+    if not isinstance(extension, str) or os.sep in extension or "/" in extension:
+        raise ValueError(f"extension {extension!r} is invalid")
+    extension = extension.strip().lstrip(".")
+
+    header = entry.get("header")
+    if header is not None:
+        if not isinstance(header, str) or "\n" in header:
+            raise ValueError(f"header must be a single line, got {header!r}")
+        try:
+            header.format(timestamp="t")
+        except (KeyError, IndexError, ValueError) as e:
+            raise ValueError(f"header {header!r} is invalid: {e}") from None
+    return Rule(match, key, directory, extension, header)
+
+
+@dataclass(frozen=True)
+class Config:
+    """
+    Immutable, pre-validated view of the plugin settings.
+
+    Attributes:
+        save_directory: Absolute, user-expanded directory for new files
+        staging_directory: Absolute, user-expanded local directory in which
+            files are created and edited before being copied to
+            ``save_directory`` in the background, or empty to write to
+            ``save_directory`` directly
+        filename_format: Format string with ``{timestamp}`` and ``{extension}``,
+            optionally ``{year}``, ``{month}``, ``{day}`` and ``/`` separators
+        insert_timestamp: Whether to write the timestamp as the first line
+        timestamp_format: ``strftime`` format used for the timestamp
+        use_microseconds: Whether to append milliseconds to the timestamp;
+            superseded by ``timestamp_precision`` when that is set
+        timestamp_precision: ``"seconds"``, ``"milliseconds"`` or
+            ``"microseconds"``
+        default_extension: File extension without a leading dot
+        write_directly: Create the file with its initial content in one write
+            instead of going through the editor's save command
+        search_index: Whether to keep a full-text index of saved notes
+        history: Whether to keep every saved version of managed notes
+        watch: Whether to follow changes other programs make in the save
+            directory
+        autosave: Whether to write managed files as they are edited
+        autosave_delay: Seconds without edits before a managed file is written
+        autosave_max_delay: Seconds after the first unsaved edit by which the
+            file is written even while typing continues
+        autosave_fsync: ``"never"``, ``"file"`` or ``"full"``; how durable
+            each autosave is made before it returns
+        rules: Rules choosing the directory, extension and header of new
+            files by window, project folder or syntax, in settings order
+        stats: Whether to collect counters and latencies of the event handlers
+        debug: Whether to print debug messages to the console
+        warnings: Problems found while validating, one message per setting
+    """
+
+    save_directory: str
+    filename_format: str
+    insert_timestamp: bool
+    timestamp_format: str
+    use_microseconds: bool
+    default_extension: str
+    write_directly: bool = True
+    staging_directory: str = ""
+    timestamp_precision: str = "seconds"
+    search_index: bool = False
+    history: bool = False
+    watch: bool = True
+    autosave: bool = False
+    autosave_delay: float = 1.0
+    autosave_max_delay: float = 10.0
+    autosave_fsync: str = "file"
+    rules: Tuple[Rule, ...] = ()
+    stats: bool = False
+    debug: bool = False
+    warnings: Tuple[str, ...] = ()
+
+    @classmethod
+    def from_settings(cls, get: Callable[[str, Any], Any]) -> "Config":
+        """
+        Build a snapshot from a settings getter.
+
+        Invalid values are replaced by their defaults and reported in
+        ``warnings`` instead of raising, so a typo in the user's settings
+        never disables the plugin.
+
+        Args:
+            get: A ``settings.get``-style callable taking a key and a default
+
+        Returns:
+            Config: The validated settings snapshot
+        """
+        warnings = []
+
+        def read(key: str, expected: type) -> Any:
+            value = get(key, DEFAULTS[key])
+            if not isinstance(value, expected):
+                warnings.append(f"{key} must be a {expected.__name__}, got {value!r}")
+                return DEFAULTS[key]
+            return value
+
+        save_directory = read("save_directory", str).strip() or DEFAULTS["save_directory"]
+        save_directory = os.path.abspath(os.path.expanduser(save_directory))
+
+        staging_directory = read("staging_directory", str).strip()
+        if staging_directory:
+            staging_directory = os.path.abspath(os.path.expanduser(staging_directory))
+            if staging_directory == save_directory:
+                warnings.append("staging_directory must differ from save_directory")
+                staging_directory = ""
+
+        timestamp_format = read("timestamp_format", str)
+        try:
+            if not _SAMPLE_TIME.strftime(timestamp_format):
+                raise ValueError("format produces an empty timestamp")
+        except ValueError as e:
+            warnings.append(f"timestamp_format {timestamp_format!r} is invalid: {e}")
+            timestamp_format = DEFAULTS["timestamp_format"]
+
+        default_extension = read("default_extension", str).strip().lstrip(".")
+        if not default_extension or os.sep in default_extension:
+            warnings.append(f"default_extension {default_extension!r} is invalid")
+            default_extension = DEFAULTS["default_extension"]
+
+        use_microseconds = bool(read("use_microseconds", bool))
+        timestamp_precision = get("timestamp_precision", None)
+        if timestamp_precision is None:
+            timestamp_precision = "milliseconds" if use_microseconds else "seconds"
+        elif not isinstance(timestamp_precision, str) or (
+            timestamp_precision not in PRECISION_DIGITS
+        ):
+            warnings.append(
+                f"timestamp_precision must be one of {', '.join(PRECISION_DIGITS)},"
+                f" got {timestamp_precision!r}"
+            )
+            timestamp_precision = "milliseconds" if use_microseconds else "seconds"
+
+        def read_seconds(key: str) -> float:
+            value = get(key, DEFAULTS[key])
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+                warnings.append(f"{key} must be a positive number of seconds, got {value!r}")
+                return DEFAULTS[key]
+            return float(value)
+
+        autosave_delay = read_seconds("autosave_delay")
+        autosave_max_delay = max(read_seconds("autosave_max_delay"), autosave_delay)
+        autosave_fsync = read("autosave_fsync", str)
+        if autosave_fsync not in FSYNC_POLICIES:
+            warnings.append(
+                f"autosave_fsync must be one of {', '.join(FSYNC_POLICIES)}, got {autosave_fsync!r}"
+            )
+            autosave_fsync = DEFAULTS["autosave_fsync"]
+
+        filename_format = read("filename_format", str)
+        try:
+            filename = filename_format.format(
+                timestamp="t", extension="e", year="y", month="m", day="d"
+            )
+            if "{timestamp}" not in filename_format:
+                raise ValueError("must contain {timestamp}")
+            parts = filename.split("/")
+            if not parts[-1] or any(part in ("", ".", "..") for part in parts[:-1]):
+                raise ValueError("must be a relative path without empty or '..' components")
+        except (KeyError, IndexError, ValueError) as e:
+            warnings.append(f"filename_format {filename_format!r} is invalid: {e}")
+            filename_format = DEFAULTS["filename_format"]
+
+        rules = []  # type: List[Rule]
+        for i, entry in enumerate(read("rules", list)):
+            try:
+                rules.append(parse_rule(entry))
+            except ValueError as e:
+                warnings.append(f"rules[{i}] is invalid: {e}")
+
+        return cls(
+            save_directory=save_directory,
+            filename_format=filename_format,
+            insert_timestamp=bool(read("insert_timestamp", bool)),
+            timestamp_format=timestamp_format,
+            use_microseconds=use_microseconds,
+            default_extension=default_extension,
+            write_directly=bool(read("write_directly", bool)),
+            staging_directory=staging_directory,
+            timestamp_precision=timestamp_precision,
+            search_index=bool(read("search_index", bool)),
+            history=bool(read("history", bool)),
+            watch=bool(read("watch", bool)),
+            autosave=bool(read("autosave", bool)),
+            autosave_delay=autosave_delay,
+            autosave_max_delay=autosave_max_delay,
+            autosave_fsync=autosave_fsync,
+            rules=tuple(rules),
+            stats=bool(read("stats", bool)),
+            debug=bool(read("debug", bool)),
+            warnings=tuple(warnings),
+        )
+
+    @property
+    def local_directory(self) -> str:
+        """Directory new files are created in: the staging directory if set."""
+        return self.staging_directory or self.save_directory
+
+    @property
+    def fraction_digits(self) -> int:
+        """Digits of the fractional second appended to each timestamp."""
+        return PRECISION_DIGITS[self.timestamp_precision]
+
+    @classmethod
+    def from_dict(cls, values: Dict[str, Any]) -> "Config":
+        """Build a snapshot from a plain dictionary of settings."""
+        return cls.from_settings(values.get)
@@ -0,0 +1,169 @@
+"""
+Background deletion of empty scratch files.
+
+Closing a window with many scratch tabs used to delete every empty file
+synchronously on the UI thread. ``BatchDeleter`` takes the paths instead and
+removes them on a worker thread, collecting requests that arrive close
+together into one batch, retrying transient failures, and reporting the
+files that could not be deleted once per batch. Checks that need the file
+system before a delete, such as taking its lease, run on the worker too.
+"""
+
+import os
+import queue
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+from .scratch_stats import Stats
+
+# Seconds to wait for more requests before processing a batch
+DEFAULT_LINGER = 0.05
+
+# Attempts per file before a failure is reported
+DEFAULT_ATTEMPTS = 3
+
+# Seconds to wait before retrying a failed batch, doubled on each attempt
+DEFAULT_RETRY_DELAY = 0.1
+
+Failure = Tuple[str, OSError]
+
+
+class BatchDeleter:
+    """
+    Worker thread that deletes files in batches.
+
+    Attributes:
+        linger: Seconds to wait for more requests before processing a batch
+        attempts: Attempts per file before giving up
+        retry_delay: Initial delay between attempts, doubled each time
+    """
+
+    def __init__(
+        self,
+        on_failures: Callable[[List[Failure]], None],
+        on_deleted: Optional[Callable[[str], None]] = None,
+        before_delete: Optional[Callable[[str], bool]] = None,
+        linger: float = DEFAULT_LINGER,
+        attempts: int = DEFAULT_ATTEMPTS,
+        retry_delay: float = DEFAULT_RETRY_DELAY,
+        stats: Optional[Stats] = None,
+    ):
+        """
+        Args:
+            on_failures: Called from the worker with every file of a batch
+                that could not be deleted, only when there was at least one
+            on_deleted: Called from the worker for each deleted file
+            before_delete: Called from the worker before a file is deleted;
+                the file is kept when it returns False
+            linger: Seconds to wait for more requests before processing
+            attempts: Attempts per file before a failure is reported
+            retry_delay: Initial delay between attempts
+            stats: Records the time spent deleting each batch
+        """
+        self.linger = linger
+        self.attempts = attempts
+        self.retry_delay = retry_delay
+        self._on_failures = on_failures
+        self._on_deleted = on_deleted
+        self._before_delete = before_delete
+        self._stats = stats if stats is not None else Stats()
+        self._queue = queue.Queue()  # type: queue.Queue
+        self._thread = None  # type: Optional[threading.Thread]
+        self._lock = threading.Lock()
+
+    def submit(self, path: str) -> None:
+        """Queue ``path`` for deletion, starting the worker if needed."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="AutoSaveNewFiles-deleter", daemon=True
+                )
+                self._thread.start()
+        self._queue.put(path)
+
+    def flush(self) -> None:
+        """Block until every queued file has been processed."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def stop(self) -> None:
+        """Process the remaining files and stop the worker thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.linger
+            while batch[-1] is not None:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+
+            paths = [path for path in batch if path is not None]
+            try:
+                with self._stats.timer("phase.delete"):
+                    self.delete_batch(paths)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if batch[-1] is None:
+                return
+
+    def delete_batch(self, paths: List[str]) -> List[Failure]:
+        """
+        Delete ``paths``, retrying failures, and report what is left.
+
+        Files that are already gone count as deleted, and files
+        ``before_delete`` rejects are left alone.
+
+        Returns:
+            List[Failure]: Files that could not be deleted and the last error
+        """
+        pending = [path for path in paths if self._may_delete(path)]
+        failures = []  # type: List[Failure]
+        delay = self.retry_delay
+        for attempt in range(self.attempts):
+            if attempt:
+                time.sleep(delay)
+                delay *= 2
+            failures = []
+            for path in pending:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    failures.append((path, e))
+                    continue
+                if self._on_deleted is not None:
+                    try:
+                        self._on_deleted(path)
+                    except Exception as e:
+                        print(f"[AutoSaveNewFiles] Forgetting deleted file {path} failed: {e!r}")
+            if not failures:
+                break
+            pending = [path for path, _ in failures]
+
+        if failures:
+            try:
+                self._on_failures(failures)
+            except Exception as e:
+                for path, _ in failures:
+                    print(f"[AutoSaveNewFiles] Reporting failed delete of {path} failed: {e!r}")
+        return failures
+
+    def _may_delete(self, path: str) -> bool:
+        if self._before_delete is None:
+            return True
+        try:
+            return self._before_delete(path)
+        except Exception as e:
+            # Keeping a file is always safe
+            print(f"[AutoSaveNewFiles] Checking {path} before delete failed: {e!r}")
+            return False
@@ -0,0 +1,153 @@
+"""
+Save directory readiness checks for AutoSaveNewFiles.
+
+Checking that the save directory exists and is writable used to cost several
+metadata operations for every new file. ``ReadinessCache`` remembers a
+successful check per directory and only repeats it when the cached result
+expires, when the directory has been replaced, or when a real save fails.
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterator, NamedTuple, Optional
+
+# Name of the temporary file used to test write permissions
+PROBE_NAME = ".test_permissions"
+
+# Seconds a successful check is trusted without touching the filesystem
+DEFAULT_TTL = 60.0
+
+
+def probe_directory(path: str, create: bool = True) -> None:
+    """
+    Verify that a directory exists and is writable.
+
+    Args:
+        path: Directory to check
+        create: Create the directory (and parents) if it is missing
+
+    Raises:
+        PermissionError: If the directory cannot be created or written to
+        OSError: For any other filesystem failure
+    """
+    if create:
+        os.makedirs(path, exist_ok=True)
+    test_file = os.path.join(path, PROBE_NAME)
+    fd = os.open(test_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    os.close(fd)
+    os.remove(test_file)
+
+
+def iter_scratch_files(directory: str) -> Iterator[os.DirEntry]:
+    """
+    Yield the regular files in a save directory and its shard directories.
+
+    Hidden files and directories, such as the plugin's journal, are skipped.
+    Entries that vanish or cannot be read while scanning are skipped too.
+    """
+    pending = [directory]
+    while pending:
+        try:
+            entries = os.scandir(pending.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry
+                except OSError:
+                    continue
+
+
+class _Identity(NamedTuple):
+    """Fields of ``os.stat`` that change when a directory is replaced."""
+
+    dev: int
+    ino: int
+    mode: int
+    uid: int
+
+    @classmethod
+    def of(cls, path: str) -> "_Identity":
+        st = os.stat(path)
+        return cls(st.st_dev, st.st_ino, st.st_mode, st.st_uid)
+
+
+class _Entry:
+    """Cached result of a successful readiness check."""
+
+    __slots__ = ("identity", "checked_at")
+
+    def __init__(self, identity: _Identity, checked_at: float):
+        self.identity = identity
+        self.checked_at = checked_at
+
+
+class ReadinessCache:
+    """
+    Per-directory cache of successful readiness checks.
+
+    Within ``ttl`` seconds of a successful check, ``ensure`` returns without
+    any filesystem access. Once the entry expires a single ``os.stat``
+    decides whether the directory is still the one that was probed; only a
+    replaced, re-permissioned, or missing directory is probed again.
+
+    Attributes:
+        ttl: Seconds a successful check is trusted without a stat
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = {}  # type: Dict[str, _Entry]
+        self._lock = threading.Lock()
+
+    def ensure(self, directory: str) -> None:
+        """
+        Make sure ``directory`` exists and is writable.
+
+        Args:
+            directory: Absolute path of the save directory
+
+        Raises:
+            PermissionError: If the directory cannot be created or written to
+            OSError: For any other filesystem failure
+        """
+        now = self._clock()
+        entry = self._entries.get(directory)
+        if entry is not None:
+            if now - entry.checked_at < self.ttl:
+                return
+            try:
+                if _Identity.of(directory) == entry.identity:
+                    entry.checked_at = now
+                    return
+            except OSError:
+                pass
+
+        with self._lock:
+            probe_directory(directory)
+            self._entries[directory] = _Entry(_Identity.of(directory), now)
+
+    def is_ready(self, directory: str) -> bool:
+        """Return True if ``directory`` has a cached successful check."""
+        return directory in self._entries
+
+    def invalidate(self, directory: Optional[str] = None) -> None:
+        """
+        Forget a cached check so the next ``ensure`` probes again.
+
+        Args:
+            directory: Directory to forget, or None to forget all of them
+        """
+        with self._lock:
+            if directory is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(directory, None)
@@ -0,0 +1,80 @@
+"""
+Coalescing of view events for AutoSaveNewFiles.
+
+Restoring a session fires ``on_load_async`` and ``on_activated_async`` for
+every view, often several times for the same view. ``EventCoalescer``
+collects the views those events refer to, keeps one entry per view, and
+hands them to the plugin in batches once the burst has had ``linger``
+seconds to arrive, so a batch shares one settings snapshot and one check
+of each save directory.
+"""
+
+import threading
+from typing import Callable, Dict, List
+
+# Seconds to collect events before processing them as one batch
+DEFAULT_LINGER = 0.015
+
+
+class EventCoalescer:
+    """
+    Queue of views waiting to be processed, deduplicated by view id.
+
+    Attributes:
+        linger: Seconds between the first queued event and processing
+    """
+
+    def __init__(
+        self,
+        process: Callable[[List[object]], None],
+        schedule: Callable[[Callable[[], None], float], None],
+        linger: float = DEFAULT_LINGER,
+    ):
+        """
+        Args:
+            process: Called with the queued views, in the order they were
+                first queued
+            schedule: Runs a callback after a delay in seconds, on the
+                thread that should process batches
+            linger: Seconds to collect events before processing them
+        """
+        self.linger = linger
+        self._process = process
+        self._schedule = schedule
+        self._pending = {}  # type: Dict[int, object]
+        self._scheduled = False
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def submit(self, view_id: int, view: object) -> bool:
+        """
+        Queue ``view`` for processing.
+
+        Returns:
+            bool: False if the view was already queued
+        """
+        with self._lock:
+            if view_id in self._pending:
+                return False
+            self._pending[view_id] = view
+            if self._scheduled:
+                return True
+            self._scheduled = True
+        self._schedule(self.flush, self.linger)
+        return True
+
+    def discard(self, view_id: int) -> None:
+        """Drop a queued view, for example because it was closed."""
+        with self._lock:
+            self._pending.pop(view_id, None)
+
+    def flush(self) -> None:
+        """Process every queued view now."""
+        with self._lock:
+            batch = list(self._pending.values())
+            self._pending.clear()
+            self._scheduled = False
+        if batch:
+            self._process(batch)
@@ -0,0 +1,424 @@
+"""
+Content-addressed version history of scratch notes for AutoSaveNewFiles.
+
+Every saved version of a managed note is split into content-defined chunks
+(a gear rolling hash picks the boundaries, so an edit only changes the
+chunks around it), and each chunk is stored once, keyed by its BLAKE2b
+digest. ``HistoryStore`` keeps two append-only files in ``.history`` under
+the save directory:
+
+``chunks.pack``
+    One record per distinct chunk: a 40 byte header holding the chunk's
+    digest, the digest of its base chunk (zeros if none), its size and the
+    size of the stored data, followed by the zlib-compressed data. A chunk
+    that replaces one of the previous version is compressed with that chunk
+    as a preset dictionary, so the grown last chunk of an appended note
+    costs about as much as the appended text.
+
+``versions.log``
+    One line per version::
+
+        2024_03_19_123456.md<TAB>time_ns<TAB>size<TAB>prefix<TAB>suffix<TAB>digest,...
+
+    ``prefix`` and ``suffix`` count the chunks shared with the start and end
+    of the note's previous version and the digests list only the chunks in
+    between, so a line grows with the edit, not with the note.
+
+Both files are read once when the store is opened. A crash can at most
+leave a truncated last record, which is ignored and dropped by the next
+append, as in the journal. New chunks and the version line are written
+under an exclusive ``LogLock`` on the pack. Chunk offsets are taken from the
+size of the pack once the lock is held, and a version line is written with
+its whole chunk list once another instance has appended to the log, so
+instances sharing a save directory never record a wrong offset or base.
+"""
+
+import functools
+import hashlib
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from .scratch_leases import LogLock
+
+# Directory holding the history inside the save directory
+HISTORY_DIR = ".history"
+
+PACK_NAME = "chunks.pack"
+LOG_NAME = "versions.log"
+
+# Chunks are cut where the rolling hash matches, within these bounds;
+# about 2 KiB on average
+MIN_CHUNK = 512
+MAX_CHUNK = 8192
+_BOUNDARY_MASK = 0x7FF << 53
+
+# Longest chain of chunks compressed against one another; reading a chunk
+# decompresses its whole chain
+MAX_DELTA_DEPTH = 16
+
+_DIGEST_SIZE = 16
+_NO_BASE = bytes(_DIGEST_SIZE)
+_HEADER = struct.Struct(f">{_DIGEST_SIZE}s{_DIGEST_SIZE}sII")
+_MASK64 = (1 << 64) - 1
+
+
+@functools.lru_cache(maxsize=None)
+def _gear_table() -> Tuple[int, ...]:
+    """Derive the 256 pseudo-random values of the rolling hash, on first use."""
+    return tuple(
+        int.from_bytes(hashlib.blake2b(bytes([i]), digest_size=8).digest(), "big")
+        for i in range(256)
+    )
+
+
+def digest(data: bytes) -> bytes:
+    """Return the content address of a chunk."""
+    return hashlib.blake2b(data, digest_size=_DIGEST_SIZE).digest()
+
+
+def _cut(data: bytes, start: int) -> int:
+    """Return the end of the chunk starting at ``start``."""
+    end = len(data)
+    if end - start <= MIN_CHUNK:
+        return end
+    limit = min(end, start + MAX_CHUNK)
+    gear = _gear_table()
+    h = 0
+    for i in range(start + MIN_CHUNK, limit):
+        h = ((h << 1) + gear[data[i]]) & _MASK64
+        if not h & _BOUNDARY_MASK:
+            return i + 1
+    return limit
+
+
+def split_chunks(
+    data: bytes, previous: Sequence[Tuple[bytes, int]] = ()
+) -> List[Tuple[bytes, int, int]]:
+    """
+    Split ``data`` into content-defined chunks.
+
+    Boundaries only depend on the bytes since the previous boundary, so the
+    leading chunks of ``previous`` that ``data`` still starts with are
+    reused after checking their digest instead of being scanned again.
+
+    Args:
+        data: Content to split
+        previous: ``(digest, size)`` of the chunks of an earlier version
+
+    Returns:
+        List[Tuple[bytes, int, int]]: ``(digest, start, end)`` per chunk
+    """
+    chunks = []  # type: List[Tuple[bytes, int, int]]
+    start = 0
+    # The last chunk of the earlier version was cut by its end, not its content
+    for chunk_digest, size in previous[:-1]:
+        end = start + size
+        if end > len(data) or digest(data[start:end]) != chunk_digest:
+            break
+        chunks.append((chunk_digest, start, end))
+        start = end
+    while start < len(data):
+        end = _cut(data, start)
+        chunks.append((digest(data[start:end]), start, end))
+        start = end
+    return chunks
+
+
+class Version(NamedTuple):
+    """One saved version of a note."""
+
+    time_ns: int
+    size: int
+    chunks: Tuple[bytes, ...]
+
+
+class _Chunk(NamedTuple):
+    """Location of a stored chunk in the pack."""
+
+    offset: int
+    size: int
+    stored: int
+    base: Optional[bytes]
+    depth: int
+
+
+class HistoryStore:
+    """
+    Deduplicated version history of the notes in one directory.
+
+    Attributes:
+        directory: Directory whose notes are recorded
+        path: Location of the history directory
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.path = os.path.join(directory, HISTORY_DIR)
+        self._chunks = {}  # type: Dict[bytes, _Chunk]
+        self._versions = {}  # type: Dict[str, List[Version]]
+        self._pack = None
+        self._pack_lock = LogLock(os.path.join(self.path, PACK_NAME))
+        self._log = None
+        self._log_end = 0
+        self._truncate = {}  # type: Dict[str, Tuple[int, int]]
+        self._lock = threading.Lock()
+        self._load_pack()
+        self._load_log()
+
+    def __contains__(self, path: str) -> bool:
+        return self._relative(path) in self._versions
+
+    def versions(self, path: str) -> List[Version]:
+        """Return the recorded versions of ``path``, oldest first."""
+        return list(self._versions.get(self._relative(path), ()))
+
+    def stored_bytes(self) -> int:
+        """Return the size of the history on disk."""
+        total = 0
+        for name in (PACK_NAME, LOG_NAME):
+            try:
+                total += os.path.getsize(os.path.join(self.path, name))
+            except FileNotFoundError:
+                pass
+        return total
+
+    def snapshot(self, path: str, data: bytes, time_ns: Optional[int] = None) -> bool:
+        """
+        Record ``data`` as the newest version of ``path``.
+
+        Only chunks the store does not hold yet are written.
+
+        Args:
+            path: Absolute path of the note
+            data: Content of the note
+            time_ns: When the version was saved, now if None
+
+        Returns:
+            bool: False if the content equals the newest version, or the
+            name cannot be recorded
+
+        Raises:
+            OSError: If the history cannot be written
+        """
+        name = self._relative(path)
+        if "\n" in name or "\t" in name:
+            return False
+        with self._lock:
+            history = self._versions.get(name, [])
+            last = history[-1].chunks if history else ()
+            previous = [(d, self._chunks[d].size) for d in last if d in self._chunks]
+            chunks = split_chunks(data, previous)
+            digests = tuple(d for d, _, _ in chunks)
+            if history and digests == last:
+                return False
+
+            self._ensure_open()
+            with self._pack_lock.exclusive(), open(
+                os.path.join(self.path, PACK_NAME), "rb"
+            ) as reader:
+                # Other instances may have appended since this one last wrote
+                offset = os.fstat(self._pack.fileno()).st_size
+                cache = {}  # type: Dict[bytes, bytes]
+                for i, (chunk_digest, start, end) in enumerate(chunks):
+                    if chunk_digest in self._chunks:
+                        continue
+                    # The chunk it most likely replaces makes a good dictionary
+                    base = last[min(i, len(last) - 1)] if last else None
+                    if base is not None and (
+                        base not in self._chunks or self._chunks[base].depth >= MAX_DELTA_DEPTH
+                    ):
+                        base = None
+                    zdict = self._read_chunk(reader, base, cache) if base is not None else None
+                    offset = self._write_chunk(offset, chunk_digest, data[start:end], base, zdict)
+
+                # The version line is written under the lock too. Delta lines
+                # resolve against the previous line of the note in the log, so
+                # once another instance has appended, the whole list is written
+                log_size = os.fstat(self._log.fileno()).st_size
+                shared = self._log_end == log_size
+                prefix = 0
+                while (
+                    shared
+                    and prefix < min(len(digests), len(last))
+                    and digests[prefix] == last[prefix]
+                ):
+                    prefix += 1
+                suffix = 0
+                while (
+                    shared
+                    and suffix < min(len(digests), len(last)) - prefix
+                    and digests[-1 - suffix] == last[-1 - suffix]
+                ):
+                    suffix += 1
+                middle = ",".join(d.hex() for d in digests[prefix : len(digests) - suffix])
+                if time_ns is None:
+                    time_ns = time.time_ns()
+                version = Version(time_ns, len(data), digests)
+                line = f"{name}\t{version.time_ns}\t{version.size}\t{prefix}\t{suffix}\t{middle}\n"
+                # One write, so lines of instances sharing the log never interleave
+                self._log_end = log_size + self._log.write(line.encode("utf-8"))
+            self._versions.setdefault(name, []).append(version)
+        return True
+
+    def read(self, version: Version) -> bytes:
+        """
+        Return the content of a recorded version.
+
+        Raises:
+            KeyError: If a chunk of the version is missing from the pack
+            OSError: If the pack cannot be read or a chunk is corrupt
+        """
+        cache = {}  # type: Dict[bytes, bytes]
+        with open(os.path.join(self.path, PACK_NAME), "rb") as f:
+            return b"".join(self._read_chunk(f, d, cache) for d in version.chunks)
+
+    def close(self) -> None:
+        """Close the history files."""
+        with self._lock:
+            for f in (self._pack, self._log):
+                if f is not None:
+                    f.close()
+            self._pack = self._log = None
+            self._pack_lock.close()
+
+    def _read_chunk(self, f, chunk_digest: bytes, cache: Dict[bytes, bytes]) -> bytes:
+        data = cache.get(chunk_digest)
+        if data is not None:
+            return data
+        chunk = self._chunks[chunk_digest]
+        zdict = self._read_chunk(f, chunk.base, cache) if chunk.base is not None else None
+        f.seek(chunk.offset)
+        stored = f.read(chunk.stored)
+        decompressor = zlib.decompressobj(zdict=zdict) if zdict else zlib.decompressobj()
+        try:
+            data = decompressor.decompress(stored) + decompressor.flush()
+        except zlib.error as e:
+            raise OSError(f"Corrupt chunk {chunk_digest.hex()} in {f.name}: {e}") from e
+        if len(data) != chunk.size:
+            raise OSError(f"Corrupt chunk {chunk_digest.hex()} in {f.name}: wrong size")
+        cache[chunk_digest] = data
+        return data
+
+    def _write_chunk(
+        self,
+        offset: int,
+        chunk_digest: bytes,
+        data: bytes,
+        base: Optional[bytes],
+        zdict: Optional[bytes],
+    ) -> int:
+        # Returns the end of the written record; one write keeps it whole
+        if zdict:
+            compressor = zlib.compressobj(zdict=zdict)
+            depth = self._chunks[base].depth + 1
+        else:
+            compressor = zlib.compressobj()
+            base = None
+            depth = 0
+        stored = compressor.compress(data) + compressor.flush()
+        header = _HEADER.pack(chunk_digest, base or _NO_BASE, len(data), len(stored))
+        self._pack.write(header + stored)
+        self._chunks[chunk_digest] = _Chunk(
+            offset + _HEADER.size, len(data), len(stored), base, depth
+        )
+        return offset + _HEADER.size + len(stored)
+
+    def _ensure_open(self) -> None:
+        if self._pack is not None:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        for name, (end, size) in self._truncate.items():
+            path = os.path.join(self.path, name)
+            # Drop a partial record so new records follow the last whole one,
+            # unless another instance has appended since
+            if os.path.getsize(path) == size:
+                os.truncate(path, end)
+        self._truncate.clear()
+        self._pack = open(os.path.join(self.path, PACK_NAME), "ab", buffering=0)
+        self._log = open(os.path.join(self.path, LOG_NAME), "ab", buffering=0)
+
+    def _load_pack(self) -> None:
+        path = os.path.join(self.path, PACK_NAME)
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            total = os.fstat(f.fileno()).st_size
+            offset = 0
+            while offset + _HEADER.size <= total:
+                f.seek(offset)
+                chunk_digest, base, size, stored = _HEADER.unpack(f.read(_HEADER.size))
+                if offset + _HEADER.size + stored > total:
+                    break
+                base_chunk = self._chunks.get(base) if base != _NO_BASE else None
+                self._chunks[chunk_digest] = _Chunk(
+                    offset + _HEADER.size,
+                    size,
+                    stored,
+                    base if base_chunk is not None else None,
+                    base_chunk.depth + 1 if base_chunk is not None else 0,
+                )
+                offset += _HEADER.size + stored
+        if offset < total:
+            self._truncate[PACK_NAME] = (offset, total)
+
+    def _load_log(self) -> None:
+        path = os.path.join(self.path, LOG_NAME)
+        try:
+            with open(path, "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            return
+        end = raw.rfind(b"\n") + 1
+        self._log_end = end
+        if end < len(raw):
+            self._truncate[LOG_NAME] = (end, len(raw))
+        for line in raw[:end].decode("utf-8", "replace").split("\n")[:-1]:
+            try:
+                name, time_ns, size, prefix, suffix, middle = line.split("\t")
+                history = self._versions.get(name, [])
+                last = history[-1].chunks if history else ()
+                prefix, suffix = int(prefix), int(suffix)
+                digests = (
+                    last[:prefix]
+                    + tuple(bytes.fromhex(d) for d in middle.split(",") if d)
+                    + (last[len(last) - suffix :] if suffix else ())
+                )
+                version = Version(int(time_ns), int(size), digests)
+            except ValueError:
+                continue
+            # Kept even if chunks are missing so later lines resolve against it
+            self._versions.setdefault(name, []).append(version)
+
+    def _relative(self, path: str) -> str:
+        return os.path.relpath(path, self.directory).replace(os.sep, "/")
+
+
+class HistoryStores:
+    """Lazily opened ``HistoryStore`` per save directory."""
+
+    def __init__(self):
+        self._stores = {}  # type: Dict[str, HistoryStore]
+        self._lock = threading.Lock()
+
+    def get(self, directory: str) -> HistoryStore:
+        """Return the history of ``directory``, reading it on first use."""
+        store = self._stores.get(directory)
+        if store is None:
+            with self._lock:
+                store = self._stores.get(directory)
+                if store is None:
+                    store = self._stores[directory] = HistoryStore(directory)
+        return store
+
+    def close(self) -> None:
+        """Close every open history."""
+        with self._lock:
+            for store in self._stores.values():
+                store.close()
+            self._stores.clear()
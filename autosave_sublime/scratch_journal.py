@@ -0,0 +1,298 @@
+"""
+Persistent manifest of the scratch files created by AutoSaveNewFiles.
+
+The plugin used to remember the files it created only in memory, so after a
+restart it could no longer clean them up. ``Journal`` keeps an append-only
+log in the save directory with one line per event::
+
+    C<TAB>2024_03_19_123456.md<TAB>2024_03_19_123456
+    O<TAB>2024_03_19_123456.md<TAB>4242
+    X<TAB>2024_03_19_123456.md
+    D<TAB>2024_03_19_123456.md
+
+``C`` and ``D`` record files being created and deleted. ``O`` and ``X``
+record a file being opened and closed by the process with the given id, so
+tools such as ``scripts/autosave_gc.py`` can leave open files alone.
+
+Lines are appended with a single write each, so a crash can at most leave a
+truncated last line, which replay ignores and the next append removes. Once the log holds many more
+records than live files it is compacted by writing the live set to a
+temporary file and renaming it over the log. Compaction replays the log
+again under its ``LogLock`` first, so the records other instances appended
+since this one last read it are kept; appends take no lock.
+"""
+
+import os
+import threading
+from typing import Dict, Iterator, Optional, Set, Tuple
+
+from .scratch_leases import REPLACED_CHECK_INTERVAL, LogLock, replaced
+
+# Name of the journal file inside the save directory
+JOURNAL_NAME = ".autosave_manifest"
+
+# Minimum number of records before the journal is compacted
+COMPACT_MIN_RECORDS = 1000
+
+_CREATE = "C"
+_DELETE = "D"
+_OPEN = "O"
+_CLOSE = "X"
+
+
+def pid_alive(pid: int) -> bool:
+    """
+    Return True if a process with id ``pid`` may still be running.
+
+    Where liveness cannot be determined the process is assumed to be alive.
+    """
+    if pid == os.getpid():
+        return True
+    if os.name != "posix":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+class Journal:
+    """
+    Append-only record of the files managed in one directory.
+
+    Attributes:
+        directory: Directory whose files are recorded
+        path: Location of the journal file
+    """
+
+    def __init__(self, directory: str, name: str = JOURNAL_NAME):
+        self.directory = directory
+        self.path = os.path.join(directory, name)
+        self._entries = {}  # type: Dict[str, str]
+        self._open = {}  # type: Dict[str, int]
+        self._records = 0
+        self._file = None
+        self._unchecked = 0
+        self._truncate_to = None  # type: Optional[Tuple[int, int]]
+        self._lock = threading.Lock()
+        self._log_lock = LogLock(self.path)
+        self.replay()
+
+    def __contains__(self, path: str) -> bool:
+        return self._relative(path) in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        """Yield ``(absolute path, timestamp)`` for every live file."""
+        for name, timestamp in list(self._entries.items()):
+            yield os.path.join(self.directory, name), timestamp
+
+    def timestamp(self, path: str) -> Optional[str]:
+        """Return the recorded timestamp of ``path``, or None if not managed."""
+        return self._entries.get(self._relative(path))
+
+    def replay(self) -> None:
+        """Rebuild the live set from the journal file."""
+        state = self._read()
+        with self._lock:
+            self._entries, self._open, self._records, self._truncate_to = state
+
+    def _read(self) -> Tuple[Dict[str, str], Dict[str, int], int, Optional[Tuple[int, int]]]:
+        entries = {}  # type: Dict[str, str]
+        opened = {}  # type: Dict[str, int]
+        inode = 0
+        try:
+            with open(self.path, "rb") as f:
+                raw = f.read()
+                inode = os.fstat(f.fileno()).st_ino
+        except FileNotFoundError:
+            raw = b""
+        # Anything after the last newline is a partial record left by a crash
+        end = raw.rfind(b"\n") + 1
+        lines = raw[:end].decode("utf-8", "replace").split("\n")
+        lines.pop()
+        # One split per record and no per-record bookkeeping keeps replaying
+        # 100k records well under 100 ms (benchmarks/bench_journal.py)
+        for line in lines:
+            fields = line.split("\t", 2)
+            op = fields[0]
+            if len(fields) < 2:
+                continue
+            if op == _CREATE:
+                entries[fields[1]] = fields[2] if len(fields) == 3 else ""
+            elif op == _DELETE:
+                entries.pop(fields[1], None)
+                opened.pop(fields[1], None)
+            elif op == _OPEN:
+                pid = fields[-1]
+                opened[fields[1]] = int(pid) if pid.isdigit() else 0
+            elif op == _CLOSE:
+                opened.pop(fields[1], None)
+        # Files left open by processes that have since exited are closed
+        alive = {pid: pid_alive(pid) for pid in set(opened.values())}
+        opened = {name: pid for name, pid in opened.items() if name in entries and alive[pid]}
+        return entries, opened, len(lines), (end, inode) if end < len(raw) else None
+
+    def open_files(self) -> Set[str]:
+        """Return the absolute paths of managed files open in any process."""
+        return {os.path.join(self.directory, name) for name in list(self._open)}
+
+    def record_created(self, path: str, timestamp: str) -> None:
+        """Record that ``path`` was created, and opened, by this process."""
+        name = self._relative(path)
+        if "\n" in name or "\t" in name:
+            return
+        timestamp = timestamp.replace("\n", " ").replace("\t", " ")
+        pid = os.getpid()
+        with self._lock:
+            self._entries[name] = timestamp
+            self._open[name] = pid
+            self._append(f"{_CREATE}\t{name}\t{timestamp}\n{_OPEN}\t{name}\t{pid}\n", 2)
+
+    def record_opened(self, path: str) -> None:
+        """Record that a managed file was opened by this process."""
+        name = self._relative(path)
+        pid = os.getpid()
+        with self._lock:
+            if name not in self._entries or self._open.get(name) == pid:
+                return
+            self._open[name] = pid
+            self._append(f"{_OPEN}\t{name}\t{pid}\n")
+
+    def record_closed(self, path: str) -> None:
+        """Record that a managed file was closed."""
+        name = self._relative(path)
+        with self._lock:
+            if self._open.pop(name, None) is None:
+                return
+            self._append(f"{_CLOSE}\t{name}\n")
+        self._maybe_compact()
+
+    def record_deleted(self, path: str) -> None:
+        """Record that ``path`` was deleted."""
+        name = self._relative(path)
+        with self._lock:
+            self._open.pop(name, None)
+            if self._entries.pop(name, None) is None:
+                return
+            self._append(f"{_DELETE}\t{name}\n")
+        self._maybe_compact()
+
+    def record_moved(self, old_path: str, new_path: str) -> None:
+        """Record that a managed file was moved, keeping its timestamp."""
+        old_name, new_name = self._relative(old_path), self._relative(new_path)
+        with self._lock:
+            timestamp = self._entries.pop(old_name, None)
+            if timestamp is None:
+                return
+            self._entries[new_name] = timestamp
+            pid = self._open.pop(old_name, None)
+            record = f"{_DELETE}\t{old_name}\n{_CREATE}\t{new_name}\t{timestamp}\n"
+            if pid is not None:
+                self._open[new_name] = pid
+                record += f"{_OPEN}\t{new_name}\t{pid}\n"
+            self._append(record, record.count("\n"))
+
+    def compact(self) -> None:
+        """Rewrite the journal so it only holds the live files."""
+        with self._lock, self._log_lock.exclusive():
+            self._close()
+            self._entries, self._open, _, _ = self._read()
+            temp_path = self.path + ".tmp"
+            with open(temp_path, "w", encoding="utf-8", newline="\n") as f:
+                for name, timestamp in self._entries.items():
+                    f.write(f"{_CREATE}\t{name}\t{timestamp}\n")
+                for name, pid in self._open.items():
+                    f.write(f"{_OPEN}\t{name}\t{pid}\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+            self._truncate_to = None
+            self._records = len(self._entries) + len(self._open)
+
+    def close(self) -> None:
+        """Close the journal file."""
+        with self._lock:
+            self._close()
+            self._log_lock.close()
+
+    def _maybe_compact(self) -> None:
+        live = len(self._entries) + len(self._open)
+        if self._records >= COMPACT_MIN_RECORDS and self._records > 2 * live:
+            self.compact()
+
+    def _append(self, record: str, count: int = 1) -> None:
+        if self._truncate_to is not None:
+            end, inode = self._truncate_to
+            self._truncate_to = None
+            try:
+                if os.stat(self.path).st_ino == inode:
+                    # Drop the partial record so new records start on a fresh line
+                    os.truncate(self.path, end)
+            except FileNotFoundError:
+                pass
+        if self._file is not None:
+            self._unchecked += 1
+            if self._unchecked >= REPLACED_CHECK_INTERVAL:
+                self._unchecked = 0
+                if replaced(self._file, self.path):
+                    # Another instance compacted the journal
+                    self._close()
+        if self._file is None:
+            self._file = open(self.path, "ab", buffering=0)
+        try:
+            self._file.write(record.encode("utf-8"))
+        except OSError:
+            # Reopened by the next append, in case the journal was replaced
+            self._close()
+            raise
+        self._records += count
+
+    def _close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _relative(self, path: str) -> str:
+        return os.path.relpath(path, self.directory).replace(os.sep, "/")
+
+
+class Journals:
+    """Lazily opened ``Journal`` per save directory."""
+
+    def __init__(self):
+        self._journals = {}  # type: Dict[str, Journal]
+        self._lock = threading.Lock()
+
+    def get(self, directory: str) -> Journal:
+        """Return the journal for ``directory``, replaying it on first use."""
+        journal = self._journals.get(directory)
+        if journal is None:
+            with self._lock:
+                journal = self._journals.get(directory)
+                if journal is None:
+                    journal = self._journals[directory] = Journal(directory)
+        return journal
+
+    def find(self, path: str) -> Optional[Journal]:
+        """Return the open journal whose directory contains ``path``."""
+        for directory, journal in list(self._journals.items()):
+            if path.startswith(directory + os.sep):
+                return journal
+        return None
+
+    def entries(self) -> int:
+        """Return the number of files recorded by the open journals."""
+        return sum(len(journal) for journal in list(self._journals.values()))
+
+    def close(self) -> None:
+        """Close every open journal."""
+        with self._lock:
+            for journal in self._journals.values():
+                journal.close()
+            self._journals.clear()
@@ -0,0 +1,285 @@
+"""
+Leases on managed files shared between Sublime Text instances.
+
+Two instances, or a synced copy of the save directory, used to manage the
+same files without knowing of each other, so one could delete a note the
+other still had open. ``Leases`` keeps one lock file in the save directory
+and holds a POSIX record lock on one byte of it per open managed file::
+
+    offset = blake2b(relative name, 8 bytes) & (2**62 - 1)
+
+An instance takes a shared lock while it has a file open and upgrades it to
+an exclusive lock before deleting the file; the upgrade fails while any other
+instance holds the file, and the file is kept. The lock file is opened once
+per directory, so taking a lease on a new file costs one ``fcntl`` call.
+The kernel drops the locks of a process when it exits or crashes, so a
+lease can never be left behind. Unique file names need no lease: they are
+already reserved with an exclusive create (``NameIndex.claim``).
+
+The append-only logs in the save directory are shared too. Appends take no
+lock, so recording a new file costs no extra calls; an instance compacts a
+log only while holding its ``LogLock``, and reads the log back under it so
+the records other instances appended are kept. An instance checks whether
+its log was ``replaced`` by another instance's compaction every
+``REPLACED_CHECK_INTERVAL`` appends, when a write fails and before it
+compacts, and then reopens it.
+
+Where record locks are not available, on Windows or on file systems that
+refuse them, leases do nothing and every delete goes ahead as before.
+"""
+
+import errno
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+from typing import IO, Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+# Name of the lock file inside the save directory
+LEASES_NAME = ".autosave_leases"
+
+# Lock offsets are kept below 2**62 so offset + 1 fits in any off_t
+_OFFSET_MASK = (1 << 62) - 1
+
+# Errors raised by a non-blocking lock that another process holds
+_CONTENDED = (errno.EAGAIN, errno.EACCES)
+
+# Appends to a shared log between checks that it was not replaced
+REPLACED_CHECK_INTERVAL = 64
+
+
+def replaced(f: IO, path: str) -> bool:
+    """Return True if ``path`` no longer names the file open as ``f``."""
+    try:
+        return os.stat(path).st_ino != os.fstat(f.fileno()).st_ino
+    except FileNotFoundError:
+        return True
+
+
+def lease_offset(name: str) -> int:
+    """Return the byte of the lock file that stands for the relative ``name``."""
+    digest = hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") & _OFFSET_MASK
+
+
+class Leases:
+    """
+    Record locks on the managed files of one save directory.
+
+    Leases are counted per file, so views of the same file in this process
+    share one lock.
+
+    Attributes:
+        directory: Save directory whose files are leased
+        path: Location of the lock file
+    """
+
+    def __init__(self, directory: str, name: str = LEASES_NAME):
+        self.directory = directory
+        self.path = os.path.join(directory, name)
+        self._fd = None  # type: Optional[int]
+        self._disabled = fcntl is None
+        self._held = {}  # type: Dict[str, int]
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._held)
+
+    def open(self) -> None:
+        """
+        Open the lock file ahead of the first lease.
+
+        Raises:
+            OSError: If the lock file cannot be opened or created
+        """
+        with self._lock:
+            if self._fd is None and not self._disabled:
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+
+    def acquire(self, path: str) -> bool:
+        """
+        Take a shared lease on ``path`` for as long as this process has it open.
+
+        Returns:
+            bool: True if the lease is held, False if another process is
+            deleting the file or leases are not available
+        """
+        name = self._relative(path)
+        with self._lock:
+            if name in self._held:
+                self._held[name] += 1
+                return True
+            if not self._lock_byte(name, exclusive=False):
+                return False
+            self._held[name] = 1
+            return True
+
+    def release(self, path: str) -> None:
+        """Drop one lease on ``path``, unlocking it when it was the last one."""
+        name = self._relative(path)
+        with self._lock:
+            count = self._held.get(name)
+            if count is None:
+                return
+            if count > 1:
+                self._held[name] = count - 1
+                return
+            del self._held[name]
+            self._unlock_byte(name)
+
+    def claim(self, path: str) -> bool:
+        """
+        Take the exclusive lease needed to delete ``path``.
+
+        The leases this process holds on the file are replaced by the
+        exclusive one, which ``release`` drops once the file is deleted.
+
+        Returns:
+            bool: True if no other process holds the file, or leases are not
+            available; False if the file must be kept
+        """
+        name = self._relative(path)
+        with self._lock:
+            locked = self._lock_byte(name, exclusive=True)
+            if locked:
+                self._held[name] = 1
+            return locked is not False
+
+    def held_elsewhere(self, path: str) -> bool:
+        """
+        Return True if another process holds a lease on ``path``.
+
+        Meant for tools that hold no leases of their own, such as
+        ``scripts/autosave_gc.py``.
+        """
+        if self._fd is None and not os.path.exists(self.path):
+            return False
+        if not self.claim(path):
+            return True
+        self.release(path)
+        return False
+
+    def close(self) -> None:
+        """Close the lock file, dropping every lease of this process."""
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            self._held.clear()
+
+    def _lock_byte(self, name: str, exclusive: bool) -> Optional[bool]:
+        # True if locked, False if another process holds it, None if unavailable
+        if self._disabled:
+            return None
+        if self._fd is None:
+            try:
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            except OSError:
+                # Retried on the next lease, once the directory can be written
+                return None
+        mode = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        try:
+            fcntl.lockf(self._fd, mode | fcntl.LOCK_NB, 1, lease_offset(name))
+        except OSError as e:
+            if e.errno in _CONTENDED:
+                return False
+            # ENOLCK and the like: the file system has no record locks
+            self._disabled = True
+            return None
+        return True
+
+    def _unlock_byte(self, name: str) -> None:
+        if self._fd is None:
+            return
+        try:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, lease_offset(name))
+        except OSError:
+            pass
+
+    def _relative(self, path: str) -> str:
+        return os.path.relpath(path, self.directory).replace(os.sep, "/")
+
+
+class LeaseStores:
+    """Lazily created ``Leases`` per save directory."""
+
+    def __init__(self):
+        self._leases = {}  # type: Dict[str, Leases]
+        self._lock = threading.Lock()
+
+    def get(self, directory: str) -> Leases:
+        """Return the leases for ``directory``."""
+        leases = self._leases.get(directory)
+        if leases is None:
+            with self._lock:
+                leases = self._leases.setdefault(directory, Leases(directory))
+        return leases
+
+    def held(self) -> int:
+        """Return the number of files leased by this process."""
+        return sum(len(leases) for leases in list(self._leases.values()))
+
+    def close(self) -> None:
+        """Close every lock file."""
+        with self._lock:
+            for leases in self._leases.values():
+                leases.close()
+            self._leases.clear()
+
+
+class LogLock:
+    """
+    Lock between instances compacting the same log file.
+
+    The lock is taken on a ``.lock`` file next to the log, which only this
+    object opens: closing any descriptor of a file drops every record lock
+    the process holds on it. Locks within one process do not exclude each
+    other, so callers still serialize their own threads.
+
+    Attributes:
+        path: Location of the lock file
+    """
+
+    def __init__(self, log_path: str):
+        self.path = log_path + ".lock"
+        self._fd = None  # type: Optional[int]
+        self._disabled = fcntl is None
+
+    @contextmanager
+    def exclusive(self) -> Iterator[None]:
+        """Hold the lock while reading the log back and replacing it."""
+        locked = self._lock()
+        try:
+            yield
+        finally:
+            if locked:
+                try:
+                    fcntl.lockf(self._fd, fcntl.LOCK_UN)
+                except OSError:
+                    pass
+
+    def close(self) -> None:
+        """Close the lock file."""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def _lock(self) -> bool:
+        if self._disabled:
+            return False
+        try:
+            if self._fd is None:
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            # Blocks only while another instance compacts the log
+            fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        except OSError as e:
+            if e.errno in (errno.ENOLCK, errno.EOPNOTSUPP, errno.EINVAL):
+                self._disabled = True
+            # Otherwise retried next time, once the directory can be written
+            return False
+        return True
@@ -0,0 +1,389 @@
+"""
+Filename allocation for AutoSaveNewFiles.
+
+Names are handed out from an in-memory index of the names already taken in
+each save directory. The index is seeded by a single ``os.scandir`` and
+remembers the next free ``_N`` suffix of the latest base names, so resolving
+a collision does not stat one candidate after another. Each name is claimed
+with an exclusive create so two windows or two Sublime Text instances
+sharing a directory can never end up with the same file.
+
+Names themselves come from ``TimestampNamer``, which formats them in memory
+and adds a sequence number when several files are created within the same
+clock tick, so the index normally finds the proposed name free on the first
+try.
+"""
+
+import datetime
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Pattern, Set
+
+# Flags used to reserve a name on disk
+_CLAIM_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+
+# Base names whose next free suffix is remembered; new names are timestamps,
+# so only the latest few are asked for again
+MAX_SUFFIX_HINTS = 64
+
+# Regular expressions matching the output of strftime directives
+_DIRECTIVE_PATTERNS = {
+    "Y": r"\d{4}",
+    "y": r"\d{2}",
+    "m": r"\d{2}",
+    "d": r"\d{2}",
+    "H": r"\d{2}",
+    "I": r"\d{2}",
+    "M": r"\d{2}",
+    "S": r"\d{2}",
+    "f": r"\d{6}",
+    "j": r"\d{3}",
+    "U": r"\d{2}",
+    "W": r"\d{2}",
+    "w": r"\d",
+    "a": r"\w+\.?",
+    "A": r"\w+",
+    "b": r"\w+\.?",
+    "B": r"\w+",
+    "p": r"\w+",
+    "z": r"(?:[+-]\d{4})?",
+    "Z": r"\w*",
+    "%": "%",
+}
+
+
+def timestamp_pattern(timestamp_format: str, fraction_digits: int = 0) -> Pattern:
+    """
+    Compile a regular expression matching timestamps made by the plugin.
+
+    Args:
+        timestamp_format: The ``strftime`` format from the settings
+        fraction_digits: Digits of the ``_fff`` fractional second suffix,
+            0 when timestamps have none
+
+    Returns:
+        Pattern: Expression that fully matches such a timestamp
+    """
+    parts = []
+    for piece in re.split(r"(%.)", timestamp_format):
+        if len(piece) == 2 and piece[0] == "%":
+            parts.append(_DIRECTIVE_PATTERNS.get(piece[1], r".+?"))
+        else:
+            parts.append(re.escape(piece))
+    if fraction_digits:
+        parts.append(r"_\d{%d}" % fraction_digits)
+    return re.compile("".join(parts))
+
+
+def filename_pattern(
+    filename_format: str, timestamp_format: str, extensions: Iterable[str], fraction_digits: int = 0
+) -> Pattern:
+    """
+    Compile a regular expression matching the names of files made by the plugin.
+
+    Only the last component of ``filename_format`` is matched, so the
+    expression applies to names in date-sharded subdirectories too. Names
+    with a ``_N`` suffix only match after ``unsuffixed`` removes it.
+
+    Args:
+        filename_format: The ``filename_format`` from the settings
+        timestamp_format: The ``strftime`` format from the settings
+        extensions: Extensions the files may have, without a leading dot
+        fraction_digits: Digits of the fractional second in timestamps
+
+    Returns:
+        Pattern: Expression that fully matches such a file name
+    """
+    fields = {"timestamp": "\x01t\x01", "extension": "\x01e\x01"}
+    fields.update(year="\x01y\x01", month="\x01m\x01", day="\x01d\x01")
+    name = re.escape(filename_format.rsplit("/", 1)[-1].format(**fields))
+    timestamp = timestamp_pattern(timestamp_format, fraction_digits).pattern
+    extension = "|".join(re.escape(ext) for ext in sorted(set(extensions)))
+    replacements = {
+        fields["timestamp"]: f"(?:{timestamp})",
+        fields["extension"]: f"(?:{extension})",
+        fields["year"]: r"\d{4}",
+        fields["month"]: r"\d{2}",
+        fields["day"]: r"\d{2}",
+    }
+    for field, replacement in replacements.items():
+        name = name.replace(field, replacement)
+    return re.compile(name)
+
+
+def unsuffixed(filename: str) -> str:
+    """Return ``filename`` without the ``_N`` suffix ``suffixed`` adds, if it has one."""
+    base, ext = os.path.splitext(filename)
+    head, sep, counter = base.rpartition("_")
+    return head + ext if sep and head and counter.isdigit() else filename
+
+
+def format_filename(
+    filename_format: str, timestamp: str, extension: str, now: datetime.datetime
+) -> str:
+    """
+    Expand ``filename_format`` into a path relative to the save directory.
+
+    Besides ``{timestamp}`` and ``{extension}`` the format may use ``{year}``,
+    ``{month}`` and ``{day}``, and may contain ``/`` to place files in
+    date-sharded subdirectories such as ``{year}/{month}/{timestamp}.{extension}``.
+
+    Returns:
+        str: Relative path using the platform's separator
+    """
+    name = filename_format.format(
+        timestamp=timestamp,
+        extension=extension,
+        year=f"{now.year:04d}",
+        month=f"{now.month:02d}",
+        day=f"{now.day:02d}",
+    )
+    return os.path.join(*name.split("/"))
+
+
+def suffixed(filename: str, counter: int) -> str:
+    """
+    Return ``filename`` with a ``_counter`` suffix before its extension.
+
+    A counter of 0 returns the name unchanged.
+    """
+    if counter == 0:
+        return filename
+    base, ext = os.path.splitext(filename)
+    return f"{base}_{counter}{ext}"
+
+
+class GeneratedName(NamedTuple):
+    """A timestamp and the file name derived from it."""
+
+    timestamp: str
+    filename: str
+
+
+class TimestampNamer:
+    """
+    Generator of unique, strictly increasing timestamp-based file names.
+
+    The date part of the timestamp and everything in ``filename_format``
+    except the timestamp are expanded once per second; within the second
+    the fractional part is appended as an integer, so nothing is sliced or
+    reformatted per call. Names requested within the same clock tick, or
+    after the clock went backwards, reuse the last tick with an increasing
+    ``_N`` sequence suffix, so names never repeat within the process.
+
+    Attributes:
+        fraction_digits: Digits of the fractional second in each timestamp
+    """
+
+    def __init__(
+        self,
+        timestamp_format: str,
+        filename_format: str,
+        extension: str,
+        fraction_digits: int = 0,
+        clock: Callable[[], int] = time.time_ns,
+    ):
+        """
+        Args:
+            timestamp_format: ``strftime`` format of the timestamp
+            filename_format: Format with ``{timestamp}``, ``{extension}`` and
+                optionally ``{year}``, ``{month}``, ``{day}`` and ``/``
+            extension: File extension without a leading dot
+            fraction_digits: 0, 3 or 6 digits of fractional seconds
+            clock: Returns the current time in nanoseconds since the epoch
+        """
+        self.fraction_digits = fraction_digits
+        self._timestamp_format = timestamp_format
+        self._filename_format = filename_format
+        self._extension = extension
+        self._clock = clock
+        self._ticks_per_second = 10**fraction_digits
+        self._tick_ns = 1_000_000_000 // self._ticks_per_second
+        self._second = None  # type: Optional[int]
+        self._date = ""
+        self._name_parts = []  # type: List[str]
+        self._last_tick = -1
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config, clock: Callable[[], int] = time.time_ns) -> "TimestampNamer":
+        """Build a namer from a ``Config`` snapshot."""
+        return cls(
+            config.timestamp_format,
+            config.filename_format,
+            config.default_extension,
+            config.fraction_digits,
+            clock,
+        )
+
+    def next(self) -> GeneratedName:
+        """Return the next name; never touches the filesystem."""
+        with self._lock:
+            tick = self._clock() // self._tick_ns
+            if tick <= self._last_tick:
+                tick = self._last_tick
+                self._sequence += 1
+            else:
+                self._last_tick = tick
+                self._sequence = 0
+            second, fraction = divmod(tick, self._ticks_per_second)
+            if second != self._second:
+                self._start_second(second)
+            timestamp = self._date
+            if self.fraction_digits:
+                timestamp += "_" + str(fraction).zfill(self.fraction_digits)
+            filename = timestamp.join(self._name_parts)
+            return GeneratedName(timestamp, suffixed(filename, self._sequence))
+
+    def directory(self) -> str:
+        """Return the directory of the next name, relative to the save directory."""
+        now = datetime.datetime.fromtimestamp(self._clock() // 1_000_000_000)
+        return os.path.dirname(format_filename(self._filename_format, "", self._extension, now))
+
+    def _start_second(self, second: int) -> None:
+        now = datetime.datetime.fromtimestamp(second)
+        self._second = second
+        self._date = now.strftime(self._timestamp_format)
+        # Split the expanded name around the timestamp, which is all that
+        # changes until the next second
+        name = format_filename(self._filename_format, "\0", self._extension, now)
+        self._name_parts = name.split("\0")
+
+
+class NameIndex:
+    """
+    Index of the file names taken in one directory.
+
+    Attributes:
+        directory: Directory the index describes
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._taken = set()  # type: Set[str]
+        self._next_suffix = {}  # type: Dict[str, int]
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                self._taken.add(entry.name)
+
+    def __contains__(self, filename: str) -> bool:
+        return filename in self._taken
+
+    def __len__(self) -> int:
+        return len(self._taken)
+
+    def suffix_hints(self) -> int:
+        """Return the number of base names whose next free suffix is remembered."""
+        return len(self._next_suffix)
+
+    def claim(self, filename: str, content: bytes = b"") -> str:
+        """
+        Reserve a unique name derived from ``filename`` and create the file.
+
+        Args:
+            filename: Preferred file name, without directory
+            content: Initial file content, written in the same exclusive create
+
+        Returns:
+            str: Full path of the reserved file
+
+        Raises:
+            OSError: If the file cannot be created for a reason other than
+                the name being taken
+        """
+        with self._lock:
+            counter = self._next_suffix.get(filename, 0)
+            while True:
+                candidate = suffixed(filename, counter)
+                counter += 1
+                if candidate in self._taken:
+                    continue
+                path = os.path.join(self.directory, candidate)
+                try:
+                    fd = os.open(path, _CLAIM_FLAGS, 0o644)
+                except FileExistsError:
+                    # Created behind our back by another window or process
+                    self._taken.add(candidate)
+                    continue
+                try:
+                    remaining = memoryview(content)
+                    while remaining:
+                        remaining = remaining[os.write(fd, remaining) :]
+                except OSError:
+                    os.close(fd)
+                    os.remove(path)
+                    raise
+                os.close(fd)
+                self._taken.add(candidate)
+                # Moved to the end, so the oldest hint is dropped first
+                self._next_suffix.pop(filename, None)
+                self._next_suffix[filename] = counter
+                if len(self._next_suffix) > MAX_SUFFIX_HINTS:
+                    del self._next_suffix[next(iter(self._next_suffix))]
+                return path
+
+    def add(self, filename: str) -> None:
+        """Record a name that was created outside of ``claim``."""
+        with self._lock:
+            self._taken.add(filename)
+
+    def release(self, filename: str) -> None:
+        """Forget a name whose file has been deleted."""
+        with self._lock:
+            self._taken.discard(filename)
+            # The base name itself is free again
+            self._next_suffix.pop(filename, None)
+
+
+class NameIndexes:
+    """Lazily created ``NameIndex`` per directory."""
+
+    def __init__(self):
+        self._indexes = {}  # type: Dict[str, NameIndex]
+        self._lock = threading.Lock()
+
+    def get(self, directory: str) -> NameIndex:
+        """Return the index for ``directory``, scanning it on first use."""
+        index = self._indexes.get(directory)
+        if index is None:
+            with self._lock:
+                index = self._indexes.get(directory)
+                if index is None:
+                    index = self._indexes[directory] = NameIndex(directory)
+        return index
+
+    def claim(self, directory: str, filename: str, content: bytes = b"") -> str:
+        """Reserve a unique name in ``directory``; see ``NameIndex.claim``."""
+        return self.get(directory).claim(filename, content)
+
+    def add(self, path: str) -> None:
+        """Record the name of a file created elsewhere if its directory is indexed."""
+        index = self._indexes.get(os.path.dirname(path))
+        if index is not None:
+            index.add(os.path.basename(path))
+
+    def release(self, path: str) -> None:
+        """Forget the name of a deleted file if its directory is indexed."""
+        index = self._indexes.get(os.path.dirname(path))
+        if index is not None:
+            index.release(os.path.basename(path))
+
+    def names(self) -> int:
+        """Return the number of names held by all indexes."""
+        return sum(len(index) for index in list(self._indexes.values()))
+
+    def suffix_hints(self) -> int:
+        """Return the number of suffix hints held by all indexes."""
+        return sum(index.suffix_hints() for index in list(self._indexes.values()))
+
+    def invalidate(self, directory: Optional[str] = None) -> None:
+        """Drop the index for ``directory``, or all indexes, to force a rescan."""
+        with self._lock:
+            if directory is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(directory, None)
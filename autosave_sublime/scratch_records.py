@@ -0,0 +1,150 @@
+"""
+Compact per-view tracking of managed files for AutoSaveNewFiles.
+
+The plugin used to keep every file it managed in a set of paths and a dict
+of path to timestamp for the whole life of the editor, storing each path
+twice, so a long session grew by a few hundred bytes per note. The journal
+already remembers the managed files of each save directory, so
+``RecordStore`` only tracks the files open in a view: one ``Record`` per
+view id, holding the file's directory (shared between all records in that
+directory), its name, its timestamp and the digest of its last autosave.
+A record is dropped when its view closes or its file disappears, so memory
+use follows the number of open views, not the number of notes created.
+"""
+
+import os
+import sys
+import threading
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+
+class Record:
+    """A managed file open in a view."""
+
+    __slots__ = ("directory", "name", "timestamp", "content_hash")
+
+    def __init__(self, directory: str, name: str, timestamp: str):
+        self.directory = directory
+        self.name = name
+        self.timestamp = timestamp
+        self.content_hash = None  # type: Optional[bytes]
+
+    @property
+    def path(self) -> str:
+        """Absolute path of the file."""
+        return os.path.join(self.directory, self.name)
+
+
+class RecordStore:
+    """Records of the managed files open in views, keyed by view id."""
+
+    def __init__(self):
+        self._records = {}  # type: Dict[int, Record]
+        # Views per file name, so changes reported by path find their records
+        self._by_name = {}  # type: Dict[str, List[int]]
+        # One shared string per directory
+        self._directories = {}  # type: Dict[str, str]
+        self._lock = threading.Lock()
+
+    def __contains__(self, view_id: int) -> bool:
+        return view_id in self._records
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def get(self, view_id: int) -> Optional[Record]:
+        """Return the record of the file open in ``view_id``, if managed."""
+        return self._records.get(view_id)
+
+    def add(self, view_id: int, path: str, timestamp: str) -> Record:
+        """Start tracking the managed file ``path`` open in ``view_id``."""
+        directory, name = os.path.split(path)
+        with self._lock:
+            self._remove(view_id)
+            directory = self._directories.setdefault(directory, directory)
+            record = self._records[view_id] = Record(directory, name, timestamp)
+            self._by_name.setdefault(name, []).append(view_id)
+        return record
+
+    def remove(self, view_id: int) -> Optional[Record]:
+        """Stop tracking the file open in ``view_id``."""
+        with self._lock:
+            return self._remove(view_id)
+
+    def find(self, path: str) -> List[int]:
+        """Return the ids of the views ``path`` is open in."""
+        directory, name = os.path.split(path)
+        return [
+            view_id
+            for view_id in self._by_name.get(name, ())
+            if self._records[view_id].directory == directory
+        ]
+
+    def discard_path(self, path: str) -> List[Record]:
+        """Stop tracking ``path`` in every view, returning the dropped records."""
+        with self._lock:
+            return [self._remove(view_id) for view_id in self.find(path)]
+
+    def move(self, old_path: str, new_path: str) -> List[Record]:
+        """Follow a renamed file in every view it is open in."""
+        directory, name = os.path.split(new_path)
+        with self._lock:
+            moved = []  # type: List[Record]
+            for view_id in self.find(old_path):
+                record = self._remove(view_id)
+                record.directory = self._directories.setdefault(directory, directory)
+                record.name = name
+                record.content_hash = None
+                self._records[view_id] = record
+                self._by_name.setdefault(name, []).append(view_id)
+                moved.append(record)
+            return moved
+
+    def paths(self) -> Set[str]:
+        """Return the paths of all tracked files."""
+        return {record.path for record in list(self._records.values())}
+
+    def items(self) -> Iterator[Tuple[int, Record]]:
+        """Yield ``(view id, record)`` pairs."""
+        return iter(list(self._records.items()))
+
+    def clear(self) -> None:
+        """Forget every record."""
+        with self._lock:
+            self._records.clear()
+            self._by_name.clear()
+            self._directories.clear()
+
+    def memory_usage(self) -> Dict[str, int]:
+        """
+        Estimate the memory held by the records.
+
+        Returns:
+            Dict[str, int]: Number of records and directories, and the
+            approximate size in bytes of the records, the strings they hold
+            and the dictionaries indexing them
+        """
+        records = list(self._records.values())
+        size = sum(map(sys.getsizeof, (self._records, self._by_name, self._directories)))
+        size += sum(sys.getsizeof(ids) for ids in list(self._by_name.values()))
+        size += sum(sys.getsizeof(d) for d in list(self._directories))
+        for record in records:
+            size += sys.getsizeof(record) + sys.getsizeof(record.name)
+            size += sys.getsizeof(record.timestamp)
+            if record.content_hash is not None:
+                size += sys.getsizeof(record.content_hash)
+        return {
+            "records": len(records),
+            "directories": len(self._directories),
+            "bytes": size,
+        }
+
+    def _remove(self, view_id: int) -> Optional[Record]:
+        record = self._records.pop(view_id, None)
+        if record is None:
+            return None
+        ids = self._by_name[record.name]
+        ids.remove(view_id)
+        if not ids:
+            del self._by_name[record.name]
+        return record
@@ -0,0 +1,125 @@
+"""
+Routing of new scratch files for AutoSaveNewFiles.
+
+The ``rules`` setting sends new files to a subdirectory of the save
+directory, with their own extension and header, depending on the window
+they are opened in, the window's project folder, or the view's syntax.
+``Router`` compiles the rules once per settings change into one dictionary
+per kind of match, so routing a new file is at most a few dictionary
+lookups however many rules there are. Rules are checked by window id
+first, then project folder, then syntax; within a kind the first rule for
+a key wins.
+
+Rules with the same directory and extension share a ``TimestampNamer``, so
+their names stay unique and increasing.
+"""
+
+import os
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+from .scratch_config import Config
+from .scratch_names import TimestampNamer
+
+
+class Route(NamedTuple):
+    """
+    Where and how new files matched by a rule are created.
+
+    Attributes:
+        namer: Generates the file names, relative to the save directory
+        header: First line of new files with ``{timestamp}``, or empty for none
+    """
+
+    namer: TimestampNamer
+    header: str
+
+    def render_header(self, timestamp: str) -> str:
+        """Return the first line of a new file named after ``timestamp``."""
+        return self.header.format(timestamp=timestamp) if self.header else ""
+
+
+def syntax_name(syntax: str) -> str:
+    """Return the name of a syntax file, such as ``Python`` for ``Python.sublime-syntax``."""
+    return os.path.splitext(syntax.rsplit("/", 1)[-1])[0]
+
+
+class Router:
+    """
+    Lookup tables built from the ``rules`` setting.
+
+    Attributes:
+        default: Route of files no rule matches
+    """
+
+    def __init__(
+        self,
+        default: Route,
+        windows: Dict[int, Route],
+        projects: Dict[str, Route],
+        syntaxes: Dict[str, Route],
+    ):
+        self.default = default
+        self._windows = windows
+        self._projects = projects
+        self._syntaxes = syntaxes
+
+    def __bool__(self) -> bool:
+        return bool(self._windows or self._projects or self._syntaxes)
+
+    @classmethod
+    def from_config(cls, config: Config) -> "Router":
+        """Compile the rules of a ``Config`` snapshot."""
+        namers = {}  # type: Dict[Tuple[str, str], TimestampNamer]
+
+        def route(directory: str, extension: str, header: Optional[str]) -> Route:
+            filename_format = config.filename_format
+            if directory:
+                filename_format = directory + "/" + filename_format
+            extension = extension or config.default_extension
+            namer = namers.get((filename_format, extension))
+            if namer is None:
+                namer = namers[filename_format, extension] = TimestampNamer(
+                    config.timestamp_format,
+                    filename_format,
+                    extension,
+                    config.fraction_digits,
+                )
+            if header is None:
+                header = "{timestamp}" if config.insert_timestamp else ""
+            return Route(namer, header)
+
+        default = route("", "", None)
+        tables = {
+            "window": {},
+            "project": {},
+            "syntax": {},
+        }  # type: Dict[str, Dict]
+        for rule in config.rules:
+            table = tables[rule.match]
+            if rule.key not in table:
+                table[rule.key] = route(rule.directory, rule.extension, rule.header)
+        return cls(default, tables["window"], tables["project"], tables["syntax"])
+
+    def route(
+        self, window_id: Optional[int], folders: Iterable[str], syntax: Optional[str]
+    ) -> Route:
+        """
+        Return the route of a new file.
+
+        Args:
+            window_id: Id of the view's window, or None if it has none
+            folders: The window's project folders
+            syntax: Resource path of the view's syntax, if any
+
+        Returns:
+            Route: The route of the first matching rule, or ``default``
+        """
+        route = self._windows.get(window_id) if window_id is not None else None
+        if route is None and self._projects:
+            for folder in folders:
+                route = self._projects.get(folder)
+                if route is not None:
+                    break
+        if route is None and syntax:
+            route = self._syntaxes.get(syntax) or self._syntaxes.get(syntax_name(syntax))
+        return route if route is not None else self.default
@@ -0,0 +1,257 @@
+"""
+Full-text search over scratch notes for AutoSaveNewFiles.
+
+``SearchIndex`` keeps an SQLite FTS5 index of the notes in a save directory.
+The plugin updates it one file at a time after each save of a managed file,
+and ``scripts/autosave_index.py`` rebuilds it in bulk. Python builds without
+``sqlite3`` or without FTS5 simply report that search is unavailable.
+
+Database errors, such as a locked or corrupt index, are raised as
+``OSError`` like every other storage failure of the plugin.
+"""
+
+import contextlib
+import functools
+import os
+import threading
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+# Name of the index database inside the save directory
+INDEX_NAME = ".autosave_index.sqlite3"
+
+# Only the start of very large files is indexed
+MAX_INDEXED_BYTES = 1 << 20
+
+# Number of notes written per group of executemany calls during a rebuild
+BATCH_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS notes USING fts5(body, tokenize='unicode61');
+"""
+
+
+class SearchResult(NamedTuple):
+    """One matching note."""
+
+    path: str
+    snippet: str
+
+
+@functools.lru_cache(maxsize=None)
+def _sqlite3():
+    """Import ``sqlite3`` on first use, since it is slow to import; None if missing."""
+    try:
+        import sqlite3
+    except ImportError:  # pragma: no cover - depends on the Python build
+        return None
+    return sqlite3
+
+
+@functools.lru_cache(maxsize=None)
+def search_available() -> bool:
+    """Return True if this Python has SQLite with FTS5 support."""
+    sqlite3 = _sqlite3()
+    if sqlite3 is None:
+        return False
+    try:
+        connection = sqlite3.connect(":memory:")
+        try:
+            connection.execute("CREATE VIRTUAL TABLE t USING fts5(x)")
+        finally:
+            connection.close()
+    except sqlite3.Error:
+        return False
+    return True
+
+
+@contextlib.contextmanager
+def _database_errors(path: str) -> Iterator[None]:
+    """Raise SQLite errors from the block as ``OSError``."""
+    try:
+        yield
+    except _sqlite3().Error as e:
+        raise OSError(f"Search index {path} failed: {e}") from e
+
+
+def read_note(path: str) -> Tuple[str, int]:
+    """
+    Read the indexable text of a note.
+
+    Returns:
+        Tuple[str, int]: The text and the file's modification time in ns
+
+    Raises:
+        OSError: If the file cannot be read
+    """
+    with open(path, "rb") as f:
+        mtime_ns = os.fstat(f.fileno()).st_mtime_ns
+        data = f.read(MAX_INDEXED_BYTES)
+    return data.decode("utf-8", "replace"), mtime_ns
+
+
+def fts_query(text: str) -> str:
+    """
+    Turn free text into an FTS5 query.
+
+    Every word is quoted so punctuation cannot cause syntax errors, and the
+    last word matches as a prefix so results appear while typing.
+    """
+    words = ['"' + word.replace('"', '""') + '"' for word in text.split()]
+    if words:
+        words[-1] += "*"
+    return " ".join(words)
+
+
+class SearchIndex:
+    """
+    FTS5 index of the notes in one save directory.
+
+    All methods may be called from any thread; access to the connection is
+    serialized.
+
+    Attributes:
+        directory: Save directory whose notes are indexed
+        path: Location of the index database
+    """
+
+    def __init__(self, directory: str, name: str = INDEX_NAME):
+        sqlite3 = _sqlite3()
+        if sqlite3 is None:
+            raise OSError("sqlite3 is not available in this Python")
+        self.directory = directory
+        self.path = os.path.join(directory, name)
+        self._lock = threading.Lock()
+        try:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        except sqlite3.Error as e:
+            raise OSError(f"Cannot open search index {self.path}: {e}") from e
+        try:
+            self._connection.executescript(_SCHEMA)
+        except sqlite3.Error as e:
+            self._connection.close()
+            raise OSError(f"Cannot open search index {self.path}: {e}") from e
+
+    def __len__(self) -> int:
+        with _database_errors(self.path), self._lock:
+            return self._connection.execute("SELECT count(*) FROM files").fetchone()[0]
+
+    def update(self, path: str, text: str, mtime_ns: int = 0) -> None:
+        """Add or replace the text indexed for ``path``."""
+        with _database_errors(self.path), self._lock, self._connection:
+            self._write_batch([(path, text, mtime_ns)])
+
+    def update_file(self, path: str) -> None:
+        """Re-read ``path`` from disk and index it."""
+        text, mtime_ns = read_note(path)
+        self.update(path, text, mtime_ns)
+
+    def update_many(self, notes: Iterable[Tuple[str, str, int]]) -> int:
+        """
+        Index many ``(path, text, mtime_ns)`` notes in a single transaction.
+
+        Returns:
+            int: Number of notes indexed
+        """
+        count = 0
+        with _database_errors(self.path), self._lock, self._connection:
+            batch = []  # type: List[Tuple[str, str, int]]
+            for note in notes:
+                batch.append(note)
+                if len(batch) == BATCH_SIZE:
+                    count += self._write_batch(batch)
+                    batch = []
+            count += self._write_batch(batch)
+        return count
+
+    def remove(self, path: str) -> None:
+        """Drop ``path`` from the index."""
+        with _database_errors(self.path), self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT id FROM files WHERE path = ?", (path,)
+            ).fetchone()
+            if row is not None:
+                self._connection.execute("DELETE FROM notes WHERE rowid = ?", row)
+                self._connection.execute("DELETE FROM files WHERE id = ?", row)
+
+    def clear(self) -> None:
+        """Remove every note from the index."""
+        with _database_errors(self.path), self._lock, self._connection:
+            self._connection.execute("DELETE FROM notes")
+            self._connection.execute("DELETE FROM files")
+
+    def search(self, text: str, limit: int = 50) -> List[SearchResult]:
+        """
+        Return the notes best matching ``text``, best match first.
+
+        Args:
+            text: Words to look for
+            limit: Maximum number of results
+
+        Raises:
+            OSError: If the index cannot be read
+        """
+        query = fts_query(text)
+        if not query:
+            return []
+        with _database_errors(self.path), self._lock:
+            rows = self._connection.execute(
+                "SELECT files.path, snippet(notes, 0, '', '', '...', 12) "
+                "FROM notes JOIN files ON files.id = notes.rowid "
+                "WHERE notes MATCH ? ORDER BY rank LIMIT ?",
+                (query, limit),
+            ).fetchall()
+        return [SearchResult(path, " ".join(snippet.split())) for path, snippet in rows]
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._connection.close()
+
+    def _write_batch(self, batch: List[Tuple[str, str, int]]) -> int:
+        execute = self._connection.executemany
+        execute(
+            "INSERT INTO files (path, mtime_ns) VALUES (?, ?) "
+            "ON CONFLICT (path) DO UPDATE SET mtime_ns = excluded.mtime_ns",
+            [(path, mtime_ns) for path, _, mtime_ns in batch],
+        )
+        execute(
+            "DELETE FROM notes WHERE rowid = (SELECT id FROM files WHERE path = ?)",
+            [(path,) for path, _, _ in batch],
+        )
+        execute(
+            "INSERT INTO notes (rowid, body) SELECT id, ? FROM files WHERE path = ?",
+            [(text, path) for path, text, _ in batch],
+        )
+        return len(batch)
+
+
+class SearchIndexes:
+    """Lazily opened ``SearchIndex`` per save directory."""
+
+    def __init__(self):
+        self._indexes = {}  # type: Dict[str, Optional[SearchIndex]]
+        self._lock = threading.Lock()
+
+    def get(self, directory: str) -> Optional[SearchIndex]:
+        """Return the index for ``directory``, or None if search is unavailable."""
+        index = self._indexes.get(directory)
+        if index is None and directory not in self._indexes:
+            with self._lock:
+                if directory not in self._indexes:
+                    available = search_available()
+                    self._indexes[directory] = SearchIndex(directory) if available else None
+                index = self._indexes[directory]
+        return index
+
+    def close(self) -> None:
+        """Close every open index."""
+        with self._lock:
+            for index in self._indexes.values():
+                if index is not None:
+                    index.close()
+            self._indexes.clear()
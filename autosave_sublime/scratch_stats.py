@@ -0,0 +1,178 @@
+"""
+Hot-path instrumentation for AutoSaveNewFiles.
+
+``Stats`` keeps counters and latency histograms for the plugin's event
+handlers and for the phases of their work (loading settings, checking the
+save directory, resolving name collisions, saving, inserting the header,
+deleting). It is switched on and off from the ``stats`` setting; while it is
+off every call returns after a single attribute check and ``timer`` hands
+out a shared no-op context manager, so the handlers pay next to nothing.
+"""
+
+import contextlib
+import threading
+import time
+from typing import Any, ContextManager, Dict, List
+
+# Histogram buckets hold durations up to 1, 2, 4, ... microseconds; the last
+# bucket takes everything above about 33 seconds
+BUCKET_COUNT = 26
+
+_NULL_TIMER = contextlib.nullcontext()
+
+
+class Histogram:
+    """
+    Latency histogram with power-of-two microsecond buckets.
+
+    Attributes:
+        count: Number of recorded durations
+        total: Sum of the recorded durations in seconds
+        max: Longest recorded duration in seconds
+        buckets: Number of durations per bucket
+    """
+
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * BUCKET_COUNT  # type: List[int]
+
+    def add(self, seconds: float) -> None:
+        """Record one duration."""
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[min(int(seconds * 1e6).bit_length(), BUCKET_COUNT - 1)] += 1
+
+    def percentile(self, q: float) -> float:
+        """
+        Estimate the ``q``-th percentile in seconds.
+
+        Returns the upper bound of the bucket holding the percentile, capped
+        at the longest recorded duration.
+        """
+        rank = q / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return min((1 << index) / 1e6, self.max)
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Summarize the histogram in milliseconds."""
+        return {
+            "count": self.count,
+            "total_ms": self.total * 1e3,
+            "mean_ms": self.total * 1e3 / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(50) * 1e3,
+            "p95_ms": self.percentile(95) * 1e3,
+            "p99_ms": self.percentile(99) * 1e3,
+            "max_ms": self.max * 1e3,
+        }
+
+
+class _Timer:
+    """Context manager recording the time spent in its block."""
+
+    __slots__ = ("_stats", "_name", "_start")
+
+    def __init__(self, stats: "Stats", name: str):
+        self._stats = stats
+        self._name = name
+
+    def __enter__(self) -> None:
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        self._stats.observe(self._name, time.perf_counter() - self._start)
+
+
+class Stats:
+    """
+    Thread-safe counters and latency histograms.
+
+    Attributes:
+        enabled: Whether anything is recorded
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._counters = {}  # type: Dict[str, int]
+        self._histograms = {}  # type: Dict[str, Histogram]
+        self._since = time.time()
+        self._lock = threading.Lock()
+
+    def count(self, name: str, n: int = 1) -> None:
+        """Add ``n`` to the counter ``name``."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Record a duration in the histogram ``name``."""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.add(seconds)
+
+    def timer(self, name: str) -> ContextManager[None]:
+        """Return a context manager recording its duration in ``name``."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def reset(self) -> None:
+        """Forget everything recorded so far."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._since = time.time()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the recorded statistics as JSON-serializable data."""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "since": self._since,
+                "counters": dict(sorted(self._counters.items())),
+                "latency": {
+                    name: histogram.to_dict()
+                    for name, histogram in sorted(self._histograms.items())
+                },
+            }
+
+    def format_table(self) -> str:
+        """Render the recorded statistics as a plain text table."""
+        snapshot = self.snapshot()
+        lines = [
+            "AutoSaveNewFiles stats since "
+            + time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(snapshot["since"]))
+            + ("" if snapshot["enabled"] else " (collection is off)")
+        ]
+        if snapshot["latency"]:
+            lines.append(
+                f"{'latency':<32} {'count':>7} {'mean ms':>9} {'p50 ms':>9}"
+                f" {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+            )
+            for name, summary in snapshot["latency"].items():
+                lines.append(
+                    f"{name:<32} {summary['count']:>7} {summary['mean_ms']:>9.3f}"
+                    f" {summary['p50_ms']:>9.3f} {summary['p95_ms']:>9.3f}"
+                    f" {summary['p99_ms']:>9.3f} {summary['max_ms']:>9.3f}"
+                )
+        if snapshot["counters"]:
+            lines.append(f"{'counter':<32} {'value':>7}")
+            for name, value in snapshot["counters"].items():
+                lines.append(f"{name:<32} {value:>7}")
+        if len(lines) == 1:
+            lines.append("Nothing recorded yet")
+        return "\n".join(lines)
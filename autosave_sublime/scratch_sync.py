@@ -0,0 +1,429 @@
+"""
+Write-behind staging of scratch files for slow or remote save directories.
+
+With a network share as the save directory every new tab used to wait for
+several round trips to the server. In staging mode the plugin creates and
+edits files in a fast local spool directory instead, and ``Syncer`` copies
+them to the save directory on a worker thread:
+
+- a file is copied under the same relative name, or with the next free
+  ``_N`` suffix if that name is already taken remotely
+- later copies of the same file replace its remote copy atomically
+- deleting an empty file locally deletes its remote copy
+- failed operations are retried with exponential backoff until they succeed
+
+The remote name and the modification time of the last copied content of
+each file are kept in an append-only map in the spool directory, so a
+restart only copies files that changed since their last copy. All remote
+file operations go through ``Remote``, which tests replace to inject
+latency and failures.
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .scratch_autosave import atomic_write
+from .scratch_leases import REPLACED_CHECK_INTERVAL, LogLock, replaced
+from .scratch_names import suffixed
+from .scratch_stats import Stats
+
+# Name of the map of synced files inside the spool directory
+SYNC_MAP_NAME = ".autosave_sync"
+
+# Minimum number of records before the map is compacted
+COMPACT_MIN_RECORDS = 1000
+
+# Seconds to collect operations before processing them
+DEFAULT_LINGER = 0.05
+
+# Seconds before the first retry, doubled up to the maximum
+DEFAULT_RETRY_DELAY = 0.5
+DEFAULT_MAX_RETRY_DELAY = 60.0
+
+# Failed attempts of a file before it is reported; retries continue
+DEFAULT_REPORT_AFTER = 3
+
+_COPY = "copy"
+_DELETE = "delete"
+_CLAIM_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0)
+
+Failure = Tuple[str, OSError]
+
+
+class Remote:
+    """
+    File operations on the directory files are synced to.
+
+    Names are relative to ``directory`` and use ``/`` as separator.
+    """
+
+    def __init__(self, directory: str, fsync: str = "file"):
+        self.directory = directory
+        self.fsync = fsync
+
+    def claim(self, name: str, data: bytes) -> str:
+        """
+        Create a new file named ``name``, or a suffixed name if it is taken.
+
+        Returns:
+            str: The name the file was created as
+        """
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        counter = 0
+        while True:
+            candidate = suffixed(name, counter)
+            counter += 1
+            try:
+                fd = os.open(self.path(candidate), _CLAIM_FLAGS, 0o644)
+            except FileExistsError:
+                continue
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+            except OSError:
+                # Free the name so the retry claims it again
+                try:
+                    os.remove(self.path(candidate))
+                except OSError:
+                    pass
+                raise
+            return candidate
+
+    def write(self, name: str, data: bytes) -> None:
+        """Replace the content of an existing file atomically."""
+        atomic_write(self.path(name), data, self.fsync)
+
+    def remove(self, name: str) -> None:
+        """Delete a file; one that is already gone counts as deleted."""
+        try:
+            os.remove(self.path(name))
+        except FileNotFoundError:
+            pass
+
+    def path(self, name: str) -> str:
+        """Return the absolute path of ``name``."""
+        return os.path.join(self.directory, *name.split("/"))
+
+
+class _Synced:
+    """Remote name and copied modification time of one local file."""
+
+    __slots__ = ("remote", "mtime_ns")
+
+    def __init__(self, remote: str, mtime_ns: int):
+        self.remote = remote
+        self.mtime_ns = mtime_ns
+
+
+class _Task:
+    """Pending operation on one local file."""
+
+    __slots__ = ("action", "due", "failures", "delay")
+
+    def __init__(self, action: str, due: float):
+        self.action = action
+        self.due = due
+        self.failures = 0
+        self.delay = 0.0
+
+
+class Syncer:
+    """
+    Worker thread that mirrors a spool directory to a remote directory.
+
+    Operations on the same file are merged: a deletion replaces a pending
+    copy, and repeated copies are done once, with the newest content.
+
+    Attributes:
+        spool: Local directory the plugin writes to
+        remote: Operations on the directory files are copied to
+    """
+
+    def __init__(
+        self,
+        spool: str,
+        remote: Remote,
+        on_failures: Callable[[List[Failure]], None],
+        linger: float = DEFAULT_LINGER,
+        retry_delay: float = DEFAULT_RETRY_DELAY,
+        max_retry_delay: float = DEFAULT_MAX_RETRY_DELAY,
+        report_after: int = DEFAULT_REPORT_AFTER,
+        stats: Optional[Stats] = None,
+    ):
+        """
+        Args:
+            spool: Local directory the plugin writes to
+            remote: Operations on the directory files are copied to
+            on_failures: Called from the worker with the files that reached
+                ``report_after`` failed attempts in one round
+            linger: Seconds to collect operations before processing them
+            retry_delay: Seconds before the first retry of a failed file
+            max_retry_delay: Longest delay between retries
+            report_after: Failed attempts of a file before it is reported
+            stats: Records the time spent on each round of operations
+        """
+        self.spool = spool
+        self.remote = remote
+        self.linger = linger
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.report_after = report_after
+        self._on_failures = on_failures
+        self._stats = stats if stats is not None else Stats()
+        self.map_path = os.path.join(spool, SYNC_MAP_NAME)
+        self._synced = {}  # type: Dict[str, _Synced]
+        self._records = 0
+        self._map_file = None
+        self._unchecked = 0
+        self._map_lock = LogLock(self.map_path)
+        self._tasks = {}  # type: Dict[str, _Task]
+        self._busy = 0
+        self._stopping = False
+        self._thread = None  # type: Optional[threading.Thread]
+        self._cond = threading.Condition()
+        self._load_map()
+
+    def __len__(self) -> int:
+        return len(self._tasks) + self._busy
+
+    def remote_name(self, path: str) -> Optional[str]:
+        """Return the name the local file ``path`` was copied as, if any."""
+        synced = self._synced.get(self._relative(path))
+        return synced.remote if synced is not None else None
+
+    def submit(self, path: str) -> None:
+        """Queue a copy of the current content of the local file ``path``."""
+        self._queue(self._relative(path), _COPY)
+
+    def delete(self, path: str) -> None:
+        """Queue the deletion of the remote copy of the local file ``path``."""
+        self._queue(self._relative(path), _DELETE)
+
+    def resume(self, paths: Iterable[str]) -> int:
+        """
+        Queue copies of the local files changed since they were last copied.
+
+        Returns:
+            int: Number of files queued
+        """
+        queued = 0
+        for path in paths:
+            name = self._relative(path)
+            synced = self._synced.get(name)
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+            if synced is None or synced.mtime_ns != mtime_ns:
+                self._queue(name, _COPY)
+                queued += 1
+        return queued
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Block until no operation is pending, or ``timeout`` seconds passed.
+
+        Pending operations are started right away, and failed ones are
+        retried without waiting for their backoff.
+
+        Returns:
+            bool: True if everything was synced
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._tasks or self._busy:
+                if self._thread is None:
+                    return False
+                for task in self._tasks.values():
+                    task.due = min(task.due, time.monotonic())
+                self._cond.notify_all()
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining if remaining is not None else 0.05)
+        return True
+
+    def stop(self) -> None:
+        """Try every pending operation once more and stop the worker thread."""
+        with self._cond:
+            thread, self._thread = self._thread, None
+            self._stopping = True
+            self._cond.notify_all()
+        if thread is not None:
+            thread.join()
+        with self._cond:
+            self._stopping = False
+            if self._map_file is not None:
+                self._map_file.close()
+                self._map_file = None
+            self._map_lock.close()
+
+    def _queue(self, name: str, action: str) -> None:
+        with self._cond:
+            task = self._tasks.get(name)
+            if task is None:
+                self._tasks[name] = _Task(action, time.monotonic() + self.linger)
+            else:
+                task.action = action
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="AutoSaveNewFiles-syncer", daemon=True
+                )
+                self._thread.start()
+            self._cond.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    due = {n: t for n, t in self._tasks.items() if t.due <= now or self._stopping}
+                    if due or (self._stopping and not self._tasks):
+                        break
+                    if self._tasks:
+                        self._cond.wait(min(t.due for t in self._tasks.values()) - now)
+                    else:
+                        self._cond.wait()
+                for name in due:
+                    del self._tasks[name]
+                self._busy = len(due)
+                stopping = self._stopping
+            if not due and stopping:
+                return
+
+            failures = []  # type: List[Failure]
+            with self._stats.timer("phase.sync"):
+                for name, task in due.items():
+                    try:
+                        if task.action == _COPY:
+                            self._copy(name)
+                        else:
+                            self._delete(name)
+                    except OSError as e:
+                        self._retry(name, task, e, failures)
+                    except Exception as e:
+                        # A bug must not stop the worker, or flush would wait forever
+                        self._retry(name, task, OSError(f"Unexpected error: {e!r}"), failures)
+            with self._cond:
+                self._busy = 0
+                self._cond.notify_all()
+            if failures:
+                try:
+                    self._on_failures(failures)
+                except Exception as e:
+                    print(f"[AutoSaveNewFiles] Reporting sync failures failed: {e!r}")
+            if stopping:
+                return
+
+    def _retry(self, name: str, task: _Task, error: OSError, failures: List[Failure]) -> None:
+        self._stats.count("sync.retries")
+        task.failures += 1
+        task.delay = min(max(task.delay * 2, self.retry_delay), self.max_retry_delay)
+        if task.failures == self.report_after:
+            failures.append((os.path.join(self.spool, name), error))
+        with self._cond:
+            # A newer operation queued meanwhile replaces the failed one
+            current = self._tasks.setdefault(name, task)
+            current.failures = task.failures
+            current.delay = task.delay
+            current.due = time.monotonic() + task.delay
+
+    def _copy(self, name: str) -> None:
+        path = os.path.join(self.spool, name)
+        try:
+            with open(path, "rb") as f:
+                mtime_ns = os.fstat(f.fileno()).st_mtime_ns
+                data = f.read()
+        except FileNotFoundError:
+            # Deleted locally before it was copied; its deletion is queued
+            return
+        synced = self._synced.get(name)
+        if synced is not None and synced.mtime_ns == mtime_ns:
+            return
+        if synced is None:
+            remote = self.remote.claim(name, data)
+            if remote != name:
+                self._stats.count("sync.collisions")
+        else:
+            remote = synced.remote
+            self.remote.write(remote, data)
+        self._stats.count("sync.copies")
+        self._record(name, _Synced(remote, mtime_ns))
+
+    def _delete(self, name: str) -> None:
+        synced = self._synced.get(name)
+        if synced is None:
+            return
+        self.remote.remove(synced.remote)
+        self._stats.count("sync.deletes")
+        self._record(name, None)
+
+    def _record(self, name: str, synced: Optional[_Synced]) -> None:
+        if synced is None:
+            self._synced.pop(name, None)
+            line = f"{name}\t\t\n"
+        else:
+            self._synced[name] = synced
+            line = f"{name}\t{synced.remote}\t{synced.mtime_ns}\n"
+        if self._map_file is not None:
+            self._unchecked += 1
+            if self._unchecked >= REPLACED_CHECK_INTERVAL:
+                self._unchecked = 0
+                if replaced(self._map_file, self.map_path):
+                    # Another instance compacted the map
+                    self._map_file.close()
+                    self._map_file = None
+        if self._map_file is None:
+            self._map_file = open(self.map_path, "ab", buffering=0)
+        try:
+            self._map_file.write(line.encode("utf-8"))
+        except OSError:
+            # Reopened by the next record, in case the map was replaced
+            self._map_file.close()
+            self._map_file = None
+            raise
+        self._records += 1
+        if self._records >= COMPACT_MIN_RECORDS and self._records > 2 * len(self._synced):
+            with self._map_lock.exclusive():
+                self._compact()
+
+    def _compact(self) -> None:
+        self._map_file.close()
+        self._map_file = None
+        # Keep the records other instances appended since the map was loaded
+        self._load_map()
+        temp_path = self.map_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8", newline="\n") as f:
+            for name, synced in self._synced.items():
+                f.write(f"{name}\t{synced.remote}\t{synced.mtime_ns}\n")
+        os.replace(temp_path, self.map_path)
+        self._records = len(self._synced)
+
+    def _load_map(self) -> None:
+        synced = {}  # type: Dict[str, _Synced]
+        records = 0
+        try:
+            with open(self.map_path, "rb") as f:
+                raw = f.read()
+        except FileNotFoundError:
+            raw = b""
+        end = raw.rfind(b"\n") + 1
+        if end < len(raw):
+            # Drop the partial record left by a crash
+            os.truncate(self.map_path, end)
+        for line in raw[:end].decode("utf-8", "replace").split("\n")[:-1]:
+            records += 1
+            name, _, rest = line.partition("\t")
+            remote, _, mtime_ns = rest.partition("\t")
+            if remote and mtime_ns.isdigit():
+                synced[name] = _Synced(remote, int(mtime_ns))
+            else:
+                synced.pop(name, None)
+        self._synced = synced
+        self._records = records
+
+    def _relative(self, path: str) -> str:
+        return os.path.relpath(path, self.spool).replace(os.sep, "/")
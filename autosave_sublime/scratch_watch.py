@@ -0,0 +1,499 @@
+"""
+Watching save directories for changes made outside the plugin.
+
+Other processes, other Sublime Text instances and tools such as
+``scripts/autosave_gc.py`` create, rename and delete files in the save
+directory, which leaves the plugin's view of it stale. ``Watchers`` runs one
+thread per save directory that reports those changes as ``Change`` events:
+
+- ``InotifyWatcher`` asks the Linux kernel for them, through ``ctypes``
+- ``PollingWatcher`` is used everywhere else; it re-lists only the
+  directories whose modification time changed since the previous poll
+
+Events pass through a ``ChangeBuffer``, which merges repeated events for
+the same file and hands them to the plugin in batches of at most
+``batch_size``, one batch at a time. When more than ``max_pending`` events
+pile up, as when a tool deletes tens of thousands of files, they are
+dropped and the plugin is asked to resynchronize once instead.
+"""
+
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+# Kinds of change
+CREATED = "created"
+DELETED = "deleted"
+MOVED = "moved"
+
+# Changes handed to the plugin per batch
+DEFAULT_BATCH_SIZE = 500
+
+# Pending changes beyond which they are replaced by one resynchronization
+DEFAULT_MAX_PENDING = 10000
+
+# Seconds between polls when inotify is unavailable
+DEFAULT_POLL_INTERVAL = 2.0
+
+# Directories modified this recently are listed again on the next poll,
+# since a change within the same timestamp tick would go unnoticed
+_RACY_NS = 2_000_000_000
+
+_IN_MOVED_FROM = 0x40
+_IN_MOVED_TO = 0x80
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_DELETE_SELF = 0x400
+_IN_MOVE_SELF = 0x800
+_IN_Q_OVERFLOW = 0x4000
+_IN_IGNORED = 0x8000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_WATCH_MASK = (
+    _IN_CREATE | _IN_DELETE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_DELETE_SELF | _IN_MOVE_SELF
+)
+_EVENT = struct.Struct("iIII")
+
+
+class Change(NamedTuple):
+    """A file created, deleted or moved outside the plugin."""
+
+    kind: str
+    path: str
+    new_path: Optional[str] = None
+
+
+# Receives a batch of changes, and True if the plugin must resynchronize
+Deliver = Callable[[List[Change], bool], None]
+
+
+class ChangeBuffer:
+    """
+    Bounded queue of changes between a watcher thread and the plugin.
+
+    Attributes:
+        batch_size: Changes handed to the plugin per batch
+        max_pending: Pending changes beyond which they are dropped in favor
+            of one resynchronization
+    """
+
+    def __init__(
+        self,
+        deliver: Deliver,
+        schedule: Callable[[Callable[[], None], float], None],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        max_pending: int = DEFAULT_MAX_PENDING,
+    ):
+        """
+        Args:
+            deliver: Called with each batch, on the thread ``schedule`` uses
+            schedule: Runs a callback after a delay in seconds
+            batch_size: Changes handed to the plugin per batch
+            max_pending: Pending changes beyond which they are dropped
+        """
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self._deliver = deliver
+        self._schedule = schedule
+        self._pending = OrderedDict()  # type: OrderedDict[str, Change]
+        self._resync = False
+        self._scheduled = False
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def put(self, change: Change) -> None:
+        """Queue a change, replacing an earlier one for the same file."""
+        with self._lock:
+            if self._resync:
+                return
+            self._pending.pop(change.path, None)
+            self._pending[change.path] = change
+            if len(self._pending) > self.max_pending:
+                self._pending.clear()
+                self._resync = True
+            schedule = self._claim_drain()
+        if schedule:
+            self._schedule(self.drain, 0)
+
+    def resync(self) -> None:
+        """Drop the pending changes and ask the plugin to resynchronize."""
+        with self._lock:
+            self._pending.clear()
+            self._resync = True
+            schedule = self._claim_drain()
+        if schedule:
+            self._schedule(self.drain, 0)
+
+    def drain(self) -> None:
+        """Hand the next batch to the plugin, scheduling another if needed."""
+        with self._lock:
+            resync, self._resync = self._resync, False
+            count = min(len(self._pending), self.batch_size)
+            batch = [self._pending.popitem(last=False)[1] for _ in range(count)]
+            self._scheduled = False
+        if batch or resync:
+            self._deliver(batch, resync)
+        # The next batch is only scheduled once this one has been handled
+        with self._lock:
+            schedule = bool(self._pending) and self._claim_drain()
+        if schedule:
+            self._schedule(self.drain, 0)
+
+    def _claim_drain(self) -> bool:
+        """Return True if the caller should schedule a drain; hold the lock."""
+        if self._scheduled:
+            return False
+        self._scheduled = True
+        return True
+
+
+class PollingWatcher:
+    """
+    Detects changes by comparing directory listings between polls.
+
+    Only directories whose modification time changed are listed again, and
+    files are matched by inode so renames are reported as moves.
+    """
+
+    def __init__(self, directory: str, emit: Callable[[Change], None]):
+        self.directory = directory
+        self._emit = emit
+        self._mtimes = {}  # type: Dict[str, int]
+        self._listings = {}  # type: Dict[str, Dict[str, int]]
+        self._scan(directory, initial=True)
+
+    def poll(self) -> None:
+        """Report the changes since the previous poll."""
+        added = {}  # type: Dict[int, str]
+        removed = {}  # type: Dict[int, str]
+        for directory in list(self._mtimes):
+            if directory not in self._mtimes:
+                continue
+            try:
+                mtime_ns = os.stat(directory).st_mtime_ns
+            except OSError:
+                self._drop(directory, removed)
+                continue
+            if mtime_ns != self._mtimes[directory]:
+                self._scan(directory, added=added, removed=removed)
+
+        for inode, path in removed.items():
+            new_path = added.pop(inode, None)
+            if new_path is None:
+                self._emit(Change(DELETED, path))
+            else:
+                self._emit(Change(MOVED, path, new_path))
+        for path in added.values():
+            self._emit(Change(CREATED, path))
+
+    def _scan(
+        self,
+        directory: str,
+        initial: bool = False,
+        added: Optional[Dict[int, str]] = None,
+        removed: Optional[Dict[int, str]] = None,
+    ) -> None:
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+            entries = list(os.scandir(directory))
+        except OSError:
+            return
+        racy = time.time_ns() - mtime_ns < _RACY_NS
+        self._mtimes[directory] = -1 if racy else mtime_ns
+        old = self._listings.get(directory, {})
+        new = {}  # type: Dict[str, int]
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.path not in self._mtimes:
+                        self._scan(entry.path, initial, added, removed)
+                    continue
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                inode = entry.inode()
+            except OSError:
+                continue
+            new[entry.name] = inode
+            # A file replaced in place, as by an atomic save, shows up as
+            # created, so a rename over it is still reported as a move
+            if not initial and old.get(entry.name) != inode:
+                added[inode] = entry.path
+        if not initial:
+            for name, inode in old.items():
+                if name not in new:
+                    removed[inode] = os.path.join(directory, name)
+        self._listings[directory] = new
+
+    def _drop(self, directory: str, removed: Dict[int, str]) -> None:
+        prefix = directory + os.sep
+        for known in [d for d in self._mtimes if d == directory or d.startswith(prefix)]:
+            del self._mtimes[known]
+            for name, inode in self._listings.pop(known, {}).items():
+                removed[inode] = os.path.join(known, name)
+
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    # Imported here, since only inotify needs it and it is slow to import
+    import ctypes
+    import ctypes.util
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    except (OSError, AttributeError):
+        return None
+    InotifyWatcher._get_errno = ctypes.get_errno
+    return libc
+
+
+class InotifyWatcher:
+    """Receives changes from the Linux kernel's inotify interface."""
+
+    _libc = None
+    _get_errno = None
+    _loaded = False
+
+    @classmethod
+    def available(cls) -> bool:
+        """Return True if inotify can be used on this system."""
+        if not cls._loaded:
+            cls._libc = _load_libc()
+            cls._loaded = True
+        return cls._libc is not None
+
+    def __init__(self, directory: str, emit: Callable[[Change], None], resync: Callable[[], None]):
+        """
+        Raises:
+            OSError: If inotify cannot be initialized or the directory watched
+        """
+        self.directory = directory
+        self._emit = emit
+        self._resync = resync
+        self._fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(self._get_errno(), "inotify_init1 failed")
+        self._paths = {}  # type: Dict[int, str]
+        try:
+            self._watch_tree(directory)
+        except OSError:
+            os.close(self._fd)
+            raise
+
+    def fileno(self) -> int:
+        return self._fd
+
+    def read(self) -> None:
+        """Report the changes the kernel has queued, without blocking."""
+        data = b""
+        while True:
+            try:
+                chunk = os.read(self._fd, 65536)
+            except BlockingIOError:
+                break
+            if not chunk:
+                break
+            data += chunk
+
+        moved_from = {}  # type: Dict[int, str]
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, cookie, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset : offset + length].rstrip(b"\0").decode("utf-8", "surrogateescape")
+            offset += length
+            if mask & _IN_Q_OVERFLOW:
+                self._resync()
+                continue
+            parent = self._paths.get(wd)
+            if parent is None:
+                continue
+            if mask & (_IN_IGNORED | _IN_DELETE_SELF | _IN_MOVE_SELF):
+                self._paths.pop(wd, None)
+                if parent == self.directory:
+                    self._resync()
+                continue
+            if name.startswith("."):
+                continue
+            path = os.path.join(parent, name)
+            if mask & _IN_ISDIR:
+                if mask & (_IN_CREATE | _IN_MOVED_TO):
+                    self._watch_new_directory(path)
+                elif mask & _IN_MOVED_FROM:
+                    # Files under a moved directory are not reported one by one
+                    self._resync()
+                continue
+            if mask & _IN_MOVED_FROM:
+                moved_from[cookie] = path
+            elif mask & _IN_MOVED_TO:
+                old_path = moved_from.pop(cookie, None)
+                if old_path is None:
+                    self._emit(Change(CREATED, path))
+                else:
+                    self._emit(Change(MOVED, old_path, path))
+            elif mask & _IN_CREATE:
+                self._emit(Change(CREATED, path))
+            elif mask & _IN_DELETE:
+                self._emit(Change(DELETED, path))
+        # Moved out of the watched tree
+        for path in moved_from.values():
+            self._emit(Change(DELETED, path))
+
+    def close(self) -> None:
+        """Stop receiving changes."""
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+    def _add_watch(self, path: str) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            error = self._get_errno()
+            raise OSError(error, os.strerror(error), path)
+        self._paths[wd] = path
+
+    def _watch_tree(self, directory: str) -> None:
+        self._add_watch(directory)
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.name.startswith(".") and entry.is_dir(follow_symlinks=False):
+                    self._watch_tree(entry.path)
+
+    def _watch_new_directory(self, path: str) -> None:
+        try:
+            self._watch_tree(path)
+        except OSError as e:
+            if e.errno not in (errno.ENOENT, errno.ENOTDIR):
+                self._resync()
+            return
+        # Files created before the watch was added
+        for root, dirs, files in os.walk(path):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            for name in files:
+                if not name.startswith("."):
+                    self._emit(Change(CREATED, os.path.join(root, name)))
+
+
+class DirectoryWatcher:
+    """Thread reporting the changes in one directory to a ``ChangeBuffer``."""
+
+    def __init__(
+        self,
+        directory: str,
+        buffer: ChangeBuffer,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        use_inotify: bool = True,
+    ):
+        self.directory = directory
+        self.buffer = buffer
+        self.poll_interval = poll_interval
+        self._inotify = None  # type: Optional[InotifyWatcher]
+        self._poller = None  # type: Optional[PollingWatcher]
+        if use_inotify and InotifyWatcher.available():
+            try:
+                self._inotify = InotifyWatcher(directory, buffer.put, buffer.resync)
+            except OSError:
+                # Out of watches, or an unsupported filesystem
+                self._inotify = None
+        if self._inotify is None:
+            self._poller = PollingWatcher(directory, buffer.put)
+        self._stop = threading.Event()
+        # Wakes the inotify thread from select; polling waits on the event,
+        # since select only takes sockets on Windows
+        self._wake_read = self._wake_write = None  # type: Optional[int]
+        if self._inotify is not None:
+            self._wake_read, self._wake_write = os.pipe()
+        self._thread = threading.Thread(
+            target=self._run, name="AutoSaveNewFiles-watcher", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def method(self) -> str:
+        """``"inotify"`` or ``"polling"``."""
+        return "inotify" if self._inotify is not None else "polling"
+
+    def stop(self) -> None:
+        """Stop the thread and release its resources."""
+        self._stop.set()
+        if self._wake_write is not None:
+            os.write(self._wake_write, b"\0")
+        self._thread.join()
+        if self._inotify is not None:
+            self._inotify.close()
+            os.close(self._wake_read)
+            os.close(self._wake_write)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                if self._inotify is not None:
+                    sources = [self._wake_read, self._inotify.fileno()]
+                    ready, _, _ = select.select(sources, [], [])
+                    if self._stop.is_set():
+                        return
+                    if self._inotify.fileno() in ready:
+                        self._inotify.read()
+                else:
+                    if self._stop.wait(self.poll_interval):
+                        return
+                    self._poller.poll()
+            except Exception:
+                # Whatever failed, changes may have been missed; keep
+                # watching, after a pause so a lasting error does not spin
+                self.buffer.resync()
+                self._stop.wait(self.poll_interval)
+
+
+class Watchers:
+    """One ``DirectoryWatcher`` per watched directory."""
+
+    def __init__(self, schedule: Callable[[Callable[[], None], float], None]):
+        """
+        Args:
+            schedule: Runs a callback after a delay in seconds, on the
+                thread that should handle changes
+        """
+        self._schedule = schedule
+        self._watchers = {}  # type: Dict[str, DirectoryWatcher]
+        self._lock = threading.Lock()
+
+    def __contains__(self, directory: str) -> bool:
+        return directory in self._watchers
+
+    def watch(self, directory: str, deliver: Deliver, **options) -> Optional[DirectoryWatcher]:
+        """
+        Start reporting changes in ``directory``, unless already watched.
+
+        Returns:
+            Optional[DirectoryWatcher]: The new watcher, or None if the
+            directory was already watched
+        """
+        with self._lock:
+            if directory in self._watchers:
+                return None
+            buffer = ChangeBuffer(deliver, self._schedule)
+            watcher = self._watchers[directory] = DirectoryWatcher(directory, buffer, **options)
+        return watcher
+
+    def close(self) -> None:
+        """Stop every watcher."""
+        with self._lock:
+            watchers = list(self._watchers.values())
+            self._watchers.clear()
+        for watcher in watchers:
+            watcher.stop()
+
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Benchmark the plugin's event handlers in realistic editor scenarios.
+
+Each scenario runs against a simulated editor and a real temporary save
+directory and reports per-handler latency percentiles, filesystem calls,
+and throughput. Results can be saved as a baseline and later runs compared
+against it: filesystem call counts must not grow, and p95 latencies must
+stay within a tolerance.
+
+The ``startup`` entry measures, in fresh interpreters, the time from the
+start of the plugin's import until ``plugin_loaded`` returned and until its
+warm-up finished, with a save directory already holding many notes, and
+the latency of the first new file after that.
+
+Usage:
+    python benchmarks/bench_events.py [--save-baseline FILE] [--baseline FILE]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Tuple
+
+if __name__ == "__main__" and "--startup-child" in sys.argv:
+    # Timed from before the plugin is imported; see measure_startup
+    STARTED = time.perf_counter()
+
+from simulator import Editor, SyscallCounter, plugin, sublime  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def prepare_restore(editor: Editor, count: int, buffer_size: int) -> List[Tuple[str, str]]:
+    """Write the files of a session to restore; every fifth tab stays untitled."""
+    os.makedirs(editor.save_directory, exist_ok=True)
+    tabs = []
+    for i in range(count):
+        if i % 5 == 0:
+            tabs.append(("", ""))
+            continue
+        path = os.path.join(editor.save_directory, f"restored_{i}.md")
+        content = f"note {i}\n"
+        with open(path, "w") as f:
+            f.write(content)
+        tabs.append((path, content))
+    return tabs
+
+
+def restore_tabs(editor: Editor, tabs: List[Tuple[str, str]], buffer_size: int) -> int:
+    """Restore a session of saved files and untitled buffers, then activate each."""
+    window = editor.new_window()
+    views = []
+    for path, content in tabs:
+        if path:
+            views.append(editor.open_file(window, path, content))
+        else:
+            views.append(editor.restore_untitled(window, "x" * buffer_size))
+    for view in views:
+        editor.activate(view)
+    editor.drain()
+    return 2 * len(views)
+
+
+def burst_new_files(editor: Editor, count: int, buffer_size: int) -> int:
+    """Create many new files as fast as possible, mostly within the same second."""
+    window = editor.new_window()
+    for _ in range(count):
+        editor.new_file(window)
+    editor.drain()
+    return 2 * count
+
+
+def prepare_close(editor: Editor, count: int, buffer_size: int) -> List[sublime.View]:
+    """Open a window of scratch tabs and type into every other one."""
+    window = editor.new_window()
+    views = [editor.new_file(window) for _ in range(count)]
+    editor.drain()
+    for view in views[1::2]:
+        editor.type(view, "some notes\n")
+    return views
+
+
+def close_window(editor: Editor, views: List[sublime.View], buffer_size: int) -> int:
+    """Close every tab and wait for the header-only files to be deleted."""
+    for view in views:
+        editor.close(view)
+    editor.drain()
+    return 2 * len(views)
+
+
+def prepare_switch(editor: Editor, count: int, buffer_size: int) -> List[sublime.View]:
+    """Restore 50 large untitled buffers."""
+    window = editor.new_window()
+    views = [editor.restore_untitled(window, "x" * buffer_size) for _ in range(50)]
+    editor.drain()
+    return [views[i % len(views)] for i in range(count)]
+
+
+def switch_tabs(editor: Editor, views: List[sublime.View], buffer_size: int) -> int:
+    """Switch between large untitled buffers."""
+    for view in views:
+        editor.activate(view)
+    editor.drain()
+    return len(views)
+
+
+def unprepared(editor: Editor, count: int, buffer_size: int) -> int:
+    """Scenarios without a setup step receive the item count."""
+    return count
+
+
+# name: (setup, measured run, item count)
+SCENARIOS = {
+    "restore_500_tabs": (prepare_restore, restore_tabs, 500),
+    "burst_1000_new_files": (unprepared, burst_new_files, 1000),
+    "close_200_scratch_tabs": (prepare_close, close_window, 200),
+    "switch_2000_tabs": (prepare_switch, switch_tabs, 2000),
+}  # type: Dict[str, Tuple[Callable, Callable, int]]
+
+
+def percentile(samples: List[float], q: int) -> float:
+    """Return the ``q``-th percentile of ``samples``."""
+    if len(samples) < 2:
+        return samples[0] if samples else 0.0
+    return statistics.quantiles(samples, n=100)[q - 1]
+
+
+def run_scenario(
+    setup: Callable, scenario: Callable, count: int, buffer_size: int, stats: bool = False
+) -> Dict[str, object]:
+    """
+    Run one scenario in a fresh editor and summarize it.
+
+    Only the measured run counts towards latencies and filesystem calls.
+    With ``stats`` the plugin's own instrumentation is turned on and its
+    per-phase table is printed after the run.
+    """
+    with Editor({"stats": stats}) as editor:
+        state = setup(editor, count, buffer_size)
+        editor.latencies.clear()
+        plugin._stats.reset()
+        with SyscallCounter() as counter:
+            start = time.perf_counter()
+            events = scenario(editor, state, buffer_size)
+            elapsed = time.perf_counter() - start
+        handlers = {
+            event: {
+                "count": len(samples),
+                "p50_us": percentile(samples, 50) * 1e6,
+                "p95_us": percentile(samples, 95) * 1e6,
+                "p99_us": percentile(samples, 99) * 1e6,
+            }
+            for event, samples in sorted(editor.latencies.items())
+        }
+        if stats:
+            print(plugin._stats.format_table())
+    return {
+        "events": events,
+        "seconds": elapsed,
+        "events_per_second": events / elapsed if elapsed else 0.0,
+        "syscalls": dict(sorted(counter.counts.items())),
+        "syscalls_total": counter.total(),
+        "handlers": handlers,
+    }
+
+
+def startup_child(save_directory: str) -> None:
+    """Load the plugin in this fresh interpreter and print its startup milestones as JSON."""
+    imported = time.perf_counter()
+    with Editor(save_directory=save_directory) as editor:
+        loaded = time.perf_counter()
+        editor.drain()
+        ready = time.perf_counter()
+        editor.new_file(editor.new_window())
+        first_new_file = editor.latencies["on_new_async"][0]
+        editor.drain()
+    print(
+        json.dumps(
+            {
+                "import_ms": (imported - STARTED) * 1e3,
+                "import_to_loaded_ms": (loaded - STARTED) * 1e3,
+                "import_to_ready_ms": (ready - STARTED) * 1e3,
+                "warm_up_ms": plugin._startup["warm_up"] * 1e3,
+                "first_new_file_us": first_new_file * 1e6,
+            }
+        )
+    )
+
+
+def measure_startup(files: int, runs: int = 5) -> Dict[str, float]:
+    """
+    Measure startup in ``runs`` fresh interpreters and return the medians.
+
+    The save directory holds ``files`` notes, so the warm-up has a name
+    index to build.
+    """
+    root = tempfile.mkdtemp(prefix="autosave-bench-startup-")
+    try:
+        save_directory = os.path.join(root, "scratch")
+        os.makedirs(save_directory)
+        for i in range(files):
+            open(os.path.join(save_directory, f"note_{i}.md"), "w").close()
+        samples = []
+        for _ in range(runs):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--startup-child", save_directory],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+            samples.append(json.loads(output.splitlines()[-1]))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    result = {key: statistics.median(s[key] for s in samples) for key in samples[0]}
+    result["files"] = files
+    return result
+
+
+def print_startup(result: Dict[str, float]) -> None:
+    """Print a human-readable summary of the startup measurement."""
+    print(
+        f"\nstartup with {result['files']} notes: import {result['import_ms']:.1f}ms,"
+        f" plugin_loaded at {result['import_to_loaded_ms']:.1f}ms,"
+        f" ready at {result['import_to_ready_ms']:.1f}ms"
+        f" (warm-up {result['warm_up_ms']:.1f}ms),"
+        f" first new file {result['first_new_file_us']:.1f}us"
+    )
+
+
+def print_result(name: str, result: Dict[str, object]) -> None:
+    """Print a human-readable summary of one scenario."""
+    print(
+        f"\n{name}: {result['events']} events in {result['seconds']:.3f}s"
+        f" ({result['events_per_second']:.0f} events/s),"
+        f" {result['syscalls_total']} filesystem calls"
+    )
+    for event, stats in result["handlers"].items():
+        print(
+            f"  {event:<22} n={stats['count']:<6} p50={stats['p50_us']:9.1f}us"
+            f"  p95={stats['p95_us']:9.1f}us  p99={stats['p99_us']:9.1f}us"
+        )
+    calls = ", ".join(f"{name}={count}" for name, count in result["syscalls"].items())
+    print(f"  calls: {calls or 'none'}")
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """
+    Compare results with a baseline.
+
+    Returns:
+        List[str]: One message per regression
+    """
+    regressions = []
+    for name, result in results.items():
+        expected = baseline.get(name)
+        if expected is None:
+            continue
+        if name == "startup":
+            limit = expected["import_to_ready_ms"]
+            if result["import_to_ready_ms"] > limit * tolerance:
+                regressions.append(
+                    f"startup: ready {result['import_to_ready_ms']:.1f}ms after import,"
+                    f" baseline {limit:.1f}ms (tolerance {tolerance}x)"
+                )
+            continue
+        if result["syscalls_total"] > expected["syscalls_total"]:
+            regressions.append(
+                f"{name}: {result['syscalls_total']} filesystem calls,"
+                f" baseline {expected['syscalls_total']}"
+            )
+        for event, stats in result["handlers"].items():
+            limit = expected["handlers"].get(event, {}).get("p95_us")
+            if limit and stats["p95_us"] > limit * tolerance:
+                regressions.append(
+                    f"{name}: {event} p95 {stats['p95_us']:.1f}us,"
+                    f" baseline {limit:.1f}us (tolerance {tolerance}x)"
+                )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS))
+    parser.add_argument(
+        "--buffer-size", type=int, default=1 << 20, help="size of large untitled buffers"
+    )
+    parser.add_argument("--save-baseline", metavar="FILE", nargs="?", const=DEFAULT_BASELINE)
+    parser.add_argument("--baseline", metavar="FILE", help="compare against a saved baseline")
+    parser.add_argument(
+        "--tolerance", type=float, default=2.0, help="allowed p95 slowdown factor"
+    )
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument(
+        "--stats", action="store_true", help="also print the plugin's per-phase statistics"
+    )
+    parser.add_argument(
+        "--startup-files",
+        type=int,
+        default=10000,
+        help="notes in the save directory when measuring startup; 0 skips the measurement",
+    )
+    parser.add_argument("--startup-child", metavar="DIR", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.startup_child:
+        startup_child(args.startup_child)
+        return 0
+
+    results = {}
+    for name in args.scenario or SCENARIOS:
+        setup, scenario, count = SCENARIOS[name]
+        results[name] = run_scenario(setup, scenario, count, args.buffer_size, args.stats)
+        if not args.json:
+            print_result(name, results[name])
+    if args.startup_files:
+        results["startup"] = measure_startup(args.startup_files)
+        if not args.json:
+            print_startup(results["startup"])
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved baseline to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        if regressions:
+            return 1
+        print("\nNo regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Benchmark replaying the journal of managed files.
+
+Writes a journal of creates, opens, closes and deletes, then times how long
+``Journal`` takes to replay it, which the plugin does once per save
+directory after loading. The budget for 100,000 records is 100 ms.
+
+Usage:
+    python benchmarks/bench_journal.py [--records 100000] [--repeat 5]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from autosave_sublime.scratch_journal import JOURNAL_NAME, Journal  # noqa: E402
+
+# Seconds allowed per 100,000 records
+BUDGET = 0.1
+
+
+def write_journal(directory: str, records: int) -> int:
+    """Write ``records`` records to a journal in ``directory``, returning the live files."""
+    pid = os.getpid()
+    live = 0
+    with open(os.path.join(directory, JOURNAL_NAME), "w", encoding="utf-8") as f:
+        for i in range(records):
+            name = f"2024_03_19_{i:06d}.md"
+            # Mostly creates, as after a compaction, with some churn
+            if i % 10 == 7:
+                f.write(f"D\t2024_03_19_{i - 1:06d}.md\n")
+                live -= 1
+            elif i % 10 == 8:
+                f.write(f"O\t{name[:-3]}_x.md\t{pid}\n")
+            else:
+                f.write(f"C\t{name}\t2024_03_19_{i:06d}\n")
+                live += 1
+    return live
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        live = write_journal(directory, args.records)
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            journal = Journal(directory)
+            timings.append(time.perf_counter() - start)
+            assert len(journal) == live
+        best = min(timings)
+    verdict = "ok" if best < BUDGET * args.records / 100_000 else "over budget"
+    print(f"replay {args.records:>7} records {best * 1000:8.1f}ms best of {args.repeat}  {verdict}")
+
+
+if __name__ == "__main__":
+    main()
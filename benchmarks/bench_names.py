@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark filename collision resolution.
+
+Creates many files that share one timestamp, comparing the name index used
+by the plugin with the original probe-one-suffix-at-a-time loop.
+
+Usage:
+    python benchmarks/bench_names.py [--count 10000] [--legacy-count 1000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from autosave_sublime.scratch_names import NameIndex  # noqa: E402
+
+FILENAME = "2024_03_19_123456.md"
+
+
+def legacy_claim(directory: str, filename: str) -> str:
+    """The original os.path.exists loop, followed by creating the file."""
+    file_path = os.path.join(directory, filename)
+    counter = 1
+    while os.path.exists(file_path):
+        base, ext = os.path.splitext(filename)
+        file_path = os.path.join(directory, f"{base}_{counter}{ext}")
+        counter += 1
+    open(file_path, "w").close()
+    return file_path
+
+
+def index_claimer(directory: str) -> Callable[[], str]:
+    """Claim names through a NameIndex seeded from ``directory``."""
+    index = NameIndex(directory)
+    return lambda: index.claim(FILENAME)
+
+
+def legacy_claimer(directory: str) -> Callable[[], str]:
+    """Claim names with the original probing loop."""
+    return lambda: legacy_claim(directory, FILENAME)
+
+
+def run(label: str, count: int, claimer: Callable[[str], Callable[[], str]]) -> float:
+    """Create ``count`` files in a fresh directory and print the timing."""
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        claim_one = claimer(directory)
+        for _ in range(count):
+            claim_one()
+        elapsed = time.perf_counter() - start
+        assert len(os.listdir(directory)) == count
+    per_file = elapsed / count * 1e6
+    print(f"{label:<8} {count:>7} files  {elapsed:8.3f}s  {per_file:8.1f}us/file")
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--count", type=int, default=10000)
+    parser.add_argument("--legacy-count", type=int, default=1000)
+    args = parser.parse_args()
+
+    run("index", args.count, index_claimer)
+    if args.legacy_count:
+        run("legacy", args.legacy_count, legacy_claimer)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""
+Simulated editor for benchmarking the plugin's event handlers.
+
+Builds on the mock ``sublime`` module from ``tests/mocks``: an ``Editor``
+owns windows and views, dispatches the same events Sublime Text would to an
+``AutoSaveNewFilesCommand`` listener, and records how long each handler
+took. Work the plugin schedules with ``set_timeout_async`` is held back
+until ``drain`` runs it, honouring the requested delays, as Sublime Text's
+async thread would. ``SyscallCounter`` counts the filesystem calls made while it is
+active, on every thread.
+"""
+
+import builtins
+import heapq
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "tests" / "mocks"))
+sys.path.insert(0, str(ROOT))
+
+import sublime  # noqa: E402
+
+from autosave_sublime import auto_save_new_files as plugin  # noqa: E402
+
+# Filesystem functions counted by SyscallCounter
+COUNTED_OS_FUNCTIONS = [
+    "stat",
+    "lstat",
+    "fstat",
+    "open",
+    "close",
+    "write",
+    "remove",
+    "unlink",
+    "rename",
+    "replace",
+    "link",
+    "mkdir",
+    "makedirs",
+    "scandir",
+    "listdir",
+    "fsync",
+    "truncate",
+]
+
+# Record lock calls counted by SyscallCounter, where available
+COUNTED_FCNTL_FUNCTIONS = ["lockf"]
+
+
+class SyscallCounter:
+    """
+    Count filesystem calls while active.
+
+    Only the outermost call is counted, so ``os.makedirs`` calling
+    ``os.mkdir`` or ``os.path.exists`` calling ``os.stat`` count once.
+
+    Attributes:
+        counts: Number of calls per function name
+    """
+
+    def __init__(self):
+        self.counts = defaultdict(int)  # type: Dict[str, int]
+        self._depth = threading.local()
+        self._originals = []  # type: List[tuple]
+
+    def total(self) -> int:
+        """Return the number of counted calls."""
+        return sum(self.counts.values())
+
+    def _wrap(self, name: str, function: Callable) -> Callable:
+        def counted(*args, **kwargs):
+            depth = getattr(self._depth, "value", 0)
+            if depth == 0:
+                self.counts[name] += 1
+            self._depth.value = depth + 1
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self._depth.value = depth
+
+        return counted
+
+    def _patch(self, module: object, attribute: str, name: str) -> None:
+        original = getattr(module, attribute)
+        self._originals.append((module, attribute, original))
+        setattr(module, attribute, self._wrap(name, original))
+
+    def __enter__(self) -> "SyscallCounter":
+        for name in COUNTED_OS_FUNCTIONS:
+            if hasattr(os, name):
+                self._patch(os, name, name)
+        if fcntl is not None:
+            for name in COUNTED_FCNTL_FUNCTIONS:
+                self._patch(fcntl, name, name)
+        self._patch(os.path, "exists", "exists")
+        self._patch(os.path, "getsize", "getsize")
+        self._patch(builtins, "open", "open")
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        for module, attribute, original in reversed(self._originals):
+            setattr(module, attribute, original)
+        self._originals.clear()
+
+
+class Editor:
+    """
+    Simulated Sublime Text session driving the plugin's listener.
+
+    Attributes:
+        save_directory: Temporary save directory used by the plugin
+        listener: The plugin's event listener
+        latencies: Handler durations in seconds, per event name; deferred
+            callbacks are recorded as ``async_callback``
+    """
+
+    def __init__(
+        self, settings: Optional[Dict[str, object]] = None, save_directory: Optional[str] = None
+    ):
+        """
+        Args:
+            settings: Plugin settings overriding the defaults
+            save_directory: Existing save directory to use, which is left in
+                place; a temporary one is created and removed by default
+        """
+        self._root = tempfile.mkdtemp(prefix="autosave-bench-")
+        self.save_directory = save_directory or os.path.join(self._root, "scratch")
+        self.windows = []  # type: List[sublime.Window]
+        self.latencies = defaultdict(list)  # type: Dict[str, List[float]]
+        self._async = []  # type: List[tuple]
+        self._sequence = itertools.count()
+        self._set_timeout_async = sublime.set_timeout_async
+        sublime.set_timeout_async = self._defer
+
+        sublime_settings = sublime.load_settings(plugin.SETTINGS_FILE)
+        self._saved_settings = dict(sublime_settings._settings)
+        sublime_settings._settings.update(settings or {})
+        sublime_settings._settings["save_directory"] = self.save_directory
+        plugin.plugin_loaded()
+        self.listener = plugin.AutoSaveNewFilesCommand()
+
+    def close_session(self) -> None:
+        """Unload the plugin and remove the temporary directory."""
+        plugin.plugin_unloaded()
+        sublime.set_timeout_async = self._set_timeout_async
+        sublime.load_settings(plugin.SETTINGS_FILE)._settings = self._saved_settings
+        shutil.rmtree(self._root, ignore_errors=True)
+
+    def __enter__(self) -> "Editor":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close_session()
+
+    def dispatch(self, event: str, view: sublime.View) -> None:
+        """Call the listener's handler for ``event`` and record its latency."""
+        handler = getattr(self.listener, event)
+        start = time.perf_counter()
+        handler(view)
+        self.latencies[event].append(time.perf_counter() - start)
+
+    def new_window(self) -> sublime.Window:
+        """Open an empty window."""
+        window = sublime.Window()
+        self.windows.append(window)
+        return window
+
+    def new_file(self, window: sublime.Window, content: str = "") -> sublime.View:
+        """Create an untitled view, as File > New File would."""
+        view = window.new_file(content)
+        self.dispatch("on_new_async", view)
+        self.dispatch("on_activated_async", view)
+        return view
+
+    def open_file(
+        self, window: sublime.Window, path: str, content: Optional[str] = None
+    ) -> sublime.View:
+        """
+        Open an existing file, as a restored session would.
+
+        Args:
+            window: Window to open the file in
+            path: File to open
+            content: Buffer contents, read from ``path`` when not given
+        """
+        if content is None:
+            with open(path, encoding="utf-8", newline="") as f:
+                content = f.read()
+        view = window.new_file(content, path)
+        self.dispatch("on_load_async", view)
+        return view
+
+    def restore_untitled(self, window: sublime.Window, content: str) -> sublime.View:
+        """Restore an untitled buffer from hot exit."""
+        view = window.new_file(content)
+        self.dispatch("on_load_async", view)
+        return view
+
+    def activate(self, view: sublime.View) -> None:
+        """Switch to ``view``."""
+        self.dispatch("on_activated_async", view)
+
+    def type(self, view: sublime.View, text: str) -> None:
+        """Append ``text`` to the buffer."""
+        view.run_command("insert", {"characters": text})
+
+    def save(self, view: sublime.View) -> None:
+        """Save ``view`` as the user would."""
+        view.run_command("save")
+        self.dispatch("on_post_save_async", view)
+
+    def close(self, view: sublime.View) -> None:
+        """Close ``view``."""
+        self.dispatch("on_pre_close", view)
+        view.window().close_view(view)
+        self.dispatch("on_close", view)
+
+    def drain(self) -> None:
+        """Run deferred callbacks when due and wait for background work."""
+        while self._async:
+            due, _, callback = heapq.heappop(self._async)
+            wait = due - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            start = time.perf_counter()
+            callback()
+            self.latencies["async_callback"].append(time.perf_counter() - start)
+        plugin._deleter.flush()
+
+    def _defer(self, callback: Callable[[], None], delay: int = 0) -> None:
+        due = time.perf_counter() + delay / 1000
+        heapq.heappush(self._async, (due, next(self._sequence), callback))
@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+"""
+Soak the plugin's file lifecycle with random sessions and injected faults.
+
+Drives ``AutoSaveNewFilesCommand`` through thousands of random create,
+activate, type, save and close steps across several simulated windows,
+against a real temporary save directory. Meanwhile filesystem calls fail at
+random with ``PermissionError`` or ``ENOSPC`` or stall to simulate slow
+storage, and another thread deletes notes behind the plugin's back. Once
+the session is closed the run checks that:
+
+- every closed note with content was kept, with the content last saved,
+  unless another program deleted it
+- no header-only note was left behind, unless the plugin reported failing
+  to create or delete it
+- no two views were ever given the same file
+
+and that the handlers' p95 latencies and the filesystem calls per step
+stay within their budgets.
+
+Usage:
+    python benchmarks/soak.py [--seed 1] [--steps 5000] [--error-rate 0.02]
+"""
+
+import argparse
+import errno
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Set
+
+from simulator import Editor, SyscallCounter, plugin, sublime
+
+from autosave_sublime.scratch_dirs import iter_scratch_files
+
+# Kept before any patching, for the harness's own filesystem access
+_remove = os.remove
+
+# Errors each faulted function may raise
+FAULTS = {
+    "open": (errno.EACCES, errno.ENOSPC),
+    "write": (errno.ENOSPC,),
+    "mkdir": (errno.EACCES, errno.ENOSPC),
+    "replace": (errno.EACCES, errno.ENOSPC),
+    "remove": (errno.EACCES,),
+}  # type: Dict[str, tuple]
+
+# Relative frequency of each step
+ACTIONS = {
+    "new": 6,
+    "activate": 4,
+    "type": 6,
+    "save": 3,
+    "close": 5,
+    "drain": 1,
+}  # type: Dict[str, int]
+
+# p95 latency budget per handler, in microseconds
+DEFAULT_LATENCY_BUDGETS = {
+    "on_new_async": 1000.0,
+    "on_activated_async": 1000.0,
+    "on_modified_async": 1000.0,
+    "on_pre_close": 2000.0,
+    "on_close": 1000.0,
+    "on_post_save_async": 5000.0,
+}  # type: Dict[str, float]
+
+# Filesystem calls allowed per step on average
+DEFAULT_SYSCALL_BUDGET = 12.0
+
+
+class FaultPlan(NamedTuple):
+    """How often faults are injected."""
+
+    error_rate: float = 0.02
+    slow_rate: float = 0.01
+    slow_seconds: float = 0.005
+    # External deletions per second while the session runs
+    external_deletes: float = 20.0
+
+
+class FaultInjector:
+    """
+    Make filesystem calls fail or stall at random while active.
+
+    Attributes:
+        injected: Number of injected faults per ``function:errno`` or
+            ``function:slow``
+    """
+
+    def __init__(self, plan: FaultPlan, rng: random.Random):
+        self.plan = plan
+        self.injected = Counter()  # type: Counter
+        self._rng = rng
+        self._lock = threading.Lock()
+        self._originals = []  # type: List[tuple]
+
+    def _wrap(self, name: str, function):
+        codes = FAULTS[name]
+
+        def faulty(*args, **kwargs):
+            with self._lock:
+                roll = self._rng.random()
+                code = self._rng.choice(codes)
+            if roll < self.plan.error_rate:
+                self.injected[f"{name}:{errno.errorcode[code]}"] += 1
+                path = args[0] if args and isinstance(args[0], str) else None
+                raise OSError(code, os.strerror(code), path)
+            if roll < self.plan.error_rate + self.plan.slow_rate:
+                self.injected[f"{name}:slow"] += 1
+                time.sleep(self.plan.slow_seconds)
+            return function(*args, **kwargs)
+
+        return faulty
+
+    def __enter__(self) -> "FaultInjector":
+        for name in FAULTS:
+            original = getattr(os, name)
+            self._originals.append((name, original))
+            setattr(os, name, self._wrap(name, original))
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        for name, original in reversed(self._originals):
+            setattr(os, name, original)
+        self._originals.clear()
+
+
+class ExternalDeleter:
+    """Thread deleting random notes, as a sync client or a shell would."""
+
+    def __init__(self, rate: float, rng: random.Random, lock: threading.Lock):
+        """
+        Args:
+            rate: Deletions per second
+            rng: Source of the deletion times and victims
+            lock: Held while deleting, so the session sees deletions atomically
+        """
+        self.rate = rate
+        self.candidates = []  # type: List[str]
+        self.deleted = set()  # type: Set[str]
+        self._rng = rng
+        self._lock = lock
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="soak-external", daemon=True)
+
+    def start(self) -> None:
+        if self.rate > 0:
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._rng.expovariate(self.rate)):
+            with self._lock:
+                if not self.candidates:
+                    continue
+                path = self._rng.choice(self.candidates)
+                try:
+                    _remove(path)
+                except OSError:
+                    continue
+                self.deleted.add(path)
+
+
+class SoakReport:
+    """
+    Outcome of one soak run.
+
+    Attributes:
+        seed: Seed of the run
+        steps: Steps run
+        actions: Number of steps per action
+        faults: Injected faults per function and kind
+        external_deletes: Notes deleted by the external thread
+        violations: Broken invariants and budgets, one message each
+        latencies_us: p95 latency per handler, in microseconds
+        syscalls_per_step: Average filesystem calls per step
+    """
+
+    def __init__(self, seed: int, steps: int):
+        self.seed = seed
+        self.steps = steps
+        self.actions = Counter()  # type: Counter
+        self.faults = Counter()  # type: Counter
+        self.external_deletes = 0
+        self.violations = []  # type: List[str]
+        self.latencies_us = {}  # type: Dict[str, float]
+        self.syscalls_per_step = 0.0
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "seed": self.seed,
+            "steps": self.steps,
+            "actions": dict(self.actions),
+            "faults": dict(self.faults),
+            "external_deletes": self.external_deletes,
+            "violations": self.violations,
+            "latencies_us": self.latencies_us,
+            "syscalls_per_step": self.syscalls_per_step,
+        }
+
+
+def is_header_only(path: str, content: str) -> bool:
+    """
+    Return True if a note holds nothing but the timestamp the plugin inserted.
+
+    The timestamp is the note's name without its extension and ``_N`` suffix.
+    """
+    text = content.strip()
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return not text or text == stem or stem.startswith(text + "_")
+
+
+def percentile_95(samples: List[float]) -> float:
+    """Return the 95th percentile of ``samples``."""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] if ordered else 0.0
+
+
+def run_soak(
+    seed: int = 1,
+    steps: int = 5000,
+    windows: int = 4,
+    plan: FaultPlan = FaultPlan(),
+    settings: Optional[Dict[str, object]] = None,
+    latency_budgets: Optional[Dict[str, float]] = None,
+    syscall_budget: Optional[float] = None,
+) -> SoakReport:
+    """
+    Run one randomized session and check its invariants.
+
+    Args:
+        seed: Seed of every random choice, except the timing of other threads
+        steps: Number of random steps
+        windows: Number of simulated windows
+        plan: How often faults are injected
+        settings: Plugin settings overriding the defaults
+        latency_budgets: p95 budget per handler in microseconds; None skips
+            the latency check
+        syscall_budget: Filesystem calls allowed per step; None skips the check
+
+    Returns:
+        SoakReport: The run's statistics and any violations
+    """
+    rng = random.Random(seed)
+    report = SoakReport(seed, steps)
+    del sublime.error_messages[:]
+    del sublime.status_messages[:]
+    lock = threading.Lock()
+    external = ExternalDeleter(plan.external_deletes, random.Random(seed + 1), lock)
+    actions, weights = zip(*ACTIONS.items())
+
+    # Content last saved by each view, and what closed views left behind
+    saved = {}  # type: Dict[int, str]
+    typed = set()  # type: Set[int]
+    closed = {}  # type: Dict[str, str]
+    owners = {}  # type: Dict[str, int]
+    delete_failures = []  # type: List[str]
+
+    with Editor(settings) as editor:
+        reported = plugin._deleter._on_failures
+
+        def record_failures(failures):
+            delete_failures.extend(path for path, _ in failures)
+            reported(failures)
+
+        plugin._deleter._on_failures = record_failures
+        session = [editor.new_window() for _ in range(windows)]
+        views = []  # type: List[sublime.View]
+
+        def track_names() -> None:
+            with lock:
+                for view in views:
+                    path = view.file_name()
+                    if path is None or owners.setdefault(path, view.id()) == view.id():
+                        continue
+                    report.violations.append(
+                        f"views {owners[path]} and {view.id()} were both given {path}"
+                    )
+                external.candidates[:] = [v.file_name() for v in views if v.file_name()]
+
+        def save(view: sublime.View) -> None:
+            if view.file_name() is None:
+                return
+            with lock:
+                editor.save(view)
+                saved[view.id()] = view.substr(sublime.Region(0, view.size()))
+                external.deleted.discard(view.file_name())
+
+        def close(view: sublime.View) -> None:
+            # The user answers the save prompt of an edited note with Save
+            if view.id() in typed and view.file_name() is not None:
+                save(view)
+            path = view.file_name()
+            editor.close(view)
+            views.remove(view)
+            if path is not None and view.id() in saved:
+                closed[path] = saved[view.id()]
+
+        faults = FaultInjector(plan, random.Random(seed + 2))
+        try:
+            with faults, SyscallCounter() as counter:
+                external.start()
+                for _ in range(steps):
+                    action = rng.choices(actions, weights)[0]
+                    report.actions[action] += 1
+                    if action == "new" or not views:
+                        views.append(editor.new_file(rng.choice(session)))
+                    elif action == "activate":
+                        editor.activate(rng.choice(views))
+                    elif action == "type":
+                        view = rng.choice(views)
+                        editor.type(view, rng.choice(["notes\n", "- item\n", "x"]))
+                        editor.dispatch("on_modified_async", view)
+                        typed.add(view.id())
+                    elif action == "save":
+                        save(rng.choice(views))
+                    elif action == "close":
+                        close(rng.choice(views))
+                    else:
+                        editor.drain()
+                        track_names()
+                editor.drain()
+                track_names()
+                external.stop()
+            report.faults = faults.injected
+            report.syscalls_per_step = counter.total() / steps
+
+            # Faults are off while the session is closed
+            while views:
+                close(views[-1])
+            editor.drain()
+        except Exception as e:  # noqa: BLE001 - any escaping exception is a finding
+            report.violations.append(f"{type(e).__name__} escaped the plugin: {e}")
+            return report
+        finally:
+            external.stop()
+            plugin._deleter._on_failures = reported
+
+        report.external_deletes = len(external.deleted)
+        messages = sublime.error_messages + sublime.status_messages + delete_failures
+
+        for path, content in sorted(closed.items()):
+            if path in external.deleted or is_header_only(path, content):
+                continue
+            try:
+                with open(path, encoding="utf-8", newline="") as f:
+                    kept = f.read()
+            except FileNotFoundError:
+                report.violations.append(f"note with content was lost: {path}")
+                continue
+            if kept != content:
+                report.violations.append(f"note does not hold its last saved content: {path}")
+
+        for entry in iter_scratch_files(editor.save_directory):
+            with open(entry.path, encoding="utf-8", newline="") as f:
+                content = f.read()
+            if is_header_only(entry.path, content) and not any(entry.path in m for m in messages):
+                report.violations.append(f"header-only note left behind: {entry.path}")
+
+        for event, samples in sorted(editor.latencies.items()):
+            if event != "async_callback":
+                report.latencies_us[event] = percentile_95(samples) * 1e6
+
+    for event, budget in (latency_budgets or {}).items():
+        p95 = report.latencies_us.get(event)
+        if p95 is not None and p95 > budget:
+            report.violations.append(f"{event} p95 {p95:.1f}us over its {budget:.1f}us budget")
+    if syscall_budget is not None and report.syscalls_per_step > syscall_budget:
+        report.violations.append(
+            f"{report.syscalls_per_step:.2f} filesystem calls per step,"
+            f" over the budget of {syscall_budget:.2f}"
+        )
+    return report
+
+
+def print_report(report: SoakReport) -> None:
+    """Print a human-readable summary of a run."""
+    actions = ", ".join(f"{name}={count}" for name, count in sorted(report.actions.items()))
+    faults = ", ".join(f"{name}={count}" for name, count in sorted(report.faults.items()))
+    print(f"seed {report.seed}: {report.steps} steps ({actions})")
+    print(f"  faults: {faults or 'none'}; external deletes: {report.external_deletes}")
+    print(f"  filesystem calls per step: {report.syscalls_per_step:.2f}")
+    for event, p95 in report.latencies_us.items():
+        print(f"  {event:<22} p95={p95:9.1f}us")
+    for message in report.violations:
+        print(f"  VIOLATION {message}")
+
+
+def main() -> int:
+    defaults = FaultPlan()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--runs", type=int, default=1, help="runs with consecutive seeds")
+    parser.add_argument("--steps", type=int, default=5000)
+    parser.add_argument("--windows", type=int, default=4)
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate)
+    parser.add_argument("--slow-rate", type=float, default=defaults.slow_rate)
+    parser.add_argument("--slow-ms", type=float, default=defaults.slow_seconds * 1e3)
+    parser.add_argument(
+        "--external-deletes",
+        type=float,
+        default=defaults.external_deletes,
+        help="deletions per second by another program",
+    )
+    parser.add_argument("--autosave", action="store_true", help="turn the autosave setting on")
+    parser.add_argument(
+        "--syscall-budget", type=float, default=DEFAULT_SYSCALL_BUDGET, help="calls per step"
+    )
+    parser.add_argument(
+        "--latency-factor",
+        type=float,
+        default=1.0,
+        help="multiply the p95 latency budgets, for slow machines",
+    )
+    parser.add_argument("--json", action="store_true", help="print reports as JSON")
+    args = parser.parse_args()
+
+    plan = FaultPlan(args.error_rate, args.slow_rate, args.slow_ms / 1e3, args.external_deletes)
+    budgets = {
+        event: budget * args.latency_factor for event, budget in DEFAULT_LATENCY_BUDGETS.items()
+    }
+    reports = []
+    for seed in range(args.seed, args.seed + args.runs):
+        report = run_soak(
+            seed,
+            args.steps,
+            args.windows,
+            plan,
+            {"autosave": args.autosave, "autosave_delay": 0.01},
+            budgets,
+            args.syscall_budget,
+        )
+        reports.append(report)
+        if not args.json:
+            print_report(report)
+    if args.json:
+        print(json.dumps([report.as_dict() for report in reports], indent=2))
+    return 1 if any(report.violations for report in reports) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -31,11 +31,25 @@ def create_default_config():
     """Create default configuration dictionary."""
     return {
         "save_directory": "~/scratch",
+        "staging_directory": "",
         "filename_format": "{timestamp}.{extension}",
         "insert_timestamp": True,
         "timestamp_format": "%Y_%m_%d_%H%M%S",
         "use_microseconds": False,
+        # "seconds", "milliseconds" or "microseconds"; None follows use_microseconds
+        "timestamp_precision": None,
         "default_extension": "md",
+        "write_directly": True,
+        "search_index": False,
+        "history": False,
+        "watch": True,
+        "autosave": False,
+        "autosave_delay": 1.0,
+        "autosave_max_delay": 10.0,
+        "autosave_fsync": "file",
+        "rules": [],
+        "stats": False,
+        "debug": False,
     }
 
 
@@ -56,12 +70,23 @@ def main():
     # Get the current directory (where the install script is)
     current_dir = os.path.dirname(os.path.abspath(__file__))
 
-    # Copy plugin file
-    plugin_src = os.path.join(current_dir, "autosave_sublime", "auto_save_new_files.py")
+    # Copy plugin file and its support modules
+    package_dir = os.path.join(current_dir, "autosave_sublime")
     plugin_dst = os.path.join(user_dir, "auto_save_new_files.py")
+    plugin_files = ["auto_save_new_files.py"] + sorted(
+        name
+        for name in os.listdir(package_dir)
+        if name.startswith("scratch_") and name.endswith(".py")
+    )
 
     try:
-        shutil.copy2(plugin_src, plugin_dst)
+        for name in plugin_files:
+            shutil.copy2(os.path.join(package_dir, name), os.path.join(user_dir, name))
+        # Command Palette entries for the plugin's commands
+        commands_file = "AutoSaveNewFiles.sublime-commands"
+        shutil.copy2(
+            os.path.join(current_dir, commands_file), os.path.join(user_dir, commands_file)
+        )
         print(f"✓ Copied plugin file to {plugin_dst}")
     except Exception as e:
         print(f"Error copying plugin file: {e}")
@@ -8,6 +8,9 @@ NC='\033[0m' # No Color
 
 REPO="marknorgren/AutoSaveScratch"
 
+# Support modules imported by auto_save_new_files.py
+PLUGIN_MODULES="scratch_archive.py scratch_autosave.py scratch_catalog.py scratch_config.py scratch_deleter.py scratch_dirs.py scratch_events.py scratch_history.py scratch_journal.py scratch_leases.py scratch_names.py scratch_records.py scratch_routes.py scratch_search.py scratch_stats.py scratch_sync.py scratch_watch.py"
+
 echo -e "${BLUE}Installing AutoSaveNewFiles Sublime Text Plugin...${NC}"
 
 # Detect OS and set paths
@@ -57,7 +60,11 @@ download_file() {
 # Download each file
 download_file "autosave_sublime/auto_save_new_files.py" "$PLUGIN_DIR/auto_save_new_files.py" || exit 1
 download_file "autosave_sublime/__init__.py" "$PLUGIN_DIR/__init__.py" || exit 1
+for module in $PLUGIN_MODULES; do
+    download_file "autosave_sublime/${module}" "$PLUGIN_DIR/${module}" || exit 1
+done
 download_file "AutoSaveNewFiles.sublime-settings" "$PLUGIN_DIR/AutoSaveNewFiles.sublime-settings" || exit 1
+download_file "AutoSaveNewFiles.sublime-commands" "$PLUGIN_DIR/AutoSaveNewFiles.sublime-commands" || exit 1
 
 # Check if files were downloaded successfully
 if [ ! -f "$PLUGIN_DIR/auto_save_new_files.py" ] || [ ! -f "$PLUGIN_DIR/__init__.py" ] || [ ! -f "$PLUGIN_DIR/AutoSaveNewFiles.sublime-settings" ]; then
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Rotate old AutoSaveNewFiles scratch files into compressed monthly archives.
+
+Scratch files are small but numerous, which wastes inodes and slows down
+backups of the save directory. This script will:
+1. Find files that have not been modified for ``--older-than`` days,
+   skipping files the plugin's journal reports as open
+2. Stream them into one zip archive per month under ``.archive``
+3. Verify each archive and only then delete the originals
+4. Record every archived note in ``.archive/index.tsv``
+
+Runs are incremental: only files not archived yet are added, and files left
+behind by an interrupted run are recognized and removed.
+
+Usage:
+    python scripts/autosave_archive.py rotate [--older-than DAYS] [--compression lzma]
+    python scripts/autosave_archive.py list [--month 2024-03] [TEXT]
+    python scripts/autosave_archive.py show NAME
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from autosave_gc import find_settings_file, load_config
+from autosave_reshard import file_date
+
+from autosave_sublime.scratch_archive import (
+    ARCHIVE_DIR,
+    COMPRESSION,
+    ArchivedNote,
+    add_to_archive,
+    append_index,
+    archive_name,
+    archived_sizes,
+    read_archived,
+    read_index,
+    rebuild_index,
+)
+from autosave_sublime.scratch_config import Config
+from autosave_sublime.scratch_dirs import iter_scratch_files
+from autosave_sublime.scratch_journal import Journal
+from autosave_sublime.scratch_names import timestamp_pattern
+from autosave_sublime.scratch_search import INDEX_NAME as SEARCH_INDEX_NAME
+from autosave_sublime.scratch_search import SearchIndex, search_available
+
+DEFAULT_AGE_DAYS = 90
+
+# (source path, name in the archive, size, mtime_ns) per archive file name
+Plan = Dict[str, List[Tuple[str, str, int, int]]]
+
+
+def plan_rotation(directory: str, config: Config, cutoff: float, skip: Set[str]) -> Plan:
+    """Group the files last modified before ``cutoff`` by their month's archive."""
+    pattern = timestamp_pattern(config.timestamp_format)
+    plan = defaultdict(list)  # type: Plan
+    for entry in iter_scratch_files(directory):
+        if entry.path in skip:
+            continue
+        try:
+            st = entry.stat(follow_symlinks=False)
+        except OSError:
+            continue
+        if st.st_mtime >= cutoff:
+            continue
+        date = file_date(entry.name, st.st_mtime, config, pattern)
+        name = os.path.relpath(entry.path, directory).replace(os.sep, "/")
+        plan[archive_name(date.year, date.month)].append(
+            (entry.path, name, st.st_size, st.st_mtime_ns)
+        )
+    return plan
+
+
+def remove_original(path: str, note: ArchivedNote) -> bool:
+    """
+    Delete an archived original unless it changed after being archived.
+
+    Returns:
+        bool: True if the file was deleted
+    """
+    st = os.stat(path)
+    if st.st_size != note.size or st.st_mtime_ns != note.mtime_ns:
+        return False
+    os.remove(path)
+    return True
+
+
+def rotate(
+    directory: str, config: Config, max_age_days: float, compression: str, dry_run: bool = False
+) -> Tuple[int, List[str]]:
+    """
+    Archive and delete the files older than ``max_age_days``.
+
+    Returns:
+        Tuple[int, List[str]]: Number of files archived and error messages
+    """
+    archive_dir = os.path.join(directory, ARCHIVE_DIR)
+    journal = Journal(directory)
+    try:
+        plan = plan_rotation(
+            directory, config, time.time() - max_age_days * 86400, journal.open_files()
+        )
+        if dry_run:
+            for archive, files in sorted(plan.items()):
+                print(f"{archive}: {len(files)} files")
+            return 0, []
+
+        os.makedirs(archive_dir, exist_ok=True)
+        indexed = {(note.archive, note.name) for note in read_index(archive_dir)}
+        archived = 0
+        errors = []  # type: List[str]
+        deleted = []  # type: List[str]
+        for archive, files in sorted(plan.items()):
+            path = os.path.join(archive_dir, archive)
+            existing = archived_sizes(path)
+            pending = []  # type: List[Tuple[str, str]]
+            notes = {}  # type: Dict[str, ArchivedNote]
+            for source, name, size, mtime_ns in files:
+                if name not in existing:
+                    pending.append((source, name))
+                elif existing[name] == size:
+                    # Archived by an interrupted run that did not delete it
+                    notes[source] = ArchivedNote(archive, name, size, mtime_ns)
+                else:
+                    errors.append(f"{source} differs from the copy in {archive}; keeping it")
+            try:
+                added = add_to_archive(path, pending, compression) if pending else []
+            except OSError as e:
+                errors.append(f"Failed to archive into {archive}: {e}")
+                continue
+            for (source, _), note in zip(pending, added):
+                notes[source] = note
+            append_index(
+                archive_dir,
+                (note for note in notes.values() if (note.archive, note.name) not in indexed),
+            )
+
+            for source, note in notes.items():
+                try:
+                    if not remove_original(source, note):
+                        errors.append(f"{source} changed while being archived; keeping it")
+                        continue
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    errors.append(f"Failed to delete file {source}: {e}")
+                    continue
+                archived += 1
+                deleted.append(source)
+                journal.record_deleted(source)
+    finally:
+        journal.close()
+
+    forget_searchable(directory, deleted)
+    return archived, errors
+
+
+def forget_searchable(directory: str, paths: List[str]) -> None:
+    """Drop archived files from the full-text index, if there is one."""
+    if not paths or not search_available():
+        return
+    if not os.path.exists(os.path.join(directory, SEARCH_INDEX_NAME)):
+        return
+    index = SearchIndex(directory)
+    try:
+        for path in paths:
+            index.remove(path)
+    finally:
+        index.close()
+
+
+def find_note(notes: List[ArchivedNote], name: str) -> Optional[ArchivedNote]:
+    """Return the newest note whose name or base name is ``name``."""
+    for note in reversed(notes):
+        if note.name == name or note.name.rpartition("/")[2] == name:
+            return note
+    return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(
+        description="Rotate old scratch files into compressed monthly archives."
+    )
+    parser.add_argument("--directory", help="scratch directory (default: from settings)")
+    parser.add_argument("--settings", help="path to AutoSaveNewFiles.sublime-settings")
+    subparsers = parser.add_subparsers(dest="action", required=True)
+    rotate_parser = subparsers.add_parser("rotate", help="archive old files")
+    rotate_parser.add_argument(
+        "--older-than",
+        type=float,
+        default=DEFAULT_AGE_DAYS,
+        metavar="DAYS",
+        help=f"archive files not modified for this many days (default: {DEFAULT_AGE_DAYS})",
+    )
+    rotate_parser.add_argument("--compression", choices=sorted(COMPRESSION), default="deflate")
+    rotate_parser.add_argument("--dry-run", action="store_true", help="only count the files")
+    list_parser = subparsers.add_parser("list", help="list archived notes")
+    list_parser.add_argument("text", nargs="?", help="only list names containing TEXT")
+    list_parser.add_argument("--month", help="only list one month, as YYYY-MM")
+    show_parser = subparsers.add_parser("show", help="print an archived note")
+    show_parser.add_argument("name", help="name of the note, with or without its shard")
+    subparsers.add_parser("reindex", help="rebuild the index from the archives")
+    args = parser.parse_args(argv)
+
+    config = load_config(args.settings or find_settings_file())
+    directory = os.path.abspath(os.path.expanduser(args.directory or config.save_directory))
+    if not os.path.isdir(directory):
+        print(f"Error: {directory} is not a directory")
+        return 1
+    archive_dir = os.path.join(directory, ARCHIVE_DIR)
+
+    if args.action == "rotate":
+        start = time.perf_counter()
+        try:
+            archived, errors = rotate(
+                directory, config, args.older_than, args.compression, args.dry_run
+            )
+        except KeyboardInterrupt:
+            print("Interrupted; run again to finish archiving.")
+            return 130
+        for error in errors:
+            print(error, file=sys.stderr)
+        if not args.dry_run:
+            print(f"Archived {archived} files in {time.perf_counter() - start:.2f}s")
+        return 1 if errors else 0
+
+    if args.action == "reindex":
+        if not os.path.isdir(archive_dir):
+            print("Nothing has been archived yet")
+            return 0
+        print(f"Indexed {rebuild_index(archive_dir)} archived notes")
+        return 0
+
+    notes = read_index(archive_dir)
+    if args.action == "list":
+        prefix = f"{args.month}.zip" if args.month else None
+        for note in notes:
+            if prefix and note.archive != prefix:
+                continue
+            if args.text and args.text not in note.name:
+                continue
+            print(f"{note.archive}\t{note.name}\t{note.size}")
+        return 0
+
+    note = find_note(notes, args.name)
+    if note is None:
+        print(f"Error: {args.name} is not archived")
+        return 1
+    sys.stdout.write(read_archived(archive_dir, note))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
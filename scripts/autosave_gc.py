@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Garbage collector for abandoned AutoSaveNewFiles scratch files.
+
+Finds files in the save directory that hold nothing but the timestamp header
+the plugin inserts, or nothing at all, and optionally deletes them.
+This script will:
+1. Stream the directory with os.scandir, keeping only files small enough to
+   be header-only that are named like the plugin names its files, or that
+   the plugin's journal records
+2. Read the first bytes of each candidate in a pool of worker processes,
+   handing them over in chunks as the scan finds them
+3. Skip files the plugin's journal reports as open, or an instance holds a
+   lease on
+4. Print a summary, list the files, or delete them
+
+Usage:
+    python scripts/autosave_gc.py [--mode dry-run|report|delete] [--directory DIR]
+"""
+
+import argparse
+import datetime
+import itertools
+import json
+import os
+import re
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Pattern, Tuple
+
+from autosave_sublime.scratch_config import DEFAULTS, SETTINGS_FILE, Config
+from autosave_sublime.scratch_dirs import iter_scratch_files
+from autosave_sublime.scratch_journal import Journal
+from autosave_sublime.scratch_leases import Leases
+from autosave_sublime.scratch_names import filename_pattern, timestamp_pattern, unsuffixed
+
+# Characters of whitespace a header-only file may hold beyond the timestamp
+HEADER_SLACK = 16
+
+# Number of candidate files handed to a worker process at once
+CHUNK_SIZE = 512
+
+# Chunks queued per worker process before the scan waits for results
+CHUNKS_IN_FLIGHT = 2
+
+# Compiled header patterns, cached per worker process
+_patterns = {}  # type: Dict[str, Pattern]
+
+
+def find_settings_file() -> Optional[str]:
+    """Return the user's plugin settings file, if Sublime Text has one."""
+    from autosave_sublime_setup import get_first_valid_sublime_dir
+
+    packages_dir = get_first_valid_sublime_dir()
+    if packages_dir is None:
+        return None
+    path = os.path.join(packages_dir, "User", SETTINGS_FILE)
+    return path if os.path.exists(path) else None
+
+
+def load_config(settings_path: Optional[str]) -> Config:
+    """
+    Load the plugin settings the same way the plugin does.
+
+    Args:
+        settings_path: Settings file to read, or None for the defaults
+
+    Returns:
+        Config: The validated settings snapshot
+    """
+    values = dict(DEFAULTS)
+    if settings_path:
+        with open(settings_path, encoding="utf-8") as f:
+            # sublime-settings files allow whole-line // comments
+            text = "".join(line for line in f if not line.lstrip().startswith("//"))
+        values.update(json.loads(text))
+    return Config.from_dict(values)
+
+
+def max_header_size(config: Config) -> int:
+    """Return the largest size in bytes a header-only file can have."""
+    if not config.insert_timestamp:
+        return HEADER_SLACK
+    # A long month and weekday name give an upper bound for textual formats
+    sample = datetime.datetime(2021, 9, 29, 23, 59, 59, 999999).strftime(config.timestamp_format)
+    return len(sample.encode("utf-8")) + len("_000000") + HEADER_SLACK
+
+
+def scratch_name_matcher(config: Config, journal: Journal) -> Callable[[str], bool]:
+    """
+    Return a test for files the plugin may have created.
+
+    A file qualifies if its name has the form ``filename_format`` gives new
+    files, with or without a ``_N`` suffix, or if the journal records it.
+    Other small files, such as a README or an ``__init__.py``, never do.
+    """
+    extensions = [config.default_extension]
+    extensions.extend(rule.extension for rule in config.rules if rule.extension)
+    pattern = filename_pattern(
+        config.filename_format, config.timestamp_format, extensions, config.fraction_digits
+    )
+
+    def matches(path: str) -> bool:
+        name = os.path.basename(path)
+        return bool(
+            pattern.fullmatch(name) or pattern.fullmatch(unsuffixed(name)) or path in journal
+        )
+
+    return matches
+
+
+def scan_candidates(
+    directory: str, max_size: int, min_age: float, matches: Callable[[str], bool]
+) -> Iterator[str]:
+    """
+    Yield files small and old enough to be abandoned header-only files.
+
+    Date-sharded subdirectories are searched too. Hidden files and
+    directories, such as the plugin's journal, are never candidates, nor
+    are files ``matches`` rejects.
+    """
+    cutoff = time.time() - min_age
+    for entry in iter_scratch_files(directory):
+        if not matches(entry.path):
+            continue
+        try:
+            st = entry.stat(follow_symlinks=False)
+        except OSError:
+            continue
+        if st.st_size <= max_size and st.st_mtime <= cutoff:
+            yield entry.path
+
+
+def find_header_only(paths: List[str], pattern: Optional[str], max_size: int) -> List[str]:
+    """
+    Return the files in ``paths`` that are empty or hold only a timestamp.
+
+    Runs in worker processes, so it takes the pattern as a string.
+    """
+    compiled = None
+    if pattern is not None:
+        compiled = _patterns.get(pattern)
+        if compiled is None:
+            compiled = _patterns[pattern] = re.compile(pattern)
+
+    found = []
+    for path in paths:
+        try:
+            with open(path, "rb") as f:
+                data = f.read(max_size + 1)
+            text = data.decode("utf-8").strip()
+        except (OSError, UnicodeDecodeError):
+            continue
+        if len(data) <= max_size and (
+            not text or (compiled is not None and compiled.fullmatch(text))
+        ):
+            found.append(path)
+    return found
+
+
+def collect(
+    candidates: Iterator[str], pattern: Optional[str], max_size: int, jobs: int
+) -> Tuple[int, List[str]]:
+    """
+    Check candidates in chunks, in parallel when ``jobs`` is above 1.
+
+    Chunks go to the worker processes while the scan is still running, with
+    at most ``CHUNKS_IN_FLIGHT`` per worker waiting, so memory stays bounded
+    however many candidates there are.
+
+    Returns:
+        Tuple[int, List[str]]: Number of candidates and the header-only files
+    """
+    count = 0
+
+    def chunked() -> Iterator[List[str]]:
+        nonlocal count
+        chunk = []  # type: List[str]
+        for path in candidates:
+            count += 1
+            chunk.append(path)
+            if len(chunk) == CHUNK_SIZE:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    chunks = chunked()
+    first = next(chunks, None)
+    second = next(chunks, None)
+    found = []  # type: List[str]
+    if jobs <= 1 or second is None:
+        # A single chunk is not worth starting worker processes for
+        for chunk in itertools.chain((first, second), chunks):
+            if chunk is not None:
+                found.extend(find_header_only(chunk, pattern, max_size))
+        return count, found
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        pending = deque()  # type: Deque[Future]
+        for chunk in itertools.chain((first, second), chunks):
+            pending.append(pool.submit(find_header_only, chunk, pattern, max_size))
+            if len(pending) >= jobs * CHUNKS_IN_FLIGHT:
+                found.extend(pending.popleft().result())
+        while pending:
+            found.extend(pending.popleft().result())
+    return count, found
+
+
+def delete_files(
+    paths: List[str], journal: Journal, leases: Leases, max_size: int
+) -> Tuple[int, List[str]]:
+    """
+    Delete header-only files, re-checking their size and holding their lease
+    so no instance opens them meanwhile.
+
+    Returns:
+        Tuple[int, List[str]]: Number deleted and error messages
+    """
+    deleted = 0
+    errors = []
+    for path in paths:
+        if not leases.claim(path):
+            continue
+        try:
+            if os.stat(path).st_size > max_size:
+                continue
+            os.remove(path)
+        except FileNotFoundError:
+            continue
+        except OSError as e:
+            errors.append(f"Failed to delete file {path}: {e}")
+            continue
+        finally:
+            leases.release(path)
+        deleted += 1
+        try:
+            journal.record_deleted(path)
+        except OSError as e:
+            errors.append(f"Failed to update journal for {path}: {e}")
+    return deleted, errors
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(
+        description="Find and delete scratch files that only hold a timestamp header."
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["dry-run", "report", "delete"],
+        default="dry-run",
+        help="dry-run prints a summary, report also lists the files, delete removes them",
+    )
+    parser.add_argument("--directory", help="scratch directory (default: from settings)")
+    parser.add_argument("--settings", help="path to AutoSaveNewFiles.sublime-settings")
+    parser.add_argument(
+        "--min-age",
+        type=float,
+        default=3600,
+        help="only consider files not modified for this many seconds (default: 3600)",
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=os.cpu_count() or 1, help="number of worker processes"
+    )
+    args = parser.parse_args(argv)
+
+    config = load_config(args.settings or find_settings_file())
+    directory = os.path.abspath(os.path.expanduser(args.directory or config.save_directory))
+    if not os.path.isdir(directory):
+        print(f"Error: {directory} is not a directory")
+        return 1
+
+    start = time.perf_counter()
+    max_size = max_header_size(config)
+    pattern = None
+    if config.insert_timestamp:
+        pattern = timestamp_pattern(config.timestamp_format, config.fraction_digits).pattern
+    journal = Journal(directory)
+    matches = scratch_name_matcher(config, journal)
+    candidates = scan_candidates(directory, max_size, args.min_age, matches)
+    count, found = collect(candidates, pattern, max_size, args.jobs)
+
+    leases = Leases(directory)
+    open_files = journal.open_files()
+    abandoned = sorted(
+        path for path in found if path not in open_files and not leases.held_elsewhere(path)
+    )
+
+    if args.mode == "report":
+        for path in abandoned:
+            print(path)
+
+    summary = (
+        f"{count} candidates, {len(abandoned)} header-only files"
+        f" ({len(found) - len(abandoned)} open files skipped)"
+    )
+    if args.mode == "delete":
+        deleted, errors = delete_files(abandoned, journal, leases, max_size)
+        for error in errors:
+            print(error, file=sys.stderr)
+        summary += f", {deleted} deleted"
+    journal.close()
+    leases.close()
+
+    print(f"{summary} in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Build or query the full-text index of AutoSaveNewFiles scratch notes.
+
+The plugin keeps the index up to date as managed files are saved when the
+``search_index`` setting is on. This script will:
+1. Rebuild the index from every note in the save directory, streaming the
+   files in batches inside a single transaction
+2. Or run a query against the existing index
+
+Usage:
+    python scripts/autosave_index.py rebuild [--directory DIR]
+    python scripts/autosave_index.py search WORDS... [--directory DIR]
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import Iterator, List, Optional, Tuple
+
+from autosave_gc import find_settings_file, load_config
+
+from autosave_sublime.scratch_dirs import iter_scratch_files
+from autosave_sublime.scratch_search import SearchIndex, read_note, search_available
+
+
+def iter_notes(directory: str) -> Iterator[Tuple[str, str, int]]:
+    """Yield ``(path, text, mtime_ns)`` for every note, skipping unreadable files."""
+    for entry in iter_scratch_files(directory):
+        try:
+            text, mtime_ns = read_note(entry.path)
+        except OSError:
+            continue
+        yield entry.path, text, mtime_ns
+
+
+def rebuild(directory: str) -> int:
+    """Replace the index of ``directory`` with its current notes."""
+    index = SearchIndex(directory)
+    try:
+        index.clear()
+        return index.update_many(iter_notes(directory))
+    finally:
+        index.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(description="Build or query the scratch note index.")
+    parser.add_argument("--directory", help="scratch directory (default: from settings)")
+    parser.add_argument("--settings", help="path to AutoSaveNewFiles.sublime-settings")
+    subparsers = parser.add_subparsers(dest="action", required=True)
+    subparsers.add_parser("rebuild", help="index every note in the directory")
+    search_parser = subparsers.add_parser("search", help="search the index")
+    search_parser.add_argument("words", nargs="+")
+    search_parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if not search_available():
+        print("Error: this Python's sqlite3 module does not support FTS5")
+        return 1
+    config = load_config(args.settings or find_settings_file())
+    directory = os.path.abspath(os.path.expanduser(args.directory or config.save_directory))
+    if not os.path.isdir(directory):
+        print(f"Error: {directory} is not a directory")
+        return 1
+
+    start = time.perf_counter()
+    if args.action == "rebuild":
+        count = rebuild(directory)
+        print(f"Indexed {count} notes in {time.perf_counter() - start:.2f}s")
+        return 0
+
+    index = SearchIndex(directory)
+    try:
+        results = index.search(" ".join(args.words), args.limit)
+    finally:
+        index.close()
+    for result in results:
+        print(f"{result.path}\n    {result.snippet}")
+    print(f"{len(results)} results in {(time.perf_counter() - start) * 1000:.1f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Move a flat AutoSaveNewFiles scratch directory into date-sharded subdirectories.
+
+Files are sorted into directories such as ``2024/03/19/`` based on the
+timestamp in their name, or their modification time when the name does not
+hold one. This script will:
+1. List the top level of the save directory once
+2. Move the files in a pool of threads, creating shard directories on demand
+3. Update the plugin's journal so moved files are still managed
+
+Each move hard-links the file into place and then unlinks the original, so an
+interrupted run leaves every file in its old location, its new location, or
+both, and running the script again finishes the job.
+
+Usage:
+    python scripts/autosave_reshard.py [--layout "{year}/{month}/{day}"] [--dry-run]
+"""
+
+import argparse
+import datetime
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Pattern, Set, Tuple
+
+from autosave_gc import find_settings_file, load_config
+
+from autosave_sublime.scratch_config import Config
+from autosave_sublime.scratch_journal import Journal
+from autosave_sublime.scratch_names import suffixed, timestamp_pattern
+
+DEFAULT_LAYOUT = "{year}/{month}/{day}"
+
+
+def default_layout(config: Config) -> str:
+    """Return the shard layout implied by ``filename_format``, if it has one."""
+    directory, _, _ = config.filename_format.rpartition("/")
+    return directory or DEFAULT_LAYOUT
+
+
+def file_date(name: str, mtime: float, config: Config, pattern: Pattern) -> datetime.datetime:
+    """
+    Work out when a scratch file was created.
+
+    Args:
+        name: File name
+        mtime: Modification time used when the name holds no timestamp
+        config: Settings snapshot with the timestamp format
+        pattern: Compiled ``timestamp_pattern`` without milliseconds
+    """
+    match = pattern.match(name)
+    if match:
+        try:
+            return datetime.datetime.strptime(match.group(0), config.timestamp_format)
+        except ValueError:
+            pass
+    return datetime.datetime.fromtimestamp(mtime)
+
+
+def plan_moves(
+    directory: str, layout: str, config: Config, skip: Set[str]
+) -> Iterator[Tuple[str, str]]:
+    """Yield ``(source, destination)`` for every flat file to move."""
+    pattern = timestamp_pattern(config.timestamp_format)
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.name.startswith(".") or entry.path in skip:
+                continue
+            try:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                mtime = entry.stat(follow_symlinks=False).st_mtime
+            except OSError:
+                continue
+            date = file_date(entry.name, mtime, config, pattern)
+            shard = layout.format(
+                year=f"{date.year:04d}", month=f"{date.month:02d}", day=f"{date.day:02d}"
+            )
+            yield entry.path, os.path.join(directory, *shard.split("/"), entry.name)
+
+
+def move_file(source: str, destination: str) -> str:
+    """
+    Move ``source`` to ``destination``, adding a ``_N`` suffix on conflicts.
+
+    Safe to repeat after an interruption: a destination that is already a
+    hard link to the source completes the move.
+
+    Returns:
+        str: The final destination path
+    """
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    counter = 0
+    while True:
+        candidate = suffixed(destination, counter)
+        counter += 1
+        try:
+            os.link(source, candidate)
+        except FileExistsError:
+            if os.path.samefile(source, candidate):
+                break
+            continue
+        except OSError:
+            # Filesystems without hard links fall back to a rename
+            if os.path.lexists(candidate):
+                continue
+            os.rename(source, candidate)
+            return candidate
+        break
+    os.unlink(source)
+    return candidate
+
+
+def reshard(
+    directory: str, layout: str, config: Config, jobs: int, dry_run: bool = False
+) -> Tuple[int, List[str]]:
+    """
+    Move every flat file in ``directory`` into its shard.
+
+    Returns:
+        Tuple[int, List[str]]: Number of files moved and error messages
+    """
+    journal = Journal(directory)
+    moves = list(plan_moves(directory, layout, config, journal.open_files()))
+    if dry_run:
+        for source, destination in moves:
+            print(f"{source} -> {destination}")
+        journal.close()
+        return 0, []
+
+    def run(move: Tuple[str, str]) -> Optional[str]:
+        source, destination = move
+        try:
+            journal.record_moved(source, move_file(source, destination))
+        except OSError as e:
+            return f"Failed to move {source}: {e}"
+        return None
+
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            errors = [error for error in pool.map(run, moves) if error]
+    finally:
+        journal.close()
+    return len(moves) - len(errors), errors
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point."""
+    parser = argparse.ArgumentParser(
+        description="Move a flat scratch directory into date-sharded subdirectories."
+    )
+    parser.add_argument("--directory", help="scratch directory (default: from settings)")
+    parser.add_argument("--settings", help="path to AutoSaveNewFiles.sublime-settings")
+    parser.add_argument(
+        "--layout",
+        help=f"shard directory format (default: from filename_format, or {DEFAULT_LAYOUT})",
+    )
+    parser.add_argument("--jobs", type=int, default=8, help="number of worker threads")
+    parser.add_argument("--dry-run", action="store_true", help="only print the planned moves")
+    args = parser.parse_args(argv)
+
+    config = load_config(args.settings or find_settings_file())
+    directory = os.path.abspath(os.path.expanduser(args.directory or config.save_directory))
+    if not os.path.isdir(directory):
+        print(f"Error: {directory} is not a directory")
+        return 1
+
+    start = time.perf_counter()
+    try:
+        moved, errors = reshard(
+            directory, args.layout or default_layout(config), config, args.jobs, args.dry_run
+        )
+    except KeyboardInterrupt:
+        print("Interrupted; run again to finish moving the remaining files.")
+        return 130
+    for error in errors:
+        print(error, file=sys.stderr)
+    if not args.dry_run:
+        print(f"Moved {moved} files in {time.perf_counter() - start:.2f}s")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
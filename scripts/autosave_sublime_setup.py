@@ -15,6 +15,9 @@ import sys
 from pathlib import Path
 from typing import List, Optional, Tuple
 
+# Command Palette entries installed next to the plugin
+COMMANDS_FILE = "AutoSaveNewFiles.sublime-commands"
+
 
 def get_sublime_packages_dirs() -> List[str]:
     """
@@ -55,11 +58,25 @@ def create_default_config():
     """Create default configuration dictionary."""
     return {
         "save_directory": "~/scratch",
+        "staging_directory": "",
         "filename_format": "{timestamp}.{extension}",
         "insert_timestamp": True,
         "timestamp_format": "%Y_%m_%d_%H%M%S",
         "use_microseconds": False,
+        # "seconds", "milliseconds" or "microseconds"; None follows use_microseconds
+        "timestamp_precision": None,
         "default_extension": "md",
+        "write_directly": True,
+        "search_index": False,
+        "history": False,
+        "watch": True,
+        "autosave": False,
+        "autosave_delay": 1.0,
+        "autosave_max_delay": 10.0,
+        "autosave_fsync": "file",
+        "rules": [],
+        "stats": False,
+        "debug": False,
     }
 
 
@@ -73,11 +90,10 @@ def validate_directory(path: str) -> bool:
     Returns:
         bool: True if directory is writable, False otherwise
     """
+    from autosave_sublime.scratch_dirs import probe_directory
+
     try:
-        test_file = os.path.join(path, ".test_permissions")
-        with open(test_file, "w") as f:
-            f.write("")
-        os.remove(test_file)
+        probe_directory(path, create=False)
         return True
     except (PermissionError, OSError):
         return False
@@ -103,9 +119,30 @@ def setup_user_directory(packages_dir: str) -> Tuple[bool, str]:
         return False, f"Error creating User directory: {e}"
 
 
+def get_plugin_files(package_dir: str) -> List[str]:
+    """
+    List the files that make up the plugin.
+
+    The plugin entry point imports its ``scratch_*`` support modules, so they
+    must be installed next to it.
+
+    Args:
+        package_dir: Source package directory
+
+    Returns:
+        List[str]: File names relative to ``package_dir``
+    """
+    support = sorted(
+        name
+        for name in os.listdir(package_dir)
+        if name.startswith("scratch_") and name.endswith(".py")
+    )
+    return ["auto_save_new_files.py"] + support
+
+
 def copy_plugin_file(package_dir: str, user_dir: str) -> Tuple[bool, str]:
     """
-    Copy the plugin file to Sublime Text User directory.
+    Copy the plugin file, its modules and its commands to Sublime Text User directory.
 
     Args:
         package_dir: Source package directory
@@ -114,13 +151,27 @@ def copy_plugin_file(package_dir: str, user_dir: str) -> Tuple[bool, str]:
     Returns:
         Tuple[bool, str]: Success status and message
     """
-    plugin_src = os.path.join(package_dir, "auto_save_new_files.py")
     plugin_dst = os.path.join(user_dir, "auto_save_new_files.py")
+    commands_src = os.path.join(os.path.dirname(package_dir), COMMANDS_FILE)
     try:
-        shutil.copy2(plugin_src, plugin_dst)
-        return True, f"✓ Copied plugin file to {plugin_dst}"
+        for name in get_plugin_files(package_dir):
+            shutil.copy2(os.path.join(package_dir, name), os.path.join(user_dir, name))
     except Exception as e:
         return False, f"Error copying plugin file: {e}"
+    message = f"✓ Copied plugin file to {plugin_dst}"
+    # Command Palette entries for the plugin's commands; only found beside
+    # the package in a source checkout, not in an installed wheel
+    if not os.path.isfile(commands_src):
+        return True, (
+            f"{message}\nWarning: {COMMANDS_FILE} not found, the commands will not be"
+            " listed in the Command Palette; copy it from the repository to"
+            f" {user_dir} to add them"
+        )
+    try:
+        shutil.copy2(commands_src, os.path.join(user_dir, COMMANDS_FILE))
+    except OSError as e:
+        return True, f"{message}\nWarning: could not copy {COMMANDS_FILE}: {e}"
+    return True, message
 
 
 def create_settings(user_dir: str) -> Tuple[bool, str]:
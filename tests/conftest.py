@@ -0,0 +1,27 @@
+"""Shared fixtures for driving the plugin against the mock sublime module."""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add mocks directory to Python path
+sys.path.insert(0, str(Path(__file__).parent / "mocks"))
+
+import sublime  # noqa: E402
+
+
+@pytest.fixture
+def plugin(tmp_path, monkeypatch):
+    """
+    Load the plugin with its save directory pointed at a temporary directory.
+
+    Yields the plugin module; the save directory is ``tmp_path / "scratch"``.
+    """
+    from autosave_sublime import auto_save_new_files
+
+    settings = sublime.load_settings("AutoSaveNewFiles.sublime-settings")
+    monkeypatch.setitem(settings._settings, "save_directory", str(tmp_path / "scratch"))
+    auto_save_new_files.plugin_loaded()
+    yield auto_save_new_files
+    auto_save_new_files.plugin_unloaded()
@@ -8,15 +8,46 @@ class Region:
         self.a = a
         self.b = b if b is not None else a
 
+    def begin(self):
+        return min(self.a, self.b)
+
+    def end(self):
+        return max(self.a, self.b)
+
+    def size(self):
+        return abs(self.b - self.a)
+
 
 class View:
     """Mock View class."""
 
-    def __init__(self):
-        self._file_name = None
-        self._is_scratch = False
-        self._content = ""
-        self._size = 0
+    _next_id = 1
+
+    def __init__(self, window=None, content="", file_name=None, scratch=False):
+        self._id = View._next_id
+        View._next_id += 1
+        self._window = window
+        self._file_name = file_name
+        self._is_scratch = scratch
+        self._content = content
+        self._size = len(content)
+        self._valid = True
+        self._change_count = 0
+        self._dirty = False
+        self._settings = ViewSettings()
+        self.commands = []
+
+    def id(self):
+        return self._id
+
+    def settings(self):
+        return self._settings
+
+    def window(self):
+        return self._window
+
+    def is_valid(self):
+        return self._valid
 
     def file_name(self):
         return self._file_name
@@ -24,31 +55,85 @@ class View:
     def is_scratch(self):
         return self._is_scratch
 
+    def set_scratch(self, scratch):
+        self._is_scratch = scratch
+
+    def set_read_only(self, read_only):
+        self.read_only = read_only
+
+    def set_name(self, name):
+        self.name = name
+
+    def assign_syntax(self, syntax):
+        self.syntax = syntax
+        self._settings.set("syntax", syntax)
+
     def size(self):
         return self._size
 
+    def change_count(self):
+        return self._change_count
+
+    def is_dirty(self):
+        return self._dirty
+
     def substr(self, region):
-        return self._content
+        return self._content[region.begin() : region.end()]
 
     def retarget(self, new_path):
         self._file_name = new_path
 
     def run_command(self, cmd, args=None):
-        if cmd == "save":
-            pass  # Mock save operation
-        elif cmd == "insert" and args and "characters" in args:
+        self.commands.append(cmd)
+        if cmd == "save" and self._file_name:
+            with open(self._file_name, "w", encoding="utf-8", newline="") as f:
+                f.write(self._content)
+            self._dirty = False
+        elif cmd == "revert" and self._file_name:
+            with open(self._file_name, encoding="utf-8", newline="") as f:
+                self._content = f.read()
+            self._size = len(self._content)
+            self._dirty = False
+        elif cmd in ("insert", "append") and args and "characters" in args:
             self._content += args["characters"]
             self._size = len(self._content)
+            self._change_count += 1
+            self._dirty = True
+
+
+class ViewSettings(dict):
+    """Mock per-view settings."""
+
+    def set(self, key, value):
+        self[key] = value
+
+
+_loaded_settings = {}
 
 
 def load_settings(settings_file):
-    """Mock settings loader."""
-    return Settings()
+    """Mock settings loader, returning one shared instance per file."""
+    if settings_file not in _loaded_settings:
+        _loaded_settings[settings_file] = Settings()
+    return _loaded_settings[settings_file]
+
+
+error_messages = []
 
 
 def error_message(message):
-    """Mock error message display."""
-    pass
+    """Mock error message display, recording the message."""
+    error_messages.append(message)
+
+
+def set_timeout(callback, delay=0):
+    """Mock set_timeout, running the callback immediately."""
+    callback()
+
+
+def set_timeout_async(callback, delay=0):
+    """Mock set_timeout_async, running the callback immediately."""
+    callback()
 
 
 class Settings:
@@ -57,12 +142,92 @@ class Settings:
     def __init__(self):
         self._settings = {
             "save_directory": "~/scratch",
+            "staging_directory": "",
             "filename_format": "{timestamp}.{extension}",
             "insert_timestamp": True,
             "timestamp_format": "%Y_%m_%d_%H%M%S",
             "use_microseconds": False,
+            "timestamp_precision": None,
             "default_extension": "md",
+            "write_directly": True,
+            "search_index": False,
+            "history": False,
+            # Tests start the directory watcher explicitly
+            "watch": False,
+            "rules": [],
+            "stats": False,
+            "debug": False,
         }
+        self._on_change = {}
 
     def get(self, key, default=None):
         return self._settings.get(key, default)
+
+    def set(self, key, value):
+        self._settings[key] = value
+        for callback in list(self._on_change.values()):
+            callback()
+
+    def add_on_change(self, tag, callback):
+        self._on_change[tag] = callback
+
+    def clear_on_change(self, tag):
+        self._on_change.pop(tag, None)
+
+
+status_messages = []
+
+
+def status_message(message):
+    """Mock status bar message, recording the message."""
+    status_messages.append(message)
+
+
+class Window:
+    """Mock Window class."""
+
+    _next_id = 1
+
+    def __init__(self):
+        self._id = Window._next_id
+        Window._next_id += 1
+        self._views = []
+        self._folders = []
+        self.opened = []
+        self.quick_panel = None
+        self.input_panel = None
+        self.commands = []
+
+    def id(self):
+        return self._id
+
+    def views(self):
+        return list(self._views)
+
+    def folders(self):
+        return list(self._folders)
+
+    def active_view(self):
+        return self._views[-1] if self._views else None
+
+    def new_file(self, content="", file_name=None):
+        view = View(self, content, file_name)
+        self._views.append(view)
+        return view
+
+    def close_view(self, view):
+        self._views.remove(view)
+        view._valid = False
+
+    def open_file(self, path):
+        self.opened.append(path)
+
+    def show_quick_panel(self, items, on_select, flags=0, selected_index=-1):
+        self.quick_panel = (items, on_select)
+        self.quick_panel_selected = selected_index
+
+    def show_input_panel(self, caption, initial, on_done, on_change, on_cancel):
+        self.input_panel = (caption, on_done)
+
+    def run_command(self, cmd, args=None):
+        self.commands.append((cmd, args))
@@ -5,3 +5,10 @@ class EventListener:
     """Mock EventListener class."""
 
     pass
+
+
+class WindowCommand:
+    """Mock WindowCommand class."""
+
+    def __init__(self, window):
+        self.window = window
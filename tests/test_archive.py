@@ -0,0 +1,93 @@
+"""Tests for rotating old scratch files into monthly archives."""
+
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+import autosave_archive  # noqa: E402
+
+from autosave_sublime.scratch_archive import ARCHIVE_DIR, read_archived, read_index  # noqa: E402
+from autosave_sublime.scratch_journal import Journal  # noqa: E402
+
+
+def age(path: Path, days: float) -> None:
+    """Set the modification time of ``path`` to ``days`` ago."""
+    when = time.time() - days * 86400
+    os.utime(path, (when, when))
+
+
+def test_rotate_archives_verifies_and_resumes(tmp_path):
+    """Test that old files are archived by month, deleted, and runs are incremental."""
+    (tmp_path / "2024_03_19_123456.md").write_text("march")
+    (tmp_path / "2024" / "04").mkdir(parents=True)
+    (tmp_path / "2024" / "04" / "2024_04_01_080000.md").write_text("april")
+    (tmp_path / "2024_03_20_090000.md").write_text("still open")
+    (tmp_path / "recent.md").write_text("recent")
+    for path in tmp_path.rglob("*.md"):
+        age(path, 200)
+    age(tmp_path / "recent.md", 1)
+
+    journal = Journal(str(tmp_path))
+    journal.record_created(str(tmp_path / "2024_03_19_123456.md"), "2024_03_19_123456")
+    journal.record_closed(str(tmp_path / "2024_03_19_123456.md"))
+    journal.record_created(str(tmp_path / "2024_03_20_090000.md"), "2024_03_20_090000")
+    journal.close()
+
+    config = autosave_archive.load_config(None)
+    archived, errors = autosave_archive.rotate(str(tmp_path), config, 90, "deflate")
+
+    assert (archived, errors) == (2, [])
+    assert sorted(p.name for p in tmp_path.rglob("*.md")) == ["2024_03_20_090000.md", "recent.md"]
+    archive_dir = str(tmp_path / ARCHIVE_DIR)
+    notes = read_index(archive_dir)
+    assert [(n.archive, n.name) for n in notes] == [
+        ("2024-03.zip", "2024_03_19_123456.md"),
+        ("2024-04.zip", "2024/04/2024_04_01_080000.md"),
+    ]
+    assert read_archived(archive_dir, notes[1]) == "april"
+    assert str(tmp_path / "2024_03_19_123456.md") not in Journal(str(tmp_path))
+
+    # A later run adds to the existing month and removes a left-over original
+    (tmp_path / "2024_03_25_100000.md").write_text("late march")
+    (tmp_path / "2024_03_19_123456.md").write_text("march")
+    age(tmp_path / "2024_03_25_100000.md", 200)
+    age(tmp_path / "2024_03_19_123456.md", 200)
+    # Simulate a run interrupted after archiving but before deleting
+    os.utime(tmp_path / "2024_03_19_123456.md", ns=(notes[0].mtime_ns, notes[0].mtime_ns))
+
+    archived, errors = autosave_archive.rotate(str(tmp_path), config, 90, "lzma")
+
+    assert (archived, errors) == (2, [])
+    assert [n.name for n in read_index(archive_dir)] == [
+        "2024_03_19_123456.md",
+        "2024/04/2024_04_01_080000.md",
+        "2024_03_25_100000.md",
+    ]
+    note = autosave_archive.find_note(read_index(archive_dir), "2024_03_25_100000.md")
+    assert read_archived(archive_dir, note) == "late march"
+    assert read_archived(archive_dir, notes[0]) == "march"
+
+
+def test_open_archived_note(plugin, tmp_path):
+    """Test that the plugin lists archived notes and opens them read-only."""
+    import sublime
+
+    scratch = tmp_path / "scratch"
+    scratch.mkdir()
+    (scratch / "2024_03_19_123456.md").write_text("old note")
+    age(scratch / "2024_03_19_123456.md", 200)
+    config = autosave_archive.load_config(None)
+    autosave_archive.rotate(str(scratch), config, 90, "deflate")
+
+    window = sublime.Window()
+    plugin.AutoSaveNewFilesOpenArchivedCommand(window).run()
+    items, on_select = window.quick_panel
+    assert items == [["2024_03_19_123456.md", "2024-03.zip"]]
+
+    on_select(0)
+    view = window.views()[0]
+    assert view.read_only and view.is_scratch()
+    assert view.substr(sublime.Region(0, view.size())) == "old note"
@@ -0,0 +1,109 @@
+"""Tests for debounced atomic autosave of managed files."""
+
+import heapq
+import itertools
+import os
+
+import pytest
+
+from autosave_sublime.scratch_autosave import Debouncer, atomic_write, write_bound
+
+
+class VirtualTime:
+    """Clock and scheduler that only advance when told to."""
+
+    def __init__(self):
+        self.now = 0.0
+        self._queue = []
+        self._sequence = itertools.count()
+
+    def schedule(self, callback, delay):
+        heapq.heappush(self._queue, (self.now + delay, next(self._sequence), callback))
+
+    def advance(self, seconds):
+        end = self.now + seconds
+        while self._queue and self._queue[0][0] <= end:
+            self.now, _, callback = heapq.heappop(self._queue)
+            callback()
+        self.now = end
+
+
+def test_atomic_write_replaces_or_keeps(tmp_path, monkeypatch):
+    """Test that a write replaces the file and a failed write keeps the old content."""
+    path = tmp_path / "note.md"
+    path.write_text("old")
+    os.chmod(path, 0o600)
+
+    atomic_write(str(path), b"new", "full")
+    assert path.read_bytes() == b"new"
+    assert path.stat().st_mode & 0o777 == 0o600
+
+    def fail(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", fail)
+    with pytest.raises(OSError):
+        atomic_write(str(path), b"newer", "never")
+    assert path.read_bytes() == b"new"
+    assert os.listdir(tmp_path) == ["note.md"]
+
+
+def test_sustained_typing_write_amplification():
+    """Test that a minute of typing is written at most once per max_delay."""
+    clock = VirtualTime()
+    fired = []
+    debouncer = Debouncer(
+        lambda value: fired.append((clock.now, value)), clock.schedule, lambda: clock.now
+    )
+
+    for keystroke in range(600):
+        debouncer.touch(1, keystroke, 1.0, 5.0)
+        clock.advance(0.1)
+    assert len(fired) <= write_bound(60.0, 5.0)
+    assert all(b - a >= 5.0 for (a, _), (b, _) in zip(fired, fired[1:]))
+
+    # Once typing stops the last keystroke is written after the idle delay
+    clock.advance(1.0)
+    assert fired[-1][1] == 599
+    assert len(fired) <= write_bound(60.0, 5.0) + 1
+
+
+def test_plugin_autosaves_managed_file(plugin, monkeypatch):
+    """Test that edits of a managed file are written once and the view is marked saved."""
+    import sublime
+
+    clock = VirtualTime()
+    monkeypatch.setattr(
+        sublime, "set_timeout_async", lambda cb, delay=0: clock.schedule(cb, delay / 1000)
+    )
+    settings = sublime.load_settings("AutoSaveNewFiles.sublime-settings")
+    monkeypatch.setitem(settings._settings, "autosave", True)
+    monkeypatch.setitem(settings._settings, "insert_timestamp", False)
+    plugin.reload_config()
+
+    listener = plugin.AutoSaveNewFilesCommand()
+    listener.autosaves._clock = lambda: clock.now
+    view = sublime.View()
+    listener.on_new_async(view)
+    clock.advance(0.1)
+    assert view.file_name() in plugin._records.paths()
+
+    writes = []
+    monkeypatch.setattr(
+        plugin, "atomic_write", lambda *args: (writes.append(args[1]), atomic_write(*args))
+    )
+    for text in "hello":
+        view.run_command("insert", {"characters": text})
+        listener.on_modified_async(view)
+        clock.advance(0.2)
+    clock.advance(1.0)
+
+    assert writes == [b"hello"]
+    with open(view.file_name(), "rb") as f:
+        assert f.read() == b"hello"
+    assert not view.is_dirty()
+
+    # The revert fires another modification, which finds nothing new to write
+    listener.on_modified_async(view)
+    clock.advance(2.0)
+    assert writes == [b"hello"]
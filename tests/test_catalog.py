@@ -0,0 +1,101 @@
+"""Tests for the catalog of recently saved notes."""
+
+import os
+
+
+def test_title_skips_header_and_markup():
+    """Test that the title is the first meaningful line after the header."""
+    from autosave_sublime.scratch_catalog import note_title
+
+    header = "2024_03_19_123456"
+    assert note_title(f"{header}\n\n---\n## Shopping  list\nmilk\n", header) == "Shopping list"
+    assert note_title(f"{header}\n\n", header) == ""
+    assert note_title("- [ ] call Bob\n") == "[ ] call Bob"
+
+
+def test_pages_read_newest_entries_lazily(tmp_path, monkeypatch):
+    """Test that pages are read from the end of the log, newest first."""
+    from autosave_sublime import scratch_catalog
+    from autosave_sublime.scratch_catalog import Catalog
+
+    monkeypatch.setattr(scratch_catalog, "_BLOCK_SIZE", 256)
+    catalog = Catalog(str(tmp_path))
+    for i in range(1000):
+        catalog.update(str(tmp_path / f"{i}.md"), f"note {i}\n")
+    catalog.update(str(tmp_path / "3.md"), "edited\n")
+    catalog.remove(str(tmp_path / "998.md"))
+    catalog.close()
+    with open(catalog.path, "ab") as f:
+        f.write(b"partial")
+
+    reads = []
+    real_open = open
+
+    class CountingFile:
+        def __init__(self, f):
+            self.f = f
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *args):
+            self.f.close()
+
+        def seek(self, *args):
+            return self.f.seek(*args)
+
+        def read(self, size=-1):
+            data = self.f.read(size)
+            reads.append(len(data))
+            return data
+
+    monkeypatch.setattr(
+        scratch_catalog, "open", lambda *args: CountingFile(real_open(*args)), raising=False
+    )
+    pages = catalog.pages(3)
+    first = next(pages)
+    assert [entry.title for entry in first] == ["edited", "note 999", "note 997"]
+    assert sum(reads) < os.path.getsize(catalog.path) // 10
+    assert [entry.title for entry in next(pages)] == ["note 996", "note 995", "note 994"]
+    monkeypatch.undo()
+
+    # Appending drops the partial line, and compaction keeps the live notes
+    monkeypatch.setattr(scratch_catalog, "COMPACT_MIN_BYTES", 1024)
+    catalog = Catalog(str(tmp_path))
+    catalog.update(str(tmp_path / "new.md"), "new\n")
+    entries = [entry for page in catalog.pages(100) for entry in page]
+    assert len(entries) == 1000
+    assert entries[0].title == "new"
+    assert os.path.getsize(catalog.path) < 1000 * 40
+
+
+def test_recent_command_pages_and_opens(plugin):
+    """Test that the recent notes panel lists saved notes and loads more on demand."""
+    import sublime
+
+    listener = plugin.AutoSaveNewFilesCommand()
+    views = []
+    for i in range(3):
+        view = sublime.View()
+        listener.on_new_async(view)
+        view.run_command("insert", {"characters": f"\nnote {i}\n"})
+        view.run_command("save")
+        listener.on_post_save_async(view)
+        views.append(view)
+
+    window = sublime.Window()
+    command = plugin.AutoSaveNewFilesRecentCommand(window)
+    command.run(page_size=2)
+    items, on_select = window.quick_panel
+    assert [item[0] for item in items] == ["note 2", "note 1", "More..."]
+
+    on_select(2)
+    items, on_select = window.quick_panel
+    assert [item[0] for item in items] == ["note 2", "note 1", "note 0"]
+    assert window.quick_panel_selected == 2
+
+    os.remove(views[1].file_name())
+    on_select(1)
+    assert window.opened == []
+    on_select(0)
+    assert window.opened == [views[2].file_name()]
@@ -78,3 +78,86 @@ def test_view_operations():
     # Test file operations
     view.retarget("/test/path.md")
     assert view.file_name() == "/test/path.md"
+
+
+def test_config_snapshot_defaults():
+    """Test that the settings snapshot expands and normalizes values."""
+    from autosave_sublime.scratch_config import DEFAULTS, Config
+
+    config = Config.from_dict(dict(DEFAULTS, default_extension=".txt "))
+    assert config.save_directory == os.path.expanduser("~/scratch")
+    assert config.default_extension == "txt"
+    assert config.timestamp_format == DEFAULTS["timestamp_format"]
+    assert config.warnings == ()
+
+
+def test_config_snapshot_invalid_values():
+    """Test that invalid settings fall back to defaults with a warning."""
+    from autosave_sublime.scratch_config import DEFAULTS, Config
+
+    config = Config.from_dict(
+        {"filename_format": "{nope}.{extension}", "use_microseconds": "yes", "timestamp_format": ""}
+    )
+    assert config.filename_format == DEFAULTS["filename_format"]
+    assert config.use_microseconds is False
+    assert config.timestamp_format == DEFAULTS["timestamp_format"]
+    assert len(config.warnings) == 3
+
+
+def test_config_timestamp_precision():
+    """Test that use_microseconds maps to milliseconds unless a precision is set."""
+    from autosave_sublime.scratch_config import Config
+
+    assert Config.from_dict({}).fraction_digits == 0
+    assert Config.from_dict({"use_microseconds": True}).timestamp_precision == "milliseconds"
+    config = Config.from_dict({"use_microseconds": True, "timestamp_precision": "microseconds"})
+    assert config.fraction_digits == 6
+    config = Config.from_dict({"timestamp_precision": "ns"})
+    assert config.timestamp_precision == "seconds"
+    assert len(config.warnings) == 1
+    config = Config.from_dict({"use_microseconds": True, "timestamp_precision": []})
+    assert config.timestamp_precision == "milliseconds"
+    assert len(config.warnings) == 1
+
+
+def test_config_autosave_delays_must_be_numbers():
+    """Test that non-numeric delays fall back to their defaults with a warning."""
+    from autosave_sublime.scratch_config import DEFAULTS, Config
+
+    config = Config.from_dict({"autosave_delay": "1", "autosave_max_delay": None})
+    assert config.autosave_delay == DEFAULTS["autosave_delay"]
+    assert config.autosave_max_delay == DEFAULTS["autosave_max_delay"]
+    assert len(config.warnings) == 2
+
+
+def test_config_rules_are_validated():
+    """Test that valid rules are normalized and invalid ones skipped with a warning."""
+    from autosave_sublime.scratch_config import Config, Rule
+
+    rules = [
+        {"project": "~/work/api", "directory": "/api/{year}/", "extension": ".http"},
+        {"syntax": "Python", "header": "# {timestamp}"},
+        {"window": 1, "syntax": "Python"},
+        {"window": True},
+        {"project": "~/x", "directory": "../outside"},
+        {"syntax": "Python", "header": "{nope}"},
+        {"syntax": "Python", "colour": "red"},
+    ]
+    config = Config.from_dict({"rules": rules})
+    assert config.rules == (
+        Rule("project", os.path.expanduser("~/work/api"), "api/{year}", "http"),
+        Rule("syntax", "Python", header="# {timestamp}"),
+    )
+    assert len(config.warnings) == 5
+
+
+def test_config_reloads_on_change(plugin):
+    """Test that the plugin swaps its snapshot when settings change."""
+    settings = sublime.load_settings("AutoSaveNewFiles.sublime-settings")
+    first = plugin.get_config()
+    try:
+        settings.set("default_extension", "txt")
+        assert plugin.get_config() is not first
+        assert plugin.get_config().default_extension == "txt"
+    finally:
+        settings.set("default_extension", "md")
@@ -1,8 +1,12 @@
 """Tests for file operations."""
 
+import datetime
+import os
 import tempfile
 from pathlib import Path
 
+import pytest
+
 
 def test_directory_creation():
     """Test that directories can be created and are writable."""
@@ -46,3 +50,235 @@ def test_file_naming():
 
         # Verify all files exist
         assert len(list(Path(temp_dir).glob(f"{base_name}*{ext}"))) == 3
+
+
+def test_readiness_cache_skips_filesystem(monkeypatch):
+    """Test that a cached directory check does not touch the filesystem."""
+    from autosave_sublime import scratch_dirs
+
+    now = [0.0]
+    cache = scratch_dirs.ReadinessCache(ttl=10.0, clock=lambda: now[0])
+    with tempfile.TemporaryDirectory() as temp_dir:
+        target = str(Path(temp_dir) / "scratch")
+        cache.ensure(target)
+        assert Path(target).is_dir()
+        assert not (Path(target) / scratch_dirs.PROBE_NAME).exists()
+
+        calls = []
+        with monkeypatch.context() as m:
+            m.setattr(scratch_dirs.os, "stat", lambda *a, **k: calls.append(a))
+            m.setattr(scratch_dirs.os, "open", lambda *a, **k: calls.append(a))
+            cache.ensure(target)
+        assert calls == []
+
+
+def test_readiness_cache_revalidates():
+    """Test that expired or invalidated entries are checked again."""
+    from autosave_sublime import scratch_dirs
+
+    now = [0.0]
+    cache = scratch_dirs.ReadinessCache(ttl=10.0, clock=lambda: now[0])
+    with tempfile.TemporaryDirectory() as temp_dir:
+        target = str(Path(temp_dir) / "scratch")
+        cache.ensure(target)
+
+        # Replacing the directory is noticed once the entry expires
+        Path(target).rmdir()
+        now[0] = 20.0
+        cache.ensure(target)
+        assert Path(target).is_dir()
+
+        cache.invalidate(target)
+        assert not cache.is_ready(target)
+        cache.ensure(target)
+        assert cache.is_ready(target)
+
+
+def test_name_index_claims_unique_names():
+    """Test that the name index resolves conflicts with _N suffixes."""
+    from autosave_sublime.scratch_names import NameIndex
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        base_name = "2024_03_19_123456"
+        (Path(temp_dir) / f"{base_name}.md").write_text("existing")
+        index = NameIndex(temp_dir)
+
+        # A file created by another process after the scan is skipped
+        (Path(temp_dir) / f"{base_name}_1.md").write_text("external")
+
+        paths = [index.claim(f"{base_name}.md") for _ in range(3)]
+        assert [Path(p).name for p in paths] == [
+            f"{base_name}_2.md",
+            f"{base_name}_3.md",
+            f"{base_name}_4.md",
+        ]
+        assert all(Path(p).exists() for p in paths)
+        assert (Path(temp_dir) / f"{base_name}_1.md").read_text() == "external"
+
+
+def test_timestamp_namer_is_strictly_increasing():
+    """Test that names within one tick, or after the clock steps back, stay unique."""
+    from autosave_sublime.scratch_names import TimestampNamer
+
+    second = int(datetime.datetime(2024, 3, 19, 12, 34, 56).timestamp()) * 10**9
+    now = [second + 123_456_789]
+    namer = TimestampNamer("%Y_%m_%d_%H%M%S", "{timestamp}.{extension}", "md", 3, lambda: now[0])
+
+    names = [namer.next() for _ in range(3)]
+    now[0] -= 10**9
+    names.append(namer.next())
+    now[0] = second + 2 * 10**9
+    names.append(namer.next())
+
+    assert [name.filename for name in names] == [
+        "2024_03_19_123456_123.md",
+        "2024_03_19_123456_123_1.md",
+        "2024_03_19_123456_123_2.md",
+        "2024_03_19_123456_123_3.md",
+        "2024_03_19_123458_000.md",
+    ]
+    assert names[1].timestamp == "2024_03_19_123456_123"
+
+
+def test_timestamp_namer_precision_and_shards():
+    """Test microsecond precision and date-sharded formats without slicing."""
+    from autosave_sublime.scratch_names import TimestampNamer
+
+    moment = datetime.datetime(2024, 3, 9, 1, 2, 3, 4005)
+    clock = lambda: int(moment.timestamp()) * 10**9 + moment.microsecond * 1000  # noqa: E731
+    namer = TimestampNamer("%H%M%S", "{year}/{month}/{timestamp}.{extension}", "txt", 6, clock)
+
+    assert namer.next() == ("010203_004005", os.path.join("2024", "03", "010203_004005.txt"))
+
+
+def test_new_file_written_once(plugin, tmp_path):
+    """Test that a new file is created with its header in a single write."""
+    import sublime
+
+    view = sublime.View()
+    plugin.AutoSaveNewFilesCommand().save_new_file_with_timestamp(view)
+
+    assert Path(view.file_name()).parent == tmp_path / "scratch"
+    assert view.commands == ["revert"]
+    content = view.substr(sublime.Region(0, view.size()))
+    assert Path(view.file_name()).read_text() == content
+    assert content.endswith("\n")
+
+
+def test_activation_memo_skips_buffer_copy(plugin, monkeypatch):
+    """Test that re-activating a known view does not inspect its buffer."""
+    import sublime
+
+    listener = plugin.AutoSaveNewFilesCommand()
+    view = sublime.View()
+    view.run_command("insert", {"characters": "x" * 1000})
+    monkeypatch.setattr(view, "substr", lambda region: pytest.fail("buffer copied"))
+
+    listener.on_activated_async(view)
+    assert listener.view_states[view.id()] == plugin.VIEW_PENDING
+    assert view.file_name() is None
+
+    # Once emptied, the pending view is adopted and then memoized as managed
+    view._content, view._size = "", 0
+    listener.on_activated_async(view)
+    assert listener.view_states[view.id()] == plugin.VIEW_MANAGED
+    assert view.file_name() in plugin._records.paths()
+
+    listener.on_close(view)
+    assert view.id() not in listener.view_states
+
+
+def test_restore_storm_is_coalesced(plugin, monkeypatch):
+    """Test that repeated events for the same views are processed as one batch."""
+    import sublime
+
+    scheduled = []
+    monkeypatch.setattr(sublime, "set_timeout_async", lambda cb, delay=0: scheduled.append(cb))
+    listener = plugin.AutoSaveNewFilesCommand()
+
+    window = sublime.Window()
+    views = [window.new_file() for _ in range(3)]
+    for view in views + views:
+        listener.on_load_async(view)
+        listener.on_activated_async(view)
+    window.close_view(views[2])
+    listener.on_close(views[2])
+
+    assert len(scheduled) == 1
+    assert len(listener.events) == 2
+    scheduled.pop()()
+    assert len(listener.events) == 0
+    assert all(view.file_name() in plugin._records.paths() for view in views[:2])
+    assert views[2].file_name() is None
+
+
+def test_batch_deleter_reports_once():
+    """Test that deletions are batched and failures reported together."""
+    from autosave_sublime.scratch_deleter import BatchDeleter
+
+    reports = []
+    deleted = []
+    deleter = BatchDeleter(reports.append, deleted.append, linger=0.2, retry_delay=0.0)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        files = [Path(temp_dir) / f"{i}.md" for i in range(5)]
+        for path in files:
+            path.write_text("")
+        missing = [str(Path(temp_dir) / "dir" / f"{i}.md") for i in range(2)]
+        (Path(temp_dir) / "dir" / "0.md").mkdir(parents=True)
+        (Path(temp_dir) / "dir" / "1.md").mkdir()
+
+        for path in [str(p) for p in files] + missing:
+            deleter.submit(path)
+        deleter.flush()
+        deleter.stop()
+
+        assert not any(path.exists() for path in files)
+        assert sorted(deleted) == sorted(str(p) for p in files)
+        assert len(reports) == 1
+        assert [path for path, _ in reports[0]] == missing
+
+
+def test_batch_deleter_survives_callback_errors(tmp_path):
+    """Test that exceptions from the callbacks neither kill the worker nor hang flush."""
+    from autosave_sublime.scratch_deleter import BatchDeleter
+
+    def fail(*args):
+        raise RuntimeError("bug")
+
+    deleter = BatchDeleter(fail, fail, linger=0.0, attempts=1)
+    kept = tmp_path / "kept.md"
+    kept.mkdir()
+    for i in range(2):
+        path = tmp_path / f"{i}.md"
+        path.write_text("")
+        deleter.submit(str(path))
+        deleter.submit(str(kept))
+        deleter.flush()
+        assert not path.exists()
+    deleter.stop()
+
+    checked = BatchDeleter(fail, before_delete=fail, linger=0.0)
+    (tmp_path / "checked.md").write_text("")
+    checked.submit(str(tmp_path / "checked.md"))
+    checked.flush()
+    checked.stop()
+    assert (tmp_path / "checked.md").exists()
+
+
+def test_close_deletes_header_only_file(plugin):
+    """Test that closing a header-only scratch view deletes its file."""
+    import sublime
+
+    listener = plugin.AutoSaveNewFilesCommand()
+    kept, emptied = sublime.View(), sublime.View()
+    listener.on_new_async(kept)
+    listener.on_new_async(emptied)
+    kept.run_command("insert", {"characters": "notes"})
+
+    listener.on_pre_close(kept)
+    listener.on_pre_close(emptied)
+    plugin._deleter.flush()
+
+    assert Path(kept.file_name()).exists()
+    assert not Path(emptied.file_name()).exists()
+    assert plugin._records.paths() == {kept.file_name()}
@@ -0,0 +1,101 @@
+"""Tests for the abandoned scratch file garbage collector."""
+
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+import autosave_gc  # noqa: E402
+
+from autosave_sublime.scratch_journal import Journal  # noqa: E402
+
+
+def _make_scratch(directory: Path) -> dict:
+    """Create a mix of header-only, empty, and kept files."""
+    files = {
+        "header": directory / "2024_03_19_123456.md",
+        "empty": directory / "2024_03_19_123457.md",
+        "kept": directory / "2024_03_19_123458.md",
+        "open": directory / "2024_03_19_123459.md",
+        "other": directory / "notes.md",
+    }
+    files["header"].write_text("2024_03_19_123456\n")
+    files["empty"].write_text("")
+    files["kept"].write_text("2024_03_19_123458\nremember the milk\n")
+    files["open"].write_text("2024_03_19_123459\n")
+    files["other"].write_text("hello\n")
+    journal = Journal(str(directory))
+    journal.record_created(str(files["open"]), "2024_03_19_123459")
+    journal.close()
+    return files
+
+
+def test_gc_dry_run_keeps_files(tmp_path, capsys):
+    """Test that dry-run only reports what would be deleted."""
+    files = _make_scratch(tmp_path)
+    assert autosave_gc.main(["--directory", str(tmp_path), "--min-age", "0", "--jobs", "1"]) == 0
+    assert "2 header-only files (1 open files skipped)" in capsys.readouterr().out
+    assert all(path.exists() for path in files.values())
+
+
+def test_gc_delete_skips_open_and_kept_files(tmp_path, capsys):
+    """Test that delete mode removes only abandoned header-only files."""
+    files = _make_scratch(tmp_path)
+    args = ["--directory", str(tmp_path), "--min-age", "0", "--mode", "delete", "--jobs", "2"]
+    assert autosave_gc.main(args) == 0
+    assert "2 deleted" in capsys.readouterr().out
+    assert not files["header"].exists()
+    assert not files["empty"].exists()
+    assert files["kept"].exists()
+    assert files["open"].exists()
+    assert files["other"].exists()
+
+
+def test_gc_parallel_matches_serial(tmp_path, monkeypatch):
+    """Test that chunked parallel checking finds the same files."""
+    monkeypatch.setattr(autosave_gc, "CHUNKS_IN_FLIGHT", 1)
+    count = autosave_gc.CHUNK_SIZE * 5 + 10
+    for i in range(count):
+        text = "2024_03_19_123456\n" if i % 2 else "text\n"
+        (tmp_path / f"2024_03_19_{i:06d}.md").write_text(text)
+    config = autosave_gc.load_config(None)
+    max_size = autosave_gc.max_header_size(config)
+    pattern = autosave_gc.timestamp_pattern(config.timestamp_format).pattern
+    journal = Journal(str(tmp_path))
+    matches = autosave_gc.scratch_name_matcher(config, journal)
+
+    def run(jobs):
+        candidates = autosave_gc.scan_candidates(str(tmp_path), max_size, 0, matches)
+        return autosave_gc.collect(candidates, pattern, max_size, jobs)
+
+    serial, parallel = run(1), run(2)
+    journal.close()
+    assert serial[0] == parallel[0] == count
+    assert sorted(serial[1]) == sorted(parallel[1])
+    assert len(serial[1]) == count // 2
+    assert all(int(os.path.basename(p)[11:-3]) % 2 for p in serial[1])
+
+
+def test_gc_only_considers_scratch_names(tmp_path, capsys):
+    """Test that small files not named like scratch files, nor journaled, are left alone."""
+    (tmp_path / "proj").mkdir()
+    others = [tmp_path / "README", tmp_path / "todo.txt", tmp_path / "placeholder.md"]
+    others.append(tmp_path / "proj" / "__init__.py")
+    for path in others:
+        path.write_text(" \n")
+    suffixed = tmp_path / "2024_03_19_123456_2.md"
+    suffixed.write_text("2024_03_19_123456\n")
+    renamed = tmp_path / "renamed.md"
+    renamed.write_text("")
+    journal = Journal(str(tmp_path))
+    journal.record_created(str(renamed), "2024_03_19_123457")
+    journal.record_closed(str(renamed))
+    journal.close()
+
+    args = ["--directory", str(tmp_path), "--min-age", "0", "--mode", "delete", "--jobs", "1"]
+    assert autosave_gc.main(args) == 0
+    assert "2 candidates, 2 header-only files" in capsys.readouterr().out
+    assert all(path.exists() for path in others)
+    assert not suffixed.exists()
+    assert not renamed.exists()
@@ -0,0 +1,135 @@
+"""Tests for the deduplicated version history of notes."""
+
+import random
+
+import pytest
+import sublime
+
+from autosave_sublime.scratch_history import (
+    HISTORY_DIR,
+    MAX_CHUNK,
+    PACK_NAME,
+    HistoryStore,
+    split_chunks,
+)
+
+
+def test_appends_store_only_the_edits(tmp_path):
+    """Test that history grows with the appended text, not with the versions."""
+    random.seed(7)
+    words = "alpha beta gamma delta meeting todo fix idea".split()
+    path = str(tmp_path / "2024_03_19_123456.md")
+    store = HistoryStore(str(tmp_path))
+    text = b"2024_03_19_123456\n"
+    appended = 0
+    for _ in range(300):
+        line = (" ".join(random.choice(words) for _ in range(8)) + "\n").encode()
+        text += line
+        appended += len(line)
+        assert store.snapshot(path, text)
+    assert not store.snapshot(path, text)
+    edited = text[:5000] + b"inserted line\n" + text[5000:]
+    before = store.stored_bytes()
+    store.snapshot(path, edited)
+
+    # Copying every version would take more than 100 times the note
+    assert store.stored_bytes() < 5 * appended
+    assert store.stored_bytes() - before < MAX_CHUNK
+    store.close()
+
+    # Versions survive reopening and a partial record left by a crash
+    with open(tmp_path / ".history" / "versions.log", "ab") as f:
+        f.write(b"2024_03_19_123456.md\t1\t")
+    store = HistoryStore(str(tmp_path))
+    versions = store.versions(path)
+    assert len(versions) == 301
+    assert store.read(versions[-1]) == edited
+    assert store.read(versions[-2]) == text
+    assert store.read(versions[0]).count(b"\n") == 2
+    store.snapshot(path, b"rewritten\n")
+    store.close()
+    store = HistoryStore(str(tmp_path))
+    assert store.read(store.versions(path)[-1]) == b"rewritten\n"
+
+
+def test_shared_pack_and_corrupt_chunks(tmp_path):
+    """Test that two stores share one pack and a corrupt chunk is an OSError."""
+    a, b = str(tmp_path / "a.md"), str(tmp_path / "b.md")
+    ours, theirs = HistoryStore(str(tmp_path)), HistoryStore(str(tmp_path))
+    ours.snapshot(a, b"first note\n" * 100)
+    theirs.snapshot(b, b"second note\n" * 100)
+    ours.snapshot(a, b"first note, edited\n" * 100)
+    assert ours.read(ours.versions(a)[-1]) == b"first note, edited\n" * 100
+    ours.close()
+    theirs.close()
+
+    reopened = HistoryStore(str(tmp_path))
+    assert reopened.read(reopened.versions(b)[-1]) == b"second note\n" * 100
+    assert reopened.read(reopened.versions(a)[-1]) == b"first note, edited\n" * 100
+
+    pack = tmp_path / HISTORY_DIR / PACK_NAME
+    pack.write_bytes(pack.read_bytes()[:40] + b"\xff" * (pack.stat().st_size - 40))
+    with pytest.raises(OSError):
+        HistoryStore(str(tmp_path)).read(reopened.versions(a)[0])
+
+
+def test_versions_of_one_note_from_two_instances(tmp_path):
+    """Test that versions logged by two stores in turn resolve against the right base."""
+    random.seed(3)
+    path = str(tmp_path / "2024_03_19_123456.md")
+    text = bytes(random.randrange(32, 127) for _ in range(20000))
+    contents = [text, text + b"theirs\n", text[:100] + b"ours\n" + text[100:]]
+    ours, theirs = HistoryStore(str(tmp_path)), HistoryStore(str(tmp_path))
+    ours.snapshot(path, contents[0])
+    theirs.snapshot(path, contents[1])
+    ours.snapshot(path, contents[2])
+    ours.close()
+    theirs.close()
+
+    reopened = HistoryStore(str(tmp_path))
+    assert [reopened.read(version) for version in reopened.versions(path)] == contents
+
+
+def test_chunk_boundaries_follow_content():
+    """Test that an insertion only changes the chunks around it."""
+    random.seed(3)
+    data = bytes(random.randrange(256) for _ in range(64 * 1024))
+    edited = data[:30000] + b"x" * 10 + data[30000:]
+    before = {chunk for chunk, _, _ in split_chunks(data)}
+    after = [chunk for chunk, _, _ in split_chunks(edited)]
+    assert len(before) > 8
+    assert sum(chunk not in before for chunk in after) <= 2
+
+
+def test_browse_and_restore_versions(plugin, monkeypatch):
+    """Test that saves are recorded and an earlier version can be opened and restored."""
+    settings = sublime.load_settings("AutoSaveNewFiles.sublime-settings")
+    monkeypatch.setitem(settings._settings, "history", True)
+    monkeypatch.setitem(settings._settings, "insert_timestamp", False)
+    settings.set("history", True)
+
+    window = sublime.Window()
+    listener = plugin.AutoSaveNewFilesCommand()
+    view = window.new_file()
+    listener.on_new_async(view)
+    for text in ("first\n", "second\n"):
+        view.run_command("append", {"characters": text})
+        view.run_command("save")
+        listener.on_post_save_async(view)
+
+    command = plugin.AutoSaveNewFilesHistoryCommand(window)
+    command.run()
+    items, on_select = window.quick_panel
+    assert [item[1] for item in items] == ["13 bytes", "6 bytes"]
+    on_select(1)
+    opened = window.views()[-1]
+    assert opened.read_only and opened.substr(sublime.Region(0, opened.size())) == "first\n"
+
+    window.close_view(opened)
+    command.run(restore=True)
+    window.quick_panel[1](1)
+    with open(view.file_name(), encoding="utf-8") as f:
+        assert f.read() == "first\n"
+    assert view.substr(sublime.Region(0, view.size())) == "first\n"
+    store = plugin._history.get(plugin.get_config().save_directory)
+    assert len(store.versions(view.file_name())) == 3
@@ -0,0 +1,97 @@
+"""Tests for the persistent manifest of managed files."""
+
+from pathlib import Path
+
+from autosave_sublime import scratch_journal
+from autosave_sublime.scratch_journal import Journal
+
+
+def test_journal_replays_creates_and_deletes(tmp_path):
+    """Test that a reopened journal holds only the live files."""
+    journal = Journal(str(tmp_path))
+    journal.record_created(str(tmp_path / "a.md"), "a")
+    journal.record_created(str(tmp_path / "b.md"), "b")
+    journal.record_deleted(str(tmp_path / "a.md"))
+    journal.close()
+
+    replayed = Journal(str(tmp_path))
+    assert dict(replayed.items()) == {str(tmp_path / "b.md"): "b"}
+    assert str(tmp_path / "b.md") in replayed
+
+
+def test_journal_ignores_truncated_record(tmp_path):
+    """Test that a partial line left by a crash is dropped."""
+    (tmp_path / scratch_journal.JOURNAL_NAME).write_text("C\ta.md\ta\nC\tb.m")
+
+    journal = Journal(str(tmp_path))
+    assert dict(journal.items()) == {str(tmp_path / "a.md"): "a"}
+    journal.record_created(str(tmp_path / "c.md"), "c")
+    journal.close()
+    assert len(Journal(str(tmp_path))) == 2
+
+
+def test_journal_compacts(tmp_path, monkeypatch):
+    """Test that deleted records are dropped once they dominate the journal."""
+    monkeypatch.setattr(scratch_journal, "COMPACT_MIN_RECORDS", 10)
+    journal = Journal(str(tmp_path))
+    for i in range(10):
+        journal.record_created(str(tmp_path / f"{i}.md"), str(i))
+    for i in range(9):
+        journal.record_deleted(str(tmp_path / f"{i}.md"))
+    journal.close()
+
+    lines = (tmp_path / scratch_journal.JOURNAL_NAME).read_text().splitlines()
+    assert len(lines) < 19
+    assert dict(Journal(str(tmp_path)).items()) == {str(tmp_path / "9.md"): "9"}
+
+
+def test_journal_compaction_keeps_other_instances_records(tmp_path, monkeypatch):
+    """Test that a compaction by one instance loses no records of another."""
+    monkeypatch.setattr(scratch_journal, "REPLACED_CHECK_INTERVAL", 1)
+    ours, theirs = Journal(str(tmp_path)), Journal(str(tmp_path))
+    ours.record_created(str(tmp_path / "a.md"), "a")
+    theirs.record_created(str(tmp_path / "b.md"), "b")
+    ours.compact()
+    # The other instance still has the journal compaction replaced open
+    theirs.record_created(str(tmp_path / "c.md"), "c")
+    ours.close()
+    theirs.close()
+
+    assert sorted(name for name, _ in Journal(str(tmp_path)).items()) == [
+        str(tmp_path / name) for name in ("a.md", "b.md", "c.md")
+    ]
+
+
+def test_journal_replays_100k_records(tmp_path):
+    """Test that 100k records replay; benchmarks/bench_journal.py times it against 100 ms."""
+    with open(tmp_path / scratch_journal.JOURNAL_NAME, "w") as f:
+        for i in range(100_000):
+            f.write(f"C\t2024_03_19_123456_{i}.md\t2024_03_19_123456\n")
+        f.write("D\t2024_03_19_123456_0.md\nO\t2024_03_19_123456_1.md\nX\nC\n")
+
+    journal = Journal(str(tmp_path))
+    assert len(journal) == 99_999
+    assert journal.open_files() == {str(tmp_path / "2024_03_19_123456_1.md")}
+
+
+def test_managed_files_survive_restart(plugin, tmp_path):
+    """Test that files created before a restart are still cleaned up."""
+    import sublime
+
+    view = sublime.View()
+    plugin.AutoSaveNewFilesCommand().on_new_async(view)
+    file_path = view.file_name()
+    plugin.plugin_unloaded()
+
+    # A new session reopens the header-only file and closes it
+    plugin.plugin_loaded()
+    listener = plugin.AutoSaveNewFilesCommand()
+    reopened = sublime.View()
+    reopened.retarget(file_path)
+    reopened.run_command("revert")
+    listener.on_load_async(reopened)
+    listener.on_pre_close(reopened)
+    plugin._deleter.flush()
+
+    assert not Path(file_path).exists()
+    assert file_path not in plugin._journals.get(str(tmp_path / "scratch"))
@@ -0,0 +1,113 @@
+"""Tests for the leases shared between instances using the same save directory."""
+
+import os
+import signal
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("fcntl")
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Holds leases on the files given as arguments until killed
+HOLDER = """
+import sys
+from autosave_sublime.scratch_leases import Leases
+
+leases = Leases(sys.argv[1])
+for path in sys.argv[2:]:
+    assert leases.acquire(path)
+print("ready", flush=True)
+sys.stdin.read()
+"""
+
+
+@pytest.fixture
+def other_instance():
+    """Start a process that holds leases, as another Sublime Text instance would."""
+    processes = []
+
+    def start(directory, *paths):
+        process = subprocess.Popen(
+            [sys.executable, "-c", HOLDER, str(directory), *map(str, paths)],
+            cwd=str(ROOT),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        processes.append(process)
+        assert process.stdout.readline() == "ready\n"
+        return process
+
+    yield start
+    for process in processes:
+        process.kill()
+        process.wait()
+
+
+def test_claim_waits_for_other_instance_and_recovers_after_crash(tmp_path, other_instance):
+    """Test that a held file cannot be claimed until its holder dies."""
+    from autosave_sublime.scratch_leases import Leases
+
+    held, free = str(tmp_path / "a.md"), str(tmp_path / "b.md")
+    holder = other_instance(tmp_path, held)
+    leases = Leases(str(tmp_path))
+
+    assert leases.acquire(held)
+    assert not leases.claim(held)
+    assert leases.held_elsewhere(held)
+    assert leases.claim(free)
+    leases.release(free)
+
+    # A crashed instance leaves no lease behind
+    holder.send_signal(signal.SIGKILL)
+    holder.wait()
+    assert leases.claim(held)
+    leases.close()
+
+
+def test_plugin_keeps_file_open_in_other_instance(plugin, other_instance, monkeypatch):
+    """Test that closing a header-only note another instance has open keeps it."""
+    import sublime
+
+    monkeypatch.setattr(plugin._stats, "enabled", True)
+    plugin._stats.reset()
+    listener = plugin.AutoSaveNewFilesCommand()
+    shared, own = sublime.View(), sublime.View()
+    listener.on_new_async(shared)
+    listener.on_new_async(own)
+    save_directory = plugin.get_config().local_directory
+    other_instance(save_directory, shared.file_name())
+    assert plugin._memory_report()["leased_files"] == 2
+
+    listener.on_pre_close(shared)
+    listener.on_close(shared)
+    listener.on_pre_close(own)
+    listener.on_close(own)
+    plugin._deleter.flush()
+
+    assert os.path.exists(shared.file_name())
+    assert not os.path.exists(own.file_name())
+    assert plugin._stats.snapshot()["counters"]["leases.contended"] == 1
+    assert plugin._memory_report()["leased_files"] == 0
+
+
+def test_plugin_keeps_file_that_grew_on_disk(plugin):
+    """Test that a header-only note whose file grew on disk is kept when closed."""
+    import sublime
+
+    listener = plugin.AutoSaveNewFilesCommand()
+    view = sublime.View()
+    listener.on_new_async(view)
+    with open(view.file_name(), "a") as f:
+        f.write("synced from another machine\n" * 10)
+
+    listener.on_pre_close(view)
+    listener.on_close(view)
+    plugin._deleter.flush()
+
+    assert os.path.exists(view.file_name())
+    assert plugin._memory_report()["leased_files"] == 0
@@ -0,0 +1,71 @@
+"""Tests for the per-view records of managed files."""
+
+import json
+import os
+
+from autosave_sublime.scratch_names import MAX_SUFFIX_HINTS
+
+
+def test_records_share_directories_and_follow_moves(tmp_path):
+    """Test that records intern their directory and are found by path."""
+    from autosave_sublime.scratch_records import RecordStore
+
+    records = RecordStore()
+    first = records.add(1, str(tmp_path / "a.md"), "# a")
+    second = records.add(2, str(tmp_path / "b.md"), "# b")
+    records.add(3, str(tmp_path / "a.md"), "# a")
+    assert first.directory is second.directory
+    assert sorted(records.find(str(tmp_path / "a.md"))) == [1, 3]
+
+    records.move(str(tmp_path / "a.md"), str(tmp_path / "c.md"))
+    assert records.paths() == {str(tmp_path / "b.md"), str(tmp_path / "c.md")}
+    assert [record.name for record in records.discard_path(str(tmp_path / "c.md"))] == [
+        "c.md",
+        "c.md",
+    ]
+    assert records.remove(2) is second
+    assert len(records) == 0
+    assert records.memory_usage()["records"] == 0
+
+
+def test_memory_is_bounded_by_open_views(plugin):
+    """Test that closing views drops their records while the journal keeps the files."""
+    import sublime
+
+    listener = plugin.AutoSaveNewFilesCommand()
+    usage = []
+    for _ in range(200):
+        view = sublime.View()
+        listener.on_new_async(view)
+        view.run_command("insert", {"characters": "kept"})
+        listener.on_pre_close(view)
+        listener.on_close(view)
+        usage.append(plugin._records.memory_usage()["bytes"])
+
+    assert len(plugin._records) == 0
+    assert max(usage) == usage[0]
+    assert plugin._memory_report()["suffix_hints"] <= MAX_SUFFIX_HINTS
+    journal = plugin._journals.get(plugin.get_config().local_directory)
+    assert len(journal) == 200
+
+    # A managed file opened again is recognized from the journal
+    path = next(path for path, _ in journal.items())
+    view = sublime.View(file_name=path)
+    assert listener.classify_view(view) == plugin.VIEW_MANAGED
+    assert plugin._records.get(view.id()).timestamp == journal.timestamp(path)
+
+
+def test_stats_json_reports_memory(plugin):
+    """Test that the stats command includes the size of the tracking structures."""
+    import sublime
+
+    listener = plugin.AutoSaveNewFilesCommand()
+    listener.on_new_async(sublime.View())
+    window = sublime.Window()
+    plugin.AutoSaveNewFilesStatsCommand(window).run(output="json")
+
+    memory = json.loads(window.active_view().substr(sublime.Region(0, 10**6)))["memory"]
+    assert memory["open_files"] == 1
+    assert memory["journal_entries"] == 1
+    assert memory["record_bytes"] > 0
+    assert os.listdir(plugin.get_config().local_directory)
@@ -0,0 +1,53 @@
+"""Tests for date-sharded layouts and the resharding migration."""
+
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+import autosave_reshard  # noqa: E402
+
+from autosave_sublime.scratch_journal import Journal  # noqa: E402
+
+
+def test_sharded_filename_format(plugin, tmp_path, monkeypatch):
+    """Test that new files are created inside lazily made shard directories."""
+    import sublime
+
+    settings = sublime.load_settings("AutoSaveNewFiles.sublime-settings")
+    monkeypatch.setitem(settings._settings, "filename_format", "{year}/{month}/{timestamp}.md")
+    plugin.reload_config()
+
+    view = sublime.View()
+    plugin.AutoSaveNewFilesCommand().on_new_async(view)
+
+    relative = Path(view.file_name()).relative_to(tmp_path / "scratch")
+    assert len(relative.parts) == 3
+    assert relative.parts[0].isdigit() and len(relative.parts[0]) == 4
+    assert view.file_name() in plugin._journals.get(str(tmp_path / "scratch"))
+
+
+def test_reshard_moves_and_resumes(tmp_path):
+    """Test that resharding moves files, updates the journal, and resumes."""
+    (tmp_path / "2024_03_19_123456.md").write_text("a")
+    (tmp_path / "2024_03_20_080000_1.md").write_text("b")
+    (tmp_path / "notes.md").write_text("c")
+    journal = Journal(str(tmp_path))
+    journal.record_created(str(tmp_path / "2024_03_19_123456.md"), "2024_03_19_123456")
+    journal.record_closed(str(tmp_path / "2024_03_19_123456.md"))
+    journal.close()
+
+    # Simulate a run interrupted between linking and unlinking
+    (tmp_path / "2024" / "03" / "20").mkdir(parents=True)
+    os.link(tmp_path / "2024_03_20_080000_1.md", tmp_path / "2024/03/20/2024_03_20_080000_1.md")
+
+    config = autosave_reshard.load_config(None)
+    moved, errors = autosave_reshard.reshard(str(tmp_path), "{year}/{month}/{day}", config, 4)
+
+    assert (moved, errors) == (3, [])
+    assert (tmp_path / "2024/03/19/2024_03_19_123456.md").read_text() == "a"
+    assert (tmp_path / "2024/03/20/2024_03_20_080000_1.md").read_text() == "b"
+    assert not (tmp_path / "2024/03/20/2024_03_20_080000_1_1.md").exists()
+    assert sorted(p.name for p in tmp_path.iterdir() if p.is_file()) == [".autosave_manifest"]
+    assert str(tmp_path / "2024/03/19/2024_03_19_123456.md") in Journal(str(tmp_path))
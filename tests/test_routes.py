@@ -0,0 +1,78 @@
+"""Tests for routing new files by window, project folder and syntax."""
+
+import os
+
+
+def test_router_prefers_window_then_project_then_syntax():
+    """Test that the compiled tables pick the first matching rule of the strongest kind."""
+    from autosave_sublime.scratch_config import Config
+    from autosave_sublime.scratch_routes import Router
+
+    config = Config.from_dict(
+        {
+            "rules": [
+                {"syntax": "Python", "extension": "py"},
+                {"syntax": "Packages/Python/Python.sublime-syntax", "extension": "pyw"},
+                {"project": "/work/api", "directory": "api"},
+                {"window": 7, "directory": "seven", "header": ""},
+                {"window": 7, "directory": "ignored"},
+            ]
+        }
+    )
+    router = Router.from_config(config)
+    python = "Packages/Python/Python.sublime-syntax"
+
+    assert router.route(7, ["/work/api"], python).namer.directory() == "seven"
+    assert router.route(7, [], None).render_header("t") == ""
+    assert router.route(1, ["/other", "/work/api"], python).namer.directory() == "api"
+    assert router.route(1, [], python).namer.next().filename.endswith(".pyw")
+    assert router.route(1, [], "User/Python.sublime-syntax").namer.next().filename.endswith(".py")
+    assert router.route(None, [], "Packages/Text/Plain text.tmLanguage") is router.default
+    assert router.default.render_header("t") == "t"
+    assert not Router.from_config(Config.from_dict({}))
+
+
+def test_plugin_routes_new_files(plugin, monkeypatch):
+    """Test that new files follow their window's rule and are still cleaned up."""
+    import sublime
+
+    settings = sublime.load_settings(plugin.SETTINGS_FILE)
+    rules = [
+        {
+            "project": "/work/api",
+            "directory": "api",
+            "extension": "http",
+            "header": "# {timestamp}",
+        },
+        {"syntax": "Python", "directory": "py", "extension": "py", "header": ""},
+    ]
+    monkeypatch.setitem(settings._settings, "rules", rules)
+    plugin.reload_config()
+    save_directory = plugin.get_config().local_directory
+
+    window = sublime.Window()
+    window._folders = ["/work/api"]
+    listener = plugin.AutoSaveNewFilesCommand()
+    api = window.new_file()
+    listener.on_new_async(api)
+    python = sublime.View()
+    python.assign_syntax("Packages/Python/Python.sublime-syntax")
+    listener.on_new_async(python)
+    plain = sublime.View()
+    listener.on_new_async(plain)
+
+    assert os.path.dirname(api.file_name()) == os.path.join(save_directory, "api")
+    assert api.file_name().endswith(".http")
+    with open(api.file_name()) as f:
+        assert f.read().startswith("# ")
+    assert os.path.dirname(python.file_name()) == os.path.join(save_directory, "py")
+    assert os.path.getsize(python.file_name()) == 0
+    assert os.path.dirname(plain.file_name()) == save_directory
+    assert plugin._readiness.is_ready(os.path.join(save_directory, "api"))
+    assert plugin._readiness.is_ready(os.path.join(save_directory, "py"))
+
+    for view in (api, python, plain):
+        listener.on_pre_close(view)
+        listener.on_close(view)
+    plugin._deleter.flush()
+    assert not any(os.path.exists(view.file_name()) for view in (api, python, plain))
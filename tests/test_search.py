@@ -0,0 +1,120 @@
+"""Tests for the full-text index of scratch notes."""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "scripts"))
+
+import autosave_index  # noqa: E402
+
+from autosave_sublime.scratch_search import SearchIndex, fts_query, search_available  # noqa: E402
+
+pytestmark = pytest.mark.skipif(not search_available(), reason="SQLite FTS5 is not available")
+
+
+def test_fts_query_quotes_words():
+    """Test that punctuation in queries cannot break FTS5 syntax."""
+    assert fts_query('todo: "fix" AND') == '"todo:" """fix""" "AND"*'
+    assert fts_query("   ") == ""
+
+
+def test_index_update_and_remove(tmp_path):
+    """Test that updates replace earlier text and removals drop notes."""
+    index = SearchIndex(str(tmp_path))
+    index.update("/notes/a.md", "buy milk and eggs")
+    index.update("/notes/b.md", "call the plumber")
+    index.update("/notes/a.md", "buy bread")
+
+    assert [r.path for r in index.search("buy")] == ["/notes/a.md"]
+    assert index.search("milk") == []
+    assert [r.path for r in index.search("plum")] == ["/notes/b.md"]
+
+    index.remove("/notes/b.md")
+    assert index.search("plumber") == []
+    assert len(index) == 1
+    index.close()
+
+
+def test_database_errors_are_os_errors(tmp_path, plugin):
+    """Test that SQLite failures surface as OSError, which every caller handles."""
+    import sqlite3
+
+    with pytest.raises(OSError):
+        SearchIndex(str(tmp_path / "missing"))
+
+    index = SearchIndex(str(tmp_path))
+    blocker = sqlite3.connect(index.path)
+    blocker.execute("BEGIN EXCLUSIVE")
+    index._connection.execute("PRAGMA busy_timeout = 0")
+    with pytest.raises(OSError):
+        index.update("/notes/a.md", "text")
+    blocker.rollback()
+    blocker.close()
+    index.close()
+
+    # The warm-up and the deleter survive an index that cannot be opened
+    settings = plugin.sublime.load_settings(plugin.SETTINGS_FILE)
+    settings.set("search_index", True)
+    try:
+        plugin.plugin_loaded()
+        plugin._on_file_deleted(str(tmp_path / "scratch" / "gone.md"))
+    finally:
+        settings.set("search_index", False)
+
+
+def test_rebuild_streams_directory(tmp_path):
+    """Test that the rebuild script indexes every note, including shards."""
+    (tmp_path / "2024" / "03").mkdir(parents=True)
+    for i in range(1200):
+        folder = tmp_path / "2024" / "03" if i % 2 else tmp_path
+        (folder / f"{i}.md").write_text(f"note number{i} shared")
+
+    assert autosave_index.rebuild(str(tmp_path)) == 1200
+    index = SearchIndex(str(tmp_path))
+    assert len(index.search("shared", limit=2000)) == 1200
+    assert [Path(r.path).name for r in index.search("number7 shared")] == ["7.md"]
+    index.close()
+
+
+def test_saved_managed_file_is_indexed(plugin, monkeypatch):
+    """Test that saving a managed file updates the index and search command."""
+    import sublime
+
+    settings = sublime.load_settings("AutoSaveNewFiles.sublime-settings")
+    monkeypatch.setitem(settings._settings, "search_index", True)
+    plugin.reload_config()
+
+    listener = plugin.AutoSaveNewFilesCommand()
+    view = sublime.View()
+    listener.on_new_async(view)
+    Path(view.file_name()).write_text("quarterly planning notes")
+    listener.on_post_save_async(view)
+
+    window = sublime.Window()
+    command = plugin.AutoSaveNewFilesSearchCommand(window)
+    command.on_done("planning")
+    items, on_select = window.quick_panel
+    assert items[0][0] == Path(view.file_name()).name
+    on_select(0)
+    assert window.opened == [view.file_name()]
+
+
+def test_autosaved_text_is_indexed(plugin, monkeypatch):
+    """Test that text only written by autosave can be searched for."""
+    import sublime
+
+    settings = sublime.load_settings("AutoSaveNewFiles.sublime-settings")
+    monkeypatch.setitem(settings._settings, "search_index", True)
+    monkeypatch.setitem(settings._settings, "autosave", True)
+    plugin.reload_config()
+
+    listener = plugin.AutoSaveNewFilesCommand()
+    view = sublime.View()
+    listener.on_new_async(view)
+    view.run_command("insert", {"characters": "\nbudget review agenda"})
+    listener.autosave_view(view)
+
+    index = plugin._search.get(plugin.get_config().local_directory)
+    assert [result.path for result in index.search("agenda")] == [view.file_name()]
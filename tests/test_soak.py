@@ -0,0 +1,48 @@
+"""Short runs of the randomized soak harness in ``benchmarks/soak.py``."""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmarks"))
+
+soak = pytest.importorskip("soak")
+
+
+def test_soak_with_faults_keeps_invariants():
+    """Test that a session with injected faults and external deletes breaks no invariant."""
+    plan = soak.FaultPlan(error_rate=0.1, slow_rate=0.02, slow_seconds=0.001, external_deletes=50)
+    settings = {"autosave": True, "autosave_delay": 0.01}
+    report = soak.run_soak(seed=7, steps=400, windows=3, plan=plan, settings=settings)
+
+    assert report.violations == []
+    assert report.actions["new"] > 50
+    assert sum(report.faults.values()) > 0
+
+
+def test_soak_detects_leftover_header_only_files(monkeypatch):
+    """Test that the harness reports header-only notes the plugin failed to delete."""
+    monkeypatch.setattr(soak.plugin._deleter, "submit", lambda file_path: None)
+    plan = soak.FaultPlan(error_rate=0.0, slow_rate=0.0, external_deletes=0)
+    report = soak.run_soak(seed=3, steps=200, windows=2, plan=plan)
+
+    assert any("header-only note left behind" in message for message in report.violations)
+
+
+def test_soak_detects_lost_notes(monkeypatch):
+    """Test that the harness reports notes with content deleted on close."""
+    real_check = soak.plugin.AutoSaveNewFilesCommand.check_and_delete_empty_file
+
+    def delete_everything(self, view):
+        view._content = ""
+        view._size = 0
+        real_check(self, view)
+
+    monkeypatch.setattr(
+        soak.plugin.AutoSaveNewFilesCommand, "check_and_delete_empty_file", delete_everything
+    )
+    plan = soak.FaultPlan(error_rate=0.0, slow_rate=0.0, external_deletes=0)
+    report = soak.run_soak(seed=3, steps=200, windows=2, plan=plan)
+
+    assert any("note with content was lost" in message for message in report.violations)
@@ -0,0 +1,47 @@
+"""Tests for the plugin lifecycle and the warm-up after loading."""
+
+import os
+
+
+def test_warm_up_runs_after_plugin_loaded(plugin, monkeypatch):
+    """Test that loading only schedules the warm-up, which fills the caches."""
+    import sublime
+
+    plugin.plugin_unloaded()
+    save_directory = plugin.sublime.load_settings(plugin.SETTINGS_FILE).get("save_directory")
+    os.makedirs(save_directory)
+    open(os.path.join(save_directory, "existing.md"), "w").close()
+
+    scheduled = []
+    monkeypatch.setattr(sublime, "set_timeout_async", lambda cb, delay=0: scheduled.append(cb))
+    plugin.plugin_loaded()
+    assert plugin._config is None
+    assert plugin._names.names() == 0
+    assert "import_to_ready" not in plugin._startup
+
+    scheduled.pop()()
+    assert plugin._config is not None
+    assert plugin._readiness.is_ready(save_directory)
+    assert plugin._names.names() == 1
+    assert plugin._startup["import_to_ready"] >= plugin._startup["import_to_loaded"]
+
+    window = sublime.Window()
+    monkeypatch.undo()
+    plugin.AutoSaveNewFilesStatsCommand(window).run(output="json")
+    assert '"import_to_ready_ms"' in window.active_view().substr(sublime.Region(0, 10**6))
+
+
+def test_unload_stops_pending_warm_up(plugin, monkeypatch):
+    """Test that a warm-up scheduled before unloading does nothing."""
+    import sublime
+
+    plugin.plugin_unloaded()
+    scheduled = []
+    monkeypatch.setattr(sublime, "set_timeout_async", lambda cb, delay=0: scheduled.append(cb))
+    plugin.plugin_loaded()
+    plugin.plugin_unloaded()
+
+    scheduled.pop()()
+    assert plugin._config is None
+    assert plugin._journals.entries() == 0
+    assert "import_to_ready" not in plugin._startup
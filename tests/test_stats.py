@@ -0,0 +1,82 @@
+"""Tests for the instrumentation layer and the stats command."""
+
+import json
+
+import sublime
+
+from autosave_sublime.scratch_stats import Histogram, Stats
+
+
+def test_histogram_percentiles():
+    """Test that percentiles fall in the bucket holding them."""
+    histogram = Histogram()
+    for _ in range(90):
+        histogram.add(0.000003)
+    for _ in range(10):
+        histogram.add(0.002)
+
+    assert histogram.count == 100
+    assert histogram.percentile(50) == 4e-6
+    assert histogram.percentile(95) == 0.002
+    assert histogram.to_dict()["max_ms"] == 2.0
+
+
+def test_disabled_stats_record_nothing():
+    """Test that disabled stats hand out a shared no-op timer."""
+    stats = Stats()
+    assert stats.timer("a") is stats.timer("b")
+    with stats.timer("a"):
+        stats.count("c")
+    assert stats.snapshot()["counters"] == {}
+    assert stats.snapshot()["latency"] == {}
+
+
+def test_plugin_records_phases(plugin, monkeypatch):
+    """Test that enabling the setting records handler and phase latencies."""
+    settings = sublime.load_settings("AutoSaveNewFiles.sublime-settings")
+    monkeypatch.setitem(settings._settings, "stats", True)
+    settings.set("stats", True)
+    plugin._stats.reset()
+
+    listener = plugin.AutoSaveNewFilesCommand()
+    view = sublime.View()
+    listener.on_new_async(view)
+    listener.on_activated_async(view)
+
+    snapshot = plugin._stats.snapshot()
+    assert snapshot["counters"] == {
+        "events.batches": 1,
+        "files.created": 1,
+        "views.memo_hits": 1,
+    }
+    for name in (
+        "handler.on_new_async",
+        "handler.on_activated_async",
+        "phase.directory_check",
+        "phase.collision_resolution",
+        "phase.save",
+        "phase.batch",
+    ):
+        assert snapshot["latency"][name]["count"] == 1
+
+    settings.set("stats", False)
+    listener.on_new_async(sublime.View())
+    assert plugin._stats.snapshot()["counters"]["files.created"] == 1
+
+
+def test_stats_command_outputs_json(plugin, monkeypatch):
+    """Test that the stats command opens the snapshot as JSON in a scratch view."""
+    settings = sublime.load_settings("AutoSaveNewFiles.sublime-settings")
+    monkeypatch.setitem(settings._settings, "stats", True)
+    settings.set("stats", True)
+    plugin._stats.reset()
+    plugin._stats.count("views.memo_hits", 3)
+
+    window = sublime.Window()
+    plugin.AutoSaveNewFilesStatsCommand(window).run(output="json", reset=True)
+
+    view = window.views()[0]
+    assert view.is_scratch()
+    data = json.loads(view.substr(sublime.Region(0, view.size())))
+    assert data["counters"] == {"views.memo_hits": 3}
+    assert plugin._stats.snapshot()["counters"] == {}
@@ -0,0 +1,197 @@
+"""Tests for write-behind staging to a slow or remote save directory."""
+
+import os
+import time
+
+import sublime
+
+from autosave_sublime.scratch_sync import Remote, Syncer
+
+
+class FlakyRemote(Remote):
+    """Local directory standing in for a share, with latency and failures."""
+
+    def __init__(self, directory, latency=0.0, failures=0):
+        super().__init__(directory, fsync="never")
+        self.latency = latency
+        self.failures = failures
+        self.calls = 0
+
+    def _call(self):
+        self.calls += 1
+        time.sleep(self.latency)
+        if self.failures:
+            self.failures -= 1
+            raise OSError("share unavailable")
+
+    def claim(self, name, data):
+        self._call()
+        return super().claim(name, data)
+
+    def write(self, name, data):
+        self._call()
+        super().write(name, data)
+
+    def remove(self, name):
+        self._call()
+        super().remove(name)
+
+
+def test_syncer_copies_retries_and_resumes(tmp_path):
+    """Test collisions, merged updates, backoff retries, deletes and restarts."""
+    spool, share = tmp_path / "spool", tmp_path / "share"
+    (spool / "2024" / "03").mkdir(parents=True)
+    (share / "2024" / "03").mkdir(parents=True)
+    (share / "2024" / "03" / "a.md").write_text("someone else's note")
+    (spool / "2024" / "03" / "a.md").write_text("mine")
+    (spool / "b.md").write_text("b")
+
+    remote = FlakyRemote(str(share), latency=0.01, failures=4)
+    reported = []
+    syncer = Syncer(
+        str(spool), remote, reported.extend, linger=0.01, retry_delay=0.01, report_after=2
+    )
+    syncer.submit(str(spool / "2024" / "03" / "a.md"))
+    syncer.submit(str(spool / "b.md"))
+    syncer.submit(str(spool / "b.md"))
+    assert syncer.flush(timeout=5)
+
+    # Both files failed twice, were reported once, and were then retried
+    assert sorted(os.path.basename(path) for path, _ in reported) == ["a.md", "b.md"]
+    assert (share / "2024" / "03" / "a.md").read_text() == "someone else's note"
+    assert (share / "2024" / "03" / "a_1.md").read_text() == "mine"
+    assert (share / "b.md").read_text() == "b"
+    assert syncer.remote_name(str(spool / "2024" / "03" / "a.md")) == "2024/03/a_1.md"
+
+    # Unchanged files are not copied again, changed ones replace their copy
+    calls = remote.calls
+    (spool / "b.md").write_text("b, edited")
+    syncer.submit(str(spool / "2024" / "03" / "a.md"))
+    syncer.submit(str(spool / "b.md"))
+    assert syncer.flush(timeout=5)
+    assert remote.calls == calls + 1
+    assert (share / "b.md").read_text() == "b, edited"
+    syncer.stop()
+
+    # After a restart only files changed since their last copy are copied
+    (spool / "2024" / "03" / "a.md").write_text("mine, edited offline")
+    os.utime(spool / "2024" / "03" / "a.md", ns=(1, 1))
+    syncer = Syncer(str(spool), remote, reported.extend, linger=0.01)
+    paths = [str(spool / "2024" / "03" / "a.md"), str(spool / "b.md")]
+    assert syncer.resume(paths) == 1
+    syncer.delete(str(spool / "b.md"))
+    assert syncer.flush(timeout=5)
+    assert (share / "2024" / "03" / "a_1.md").read_text() == "mine, edited offline"
+    assert not (share / "b.md").exists()
+    syncer.stop()
+
+
+def test_plugin_stages_new_files(plugin, tmp_path, monkeypatch):
+    """Test that new files are created locally and mirrored to the save directory."""
+    settings = sublime.load_settings("AutoSaveNewFiles.sublime-settings")
+    monkeypatch.setitem(settings._settings, "staging_directory", str(tmp_path / "spool"))
+    settings.set("staging_directory", str(tmp_path / "spool"))
+
+    listener = plugin.AutoSaveNewFilesCommand()
+    kept, empty = sublime.View(), sublime.View()
+    listener.on_new_async(kept)
+    listener.on_new_async(empty)
+    assert os.path.dirname(kept.file_name()) == str(tmp_path / "spool")
+    kept.run_command("append", {"characters": "notes\n"})
+    kept.run_command("save")
+    listener.on_post_save_async(kept)
+    plugin._syncer.flush(timeout=5)
+
+    share = tmp_path / "scratch"
+    assert sorted(p.name for p in share.iterdir()) == sorted(
+        os.path.basename(view.file_name()) for view in (kept, empty)
+    )
+    assert (share / os.path.basename(kept.file_name())).read_text().endswith("notes\n")
+
+    listener.on_pre_close(empty)
+    plugin._deleter.flush()
+    plugin._syncer.flush(timeout=5)
+    assert [p.name for p in share.iterdir()] == [os.path.basename(kept.file_name())]
+
+
+def test_plugin_creates_one_syncer_across_threads(plugin, tmp_path, monkeypatch):
+    """Test that threads asking for the syncer at once share a single one."""
+    import threading
+
+    settings = sublime.load_settings("AutoSaveNewFiles.sublime-settings")
+    monkeypatch.setitem(settings._settings, "staging_directory", str(tmp_path / "spool"))
+    settings.set("staging_directory", str(tmp_path / "spool"))
+    os.makedirs(tmp_path / "spool")
+    created = []
+
+    class SlowSyncer(Syncer):
+        def __init__(self, *args, **kwargs):
+            created.append(self)
+            time.sleep(0.05)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(plugin, "Syncer", SlowSyncer)
+    config = plugin.get_config()
+    syncers = []
+    threads = [
+        threading.Thread(target=lambda: syncers.append(plugin._get_syncer(config)))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(created) == 1
+    assert syncers == created * 4
+
+
+def test_syncer_survives_partial_writes_and_bugs(tmp_path, monkeypatch):
+    """Test that failed claims leave no file behind and errors never stop the worker."""
+    import errno
+
+    from autosave_sublime import scratch_sync
+
+    spool, share = tmp_path / "spool", tmp_path / "share"
+    spool.mkdir()
+    share.mkdir()
+    (spool / "a.md").write_text("a")
+    (spool / "b.md").write_text("b")
+
+    real_fdopen = os.fdopen
+    failed = []
+
+    def full_disk(fd, mode):
+        f = real_fdopen(fd, mode)
+        if not failed:
+            failed.append(fd)
+            f.close()
+            raise OSError(errno.ENOSPC, "No space left on device")
+        return f
+
+    monkeypatch.setattr(scratch_sync.os, "fdopen", full_disk)
+    bugs = ["b.md"]
+    remote = Remote(str(share), fsync="never")
+    real_claim = remote.claim
+
+    def buggy_claim(name, data):
+        if name in bugs:
+            bugs.remove(name)
+            raise ValueError("bug")
+        return real_claim(name, data)
+
+    remote.claim = buggy_claim
+
+    def broken_report(failures):
+        raise RuntimeError("report failed")
+
+    syncer = Syncer(
+        str(spool), remote, broken_report, linger=0.01, retry_delay=0.01, report_after=1
+    )
+    syncer.submit(str(spool / "a.md"))
+    syncer.submit(str(spool / "b.md"))
+    assert syncer.flush(timeout=5)
+    syncer.stop()
+
+    assert sorted(os.listdir(share)) == ["a.md", "b.md"]
+    assert syncer.remote_name(str(spool / "a.md")) == "a.md"
@@ -0,0 +1,156 @@
+"""Tests for following changes made outside the plugin."""
+
+import os
+import time
+
+import sublime
+
+from autosave_sublime.scratch_autosave import atomic_write
+from autosave_sublime.scratch_watch import (
+    CREATED,
+    DELETED,
+    MOVED,
+    Change,
+    ChangeBuffer,
+    DirectoryWatcher,
+    PollingWatcher,
+)
+
+
+def test_change_buffer_applies_backpressure():
+    """Test that changes arrive in bounded batches and floods become one resync."""
+    scheduled = []
+    batches = []
+    buffer = ChangeBuffer(
+        lambda changes, resync: batches.append((len(changes), resync)),
+        lambda callback, delay: scheduled.append(callback),
+        batch_size=500,
+        max_pending=10000,
+    )
+    for i in range(1200):
+        buffer.put(Change(DELETED, f"/notes/{i}.md"))
+    buffer.put(Change(CREATED, "/notes/0.md"))
+    assert len(scheduled) == 1
+    while scheduled:
+        scheduled.pop()()
+        assert len(scheduled) <= 1
+    assert batches == [(500, False), (500, False), (200, False)]
+
+    batches.clear()
+    for i in range(50000):
+        buffer.put(Change(DELETED, f"/notes/{i}.md"))
+    assert len(buffer) == 0
+    while scheduled:
+        scheduled.pop()()
+    assert batches == [(0, True)]
+
+
+def test_polling_thread_survives_errors_without_select(tmp_path, monkeypatch):
+    """Test that polling, as on Windows, never uses select and keeps going after errors."""
+    from autosave_sublime import scratch_watch
+
+    def no_select(*args):
+        raise OSError(10038, "An operation was attempted on something that is not a socket")
+
+    monkeypatch.setattr(scratch_watch.select, "select", no_select)
+    real_poll = PollingWatcher.poll
+    calls = []
+
+    def flaky_poll(self):
+        calls.append(None)
+        if len(calls) == 1:
+            raise ValueError("unexpected")
+        real_poll(self)
+
+    monkeypatch.setattr(PollingWatcher, "poll", flaky_poll)
+    batches = []
+    buffer = ChangeBuffer(
+        lambda changes, resync: batches.append((changes, resync)),
+        lambda callback, delay: callback(),
+    )
+    watcher = DirectoryWatcher(str(tmp_path), buffer, poll_interval=0.01, use_inotify=False)
+    try:
+        (tmp_path / "note.md").write_text("note")
+        deadline = time.monotonic() + 5
+        while not any(changes for changes, _ in batches) and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        watcher.stop()
+    assert any(resync for _, resync in batches)
+    assert [Change(CREATED, str(tmp_path / "note.md"))] in [changes for changes, _ in batches]
+
+
+def test_polling_watcher_reports_changes(tmp_path):
+    """Test that polling reports creations, renames and deletions, not atomic saves."""
+    (tmp_path / "kept.md").write_text("kept")
+    (tmp_path / "old.md").write_text("old")
+    changes = []
+    watcher = PollingWatcher(str(tmp_path), changes.append)
+    watcher.poll()
+    assert changes == []
+
+    (tmp_path / "old.md").rename(tmp_path / "new.md")
+    (tmp_path / "2024").mkdir()
+    (tmp_path / "2024" / "note.md").write_text("note")
+    (tmp_path / ".hidden").write_text("ignored")
+    atomic_write(str(tmp_path / "kept.md"), b"saved")
+    watcher.poll()
+    assert sorted(changes) == [
+        Change(CREATED, str(tmp_path / "2024" / "note.md")),
+        Change(CREATED, str(tmp_path / "kept.md")),
+        Change(MOVED, str(tmp_path / "old.md"), str(tmp_path / "new.md")),
+    ]
+
+    changes.clear()
+    os.remove(tmp_path / "2024" / "note.md")
+    os.rmdir(tmp_path / "2024")
+    watcher.poll()
+    assert changes == [Change(DELETED, str(tmp_path / "2024" / "note.md"))]
+
+
+def test_plugin_follows_external_changes(plugin, monkeypatch):
+    """Test that renames and deletions by other programs update the tracked files."""
+    settings = sublime.load_settings("AutoSaveNewFiles.sublime-settings")
+    monkeypatch.setitem(settings._settings, "watch", True)
+    settings.set("watch", True)
+
+    listener = plugin.AutoSaveNewFilesCommand()
+    renamed, deleted = sublime.View(), sublime.View()
+    listener.on_new_async(renamed)
+    listener.on_new_async(deleted)
+    listener.restore_managed_files(plugin.get_config().local_directory)
+    assert plugin.get_config().local_directory in plugin._watchers
+
+    new_path = renamed.file_name() + ".moved.md"
+    os.rename(renamed.file_name(), new_path)
+    os.remove(deleted.file_name())
+
+    deadline = time.monotonic() + 5
+    expected = {new_path}
+    while plugin._records.paths() != expected and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert plugin._records.paths() == expected
+    assert plugin._records.get(renamed.id()).timestamp
+    journal = plugin._journals.get(plugin.get_config().local_directory)
+    assert [path for path, _ in journal.items()] == [new_path]
+
+
+def test_closing_a_file_does_not_start_watching_on_ui_thread(plugin, monkeypatch):
+    """Test that on_pre_close leaves the journal replay and the watcher to the async thread."""
+    settings = sublime.load_settings("AutoSaveNewFiles.sublime-settings")
+    monkeypatch.setitem(settings._settings, "watch", True)
+    settings.set("watch", True)
+    os.makedirs(plugin.get_config().local_directory)
+    scheduled = []
+    monkeypatch.setattr(
+        sublime, "set_timeout_async", lambda callback, delay=0: scheduled.append(callback)
+    )
+
+    listener = plugin.AutoSaveNewFilesCommand()
+    view = sublime.View(file_name=os.path.join(plugin.get_config().local_directory, "other.md"))
+    listener.on_pre_close(view)
+    assert plugin.get_config().local_directory not in plugin._watchers
+
+    for callback in scheduled:
+        callback()
+    assert plugin.get_config().local_directory in plugin._watchers